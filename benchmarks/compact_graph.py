@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark CompactGraph against create_context_graph's dicts
+
+The dict graph keeps several dicts, an id string and a content preview per
+message. CompactGraph keeps typed columns and CSR edge arrays, and renders
+dicts only on request. Build time and the bytes each message adds to the
+graph are shown for both; bytes are measured with tracemalloc and do not
+count the messages themselves. The dict graph stops at 10^5 messages.
+"""
+
+import gc
+import time
+import tracemalloc
+
+from src.gap import (
+    CompactGraph,
+    ContextRecord,
+    MessageContentRecord,
+    MessageRecord,
+    SourceRecord,
+    TransformHintsRecord,
+    create_context_graph,
+)
+from src.gap.compact_graph import np
+
+SIZES = (10_000, 100_000, 1_000_000)
+THREADS = 100
+
+
+def history(count: int):
+    """count messages over THREADS threads; every tenth replies to the message five before it"""
+    messages = []
+    for index in range(count):
+        parents = []
+        if index % 10 == 0 and index >= 5:
+            parents.append(f"claude.ai_chat{(index - 5) % THREADS}_2026-01-01T00:00:00.{index - 5:06d}")
+        messages.append(MessageRecord(
+            "0.2.0",
+            MessageContentRecord(
+                f"Message {index} about the approach",
+                SourceRecord("claude.ai", None, f"chat{index % THREADS}", f"2026-01-01T00:00:00.{index:06d}"),
+                ContextRecord(f"thread-{index % THREADS}", parents),
+                TransformHintsRecord()
+            )
+        ))
+    return messages
+
+
+def measure(build, messages):
+    """Seconds to build, and traced bytes kept per message"""
+    gc.collect()
+    start = time.perf_counter()
+    graph = build(messages)
+    elapsed = time.perf_counter() - start
+    del graph
+
+    gc.collect()
+    tracemalloc.start()
+    graph = build(messages)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del graph
+    return elapsed, retained / len(messages)
+
+
+def main():
+    print("=" * 66)
+    print(f"Context graph of a history ({'numpy' if np is not None else 'array'} columns)")
+    print("=" * 66)
+    print(f"{'messages':>10}  {'dict build':>10}  {'bytes/msg':>9}  {'compact':>10}  {'bytes/msg':>9}")
+
+    for count in SIZES:
+        messages = history(count)
+        if count <= 100_000:
+            dict_time, dict_bytes = measure(create_context_graph, messages)
+            dict_columns = f"{dict_time * 1e3:8.0f}ms  {dict_bytes:>9.0f}"
+        else:
+            dict_columns = f"{'-':>10}  {'-':>9}"
+        compact_time, compact_bytes = measure(CompactGraph, messages)
+        print(f"{count:>10}  {dict_columns}  {compact_time * 1e3:8.0f}ms  {compact_bytes:>9.0f}")
+        del messages
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark create_context_graph on growing threads
+
+create_context_graph linked every message of a thread to every message
+before it, costing O(n^2) time and edges. It now links each message to the
+previous one in its thread and to its parents, in one pass. The old graph
+is built for the smallest size only; above that its edges no longer fit
+in memory.
+"""
+
+import gc
+import time
+
+from src.gap import (
+    ContextRecord,
+    MessageContentRecord,
+    MessageRecord,
+    SourceRecord,
+    TransformHintsRecord,
+    create_context_graph,
+)
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+def thread(count: int):
+    """One thread of count messages; every tenth replies to the message five before it"""
+    messages = []
+    for index in range(count):
+        parents = [f"claude.ai_bench_{index - 5:07d}"] if index % 10 == 0 and index >= 5 else []
+        messages.append(MessageRecord(
+            "0.2.0",
+            MessageContentRecord(
+                f"Message {index} about the approach",
+                SourceRecord("claude.ai", None, "bench", f"{index:07d}"),
+                ContextRecord("bench-thread", parents),
+                TransformHintsRecord()
+            )
+        ))
+    return messages
+
+
+def quadratic_graph(messages) -> dict:
+    """The graph as create_context_graph built it, every pair of a thread linked"""
+    graph = {"nodes": {}, "edges": []}
+    for msg in messages:
+        source = msg.message.source
+        node_id = f"{source.platform}_{source.chat_id}_{source.timestamp}"
+        graph["nodes"][node_id] = {"platform": source.platform}
+        if msg.message.context.thread_id:
+            for existing_id in graph["nodes"]:
+                if existing_id != node_id:
+                    graph["edges"].append({"from": existing_id, "to": node_id, "type": "thread_connection"})
+    return graph
+
+
+def timed(function, *args):
+    """Seconds taken by one call, and its result"""
+    gc.collect()
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print("=" * 66)
+    print("create_context_graph on one thread")
+    print("=" * 66)
+    print(f"{'messages':>10}  {'pairwise':>10}  {'edges':>10}  {'linear':>10}  {'edges':>10}  {'per msg':>8}")
+
+    for count in SIZES:
+        messages = thread(count)
+        if count == SIZES[0]:
+            pairwise, old = timed(quadratic_graph, messages)
+            old_columns = f"{pairwise * 1e3:8.1f}ms  {len(old['edges']):>10}"
+            del old
+        else:
+            old_columns = f"{'-':>10}  {'-':>10}"
+
+        linear, graph = timed(create_context_graph, messages)
+        print(
+            f"{count:>10}  {old_columns}  {linear * 1e3:8.1f}ms  "
+            f"{len(graph['edges']):>10}  {linear / count * 1e6:6.2f}us"
+        )
+        del graph, messages
+
+
+if __name__ == "__main__":
+    main()
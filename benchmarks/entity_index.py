@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark entity lookups in EntityIndex against scanning the messages
+
+create_context_graph and ContextMerger found an entity's definition by
+walking every message, last writer winning. EntityIndex keeps each key's
+definitions in time order, so the current one is its last entry and the
+one as of a time is a bisect.
+"""
+
+import time
+
+from src.gap import (
+    ContextRecord,
+    EntityIndex,
+    EntityRecord,
+    MessageContentRecord,
+    MessageRecord,
+    SourceRecord,
+    TransformHintsRecord,
+)
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+KEYS = [f"component_{index}" for index in range(50)]
+
+
+def history(count: int):
+    """count messages over ten threads, each defining two of the keys"""
+    messages = []
+    for index in range(count):
+        entities = {
+            KEYS[(index * 7 + offset) % len(KEYS)]: EntityRecord("technical_component", f"version {index // 100}")
+            for offset in (0, 1)
+        }
+        messages.append(MessageRecord(
+            "0.2.0",
+            MessageContentRecord(
+                f"Message {index}",
+                SourceRecord("claude.ai", None, "bench", f"2026-01-01T00:00:00.{index:07d}"),
+                ContextRecord(f"thread-{index % 10}", [], entities),
+                TransformHintsRecord()
+            )
+        ))
+    return messages
+
+
+def scan(messages, key: str, before: str = None):
+    """Last definition of key, as create_context_graph took it"""
+    found = None
+    for msg in messages:
+        if before is not None and msg.message.source.timestamp > before:
+            break
+        entity = msg.message.context.entities.get(key)
+        if entity is not None:
+            found = entity
+    return found
+
+
+def per_call(function, repeat: int) -> float:
+    """Mean seconds per call of function over repeat runs"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    print("=" * 70)
+    print("Definition of one entity key")
+    print("=" * 70)
+    print(f"{'messages':>10}  {'scan':>10}  {'index':>8}  {'current':>9}  {'as of':>9}  {'in thread':>9}")
+
+    for count in SIZES:
+        messages = history(count)
+        key = KEYS[3]
+        middle = messages[count // 2].message.source.timestamp
+
+        start = time.perf_counter()
+        index = EntityIndex()
+        for position, msg in enumerate(messages):
+            index.add(msg, f"message-{position}")
+        build = time.perf_counter() - start
+
+        assert index.current(key).entity == scan(messages, key)
+        assert index.as_of(key, middle).entity == scan(messages, key, middle)
+        scanned = per_call(lambda: scan(messages, key), 3)
+        current = per_call(lambda: index.current(key), 10_000)
+        as_of = per_call(lambda: index.as_of(key, middle), 10_000)
+        in_thread = per_call(lambda: index.as_of(key, middle, "thread-1"), 10_000)
+        print(
+            f"{count:>10}  {scanned * 1e3:8.2f}ms  {build:7.2f}s  {current * 1e9:7.0f}ns  "
+            f"{as_of * 1e9:7.0f}ns  {in_thread * 1e9:7.0f}ns"
+        )
+        del messages, index
+
+
+if __name__ == "__main__":
+    main()
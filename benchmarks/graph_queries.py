@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark traversal queries on growing histories
+
+Queries are breadth-first searches over a CompactGraph's CSR indexes that
+stop at their depth cap or limit, so their time should follow the nodes
+they visit, not the size of the history. A chat path starts from every
+message of one chat and checks against every message of the other, so it
+also grows with the chats, here a hundredth of the history each.
+
+Messages stored after the graph is built are added to it; adding one
+costs the same on every size of history.
+"""
+
+import time
+
+from src.gap import (
+    CompactGraph,
+    ContextRecord,
+    MessageContentRecord,
+    MessageRecord,
+    SourceRecord,
+    TransformHintsRecord,
+    ancestors,
+    chat_path,
+    neighbourhood,
+)
+
+SIZES = (10_000, 100_000, 1_000_000)
+THREADS = 100
+ADDED = 1_000
+
+
+def history(count: int):
+    """count messages over THREADS threads; every tenth replies to a message of the previous thread"""
+    messages = []
+    for index in range(count):
+        parents = []
+        if index % 10 == 0 and index >= 1:
+            parents.append(f"claude.ai_chat{(index - 1) % THREADS}_2026-01-01T00:00:00.{index - 1:06d}")
+        messages.append(MessageRecord(
+            "0.2.0",
+            MessageContentRecord(
+                f"Message {index}",
+                SourceRecord("claude.ai", None, f"chat{index % THREADS}", f"2026-01-01T00:00:00.{index:06d}"),
+                ContextRecord(f"thread-{index % THREADS}", parents),
+                TransformHintsRecord()
+            )
+        ))
+    return messages
+
+
+def per_call(function, repeat: int = 20) -> float:
+    """Mean seconds per call of function over repeat runs"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    print("=" * 78)
+    print("Traversal queries from the middle of a history")
+    print("=" * 78)
+    print(f"{'messages':>10}  {'ancestors 100':>14}  {'2 hops':>10}  {'chat path':>10}  {'add':>9}")
+
+    for count in SIZES:
+        messages = history(count + ADDED)
+        graph = CompactGraph(messages[:count])
+        middle = count // 2
+        found_ancestors = per_call(lambda: ancestors(graph, middle, limit=100))
+        two_hops = per_call(lambda: neighbourhood(graph, middle, hops=2))
+        path = per_call(lambda: chat_path(graph, "chat0", "chat3", limit=1000))
+        start = time.perf_counter()
+        for msg in messages[count:]:
+            graph.add(msg)
+        added = (time.perf_counter() - start) / ADDED
+        print(
+            f"{count:>10}  {found_ancestors * 1e6:12.1f}us  {two_hops * 1e6:8.1f}us  {path * 1e6:8.1f}us  "
+            f"{added * 1e6:7.1f}us"
+        )
+        del graph, messages
+
+
+if __name__ == "__main__":
+    main()
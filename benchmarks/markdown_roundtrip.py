@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark parsing GAP markdown back into messages
+
+from_markdown used to wrap the parsed content again, re-running entity
+detection on every /gap/transform and /gap/update-entity request. It now
+rebuilds the message from the header; re-detection is opt-in. Copying the
+markdown string once is shown as the floor.
+"""
+
+import time
+
+from src.gap import GAPProtocol
+
+PARAGRAPH = (
+    "I looked at the system again and the database is still slow. "
+    "We tried FastAPI 0.100 with Python 3.11 and this approach from main.py, "
+    "but the problem is in the code that handles the API. "
+)
+
+
+def per_call(function, *args, repeat: int = 20) -> float:
+    """Mean seconds per call of function over repeat runs"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    gap = GAPProtocol()
+
+    print("=" * 50)
+    print("from_markdown round trip")
+    print("=" * 50)
+    print(f"{'content':>10}  {'copy':>10}  {'parse':>10}  {'redetect':>10}")
+
+    for paragraphs in (1, 100, 10_000):
+        wrapped = gap.wrap_message(
+            content=PARAGRAPH * paragraphs,
+            platform="claude.ai",
+            chat_id="bench",
+            entities={"the_system": {"type": "service", "value": "API Gateway"}}
+        )
+        markdown = gap.to_markdown(wrapped)
+
+        copy = per_call(lambda text: "".join([text, ""]), markdown)
+        parse = per_call(gap.from_markdown, markdown)
+        redetect = per_call(lambda text: gap.from_markdown(text, redetect=True), markdown, repeat=3)
+        print(f"{len(markdown):>10}  {copy * 1e6:8.1f}us  {parse * 1e6:8.1f}us  {redetect * 1e6:8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark definition suggestions on content without sentence breaks
+
+Content with no periods is the worst case for a per-phrase regex search:
+every occurrence of an undefined phrase scans to the end of the content
+looking for a definition word, so its cost grows with the square of the
+content length. The single-pass scan used by suggest_entity_definitions
+stays linear.
+"""
+
+import re
+import time
+
+from src.gap import EntityDetector
+
+FILLER = "the system handles the approach for that module and then "
+
+
+def legacy_suggestions(detector, content, entities):
+    """The original per-phrase search, kept here for comparison"""
+    suggestions = {}
+    for key in detector.find_undefined_entities(entities):
+        phrase = key.replace("_", " ")
+        pattern = rf"({phrase})[^.]*?(?:is|are|was|were|means|refers to|represents)\s+([^.]+)"
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match:
+            suggestions[key] = match.group(2).strip()
+    return suggestions
+
+
+def period_free_content(size: int) -> str:
+    """Content of about size characters with no sentence breaks"""
+    return (FILLER * (size // len(FILLER) + 1))[:size]
+
+
+def timed(function, *args):
+    """Run function once, returning its result and elapsed seconds"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    detector = EntityDetector()
+
+    print("=" * 50)
+    print("suggest_entity_definitions on period-free content")
+    print("=" * 50)
+    print(f"{'size':>10}  {'single pass':>12}  {'per phrase':>12}")
+
+    for size in (16_384, 32_768, 65_536, 1_048_576):
+        content = period_free_content(size)
+        entities = detector.detect_entities(content)
+
+        suggestions, fast = timed(detector.suggest_entity_definitions, content, entities)
+        # The per-phrase search is quadratic here; skip it at 1 MB
+        if size <= 65_536:
+            expected, slow = timed(legacy_suggestions, detector, content, entities)
+            assert suggestions == expected
+            slow_text = f"{slow:11.3f}s"
+        else:
+            slow_text = f"{'skipped':>12}"
+        print(f"{size:>10}  {fast:11.3f}s  {slow_text}")
+
+
+if __name__ == "__main__":
+    main()
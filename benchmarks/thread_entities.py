@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark merging a thread's entities with and without its entity table
+
+ContextMerger.merge_contexts and create_context_graph walked every entity
+of every message in the thread. Messages shared into a thread's EntityTable
+keep only their keys and differing entries, and the table holds the merged
+definitions, so a merge no longer depends on the number of messages. Catching up with the
+changes since a version is shown too.
+"""
+
+import time
+
+from src.gap import EntityTable, GAPProtocol, share_entities
+
+PARAGRAPHS = (
+    "I looked at the system again and the database is still slow.",
+    "We tried FastAPI 0.100 with Python 3.11 and this approach from main.py.",
+    "The problem is in the code that handles the API; React v18.2 is fine.",
+    "After the upgrade to FastAPI 0.101 the handler in app.py works.",
+)
+
+
+def merge_entities(messages) -> dict:
+    """The entity merge merge_contexts does message by message"""
+    merged = {}
+    for message in messages:
+        for key, entity in message.message.context.entities.items():
+            if entity.value != "[NEEDS_DEFINITION]":
+                merged[key] = entity
+    return merged
+
+
+def per_call(function, repeat: int = 5) -> float:
+    """Mean seconds per call of function over repeat runs"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    gap = GAPProtocol(version="0.2.0")
+
+    print("=" * 66)
+    print("Merging one thread's entities")
+    print("=" * 66)
+    print(f"{'messages':>10}  {'re-merge':>10}  {'table':>10}  {'last 10':>10}  {'versions':>9}")
+
+    for count in (100, 1_000, 10_000):
+        table = EntityTable()
+        messages = []
+        for index in range(count):
+            record = gap.wrap_record(
+                f"{PARAGRAPHS[index % len(PARAGRAPHS)]} Message {index}.",
+                platform="claude.ai",
+                chat_id="bench",
+                thread_id="bench-thread"
+            )
+            messages.append(record)
+            share_entities(record, table, f"message-{index}")
+
+        remerge = per_call(lambda: merge_entities(messages))
+        shared = per_call(lambda: table.snapshot())
+        version = messages[-10].message.context.entities.version
+        catch_up = per_call(lambda: table.changes_since(version))
+        print(
+            f"{count:>10}  {remerge * 1e6:8.1f}us  {shared * 1e6:8.1f}us  "
+            f"{catch_up * 1e6:8.1f}us  {table.version:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
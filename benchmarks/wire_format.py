@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the binary wire format against JSON and markdown
+
+Services exchanged messages as indented JSON or markdown, both of which
+repeat field names, the pronoun map and entity placeholders in every
+message. Sizes and encode/decode times are shown for each encoding;
+markdown drops entity types, so its decode is not a full round
+trip.
+"""
+
+import time
+
+from src.gap import GAPMessage, GAPProtocol, decode_message, encode_message
+
+PARAGRAPH = (
+    "I looked at the system again and the database is still slow. "
+    "We tried FastAPI 0.100 with Python 3.11 and this approach from main.py, "
+    "but the problem is in the code that handles the API. "
+)
+
+
+def per_call(function, *args, repeat: int = 20) -> float:
+    """Mean seconds per call of function over repeat runs"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    gap = GAPProtocol()
+
+    print("=" * 72)
+    print("GAP message encodings")
+    print("=" * 72)
+    print(f"{'content':>8}  {'format':>8}  {'bytes':>9}  {'encode':>10}  {'decode':>10}")
+
+    for paragraphs in (1, 100, 1_000):
+        message = gap.wrap_message(
+            content=PARAGRAPH * paragraphs,
+            platform="claude.ai",
+            chat_id="bench",
+            thread_id="bench-thread",
+            entities={"the_system": {"type": "service", "value": "API Gateway"}}
+        )
+        repeat = 200 if paragraphs == 1 else 10
+
+        wire = encode_message(message)
+        text = message.model_dump_json(indent=2)
+        markdown = gap.to_markdown(message)
+        encodings = (
+            ("wire", len(wire), per_call(encode_message, message, repeat=repeat),
+             per_call(decode_message, wire, repeat=repeat)),
+            ("json", len(text.encode()), per_call(lambda m: m.model_dump_json(indent=2), message, repeat=repeat),
+             per_call(GAPMessage.model_validate_json, text, repeat=repeat)),
+            ("markdown", len(markdown.encode()), per_call(gap.to_markdown, message, repeat=repeat),
+             per_call(gap.from_markdown, markdown, repeat=repeat)),
+        )
+        for name, size, encode, decode in encodings:
+            print(f"{len(message.message.content):>8}  {name:>8}  {size:>9}  {encode * 1e6:8.1f}us  {decode * 1e6:8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import argparse
 import json
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any
 from rich.console import Console
@@ -66,6 +67,22 @@ if USE_API:
             else:
                 raise Exception(f"API Error: {response.text}")
 
+        def transform_many(self, gap_markdown, target_platforms, context_additions=None, include_metadata=True):
+            """Transform GAP content for several target platforms"""
+            data = {
+                "gap_markdown": gap_markdown,
+                "target_platforms": target_platforms,
+                "context_additions": context_additions,
+                "include_metadata": include_metadata
+            }
+
+            response = requests.post(f"{self.api_url}/gap/transform/multi", json=data)
+            if response.status_code == 200:
+                result = response.json()
+                return result["transformed"]
+            else:
+                raise Exception(f"API Error: {response.text}")
+
         def update_entity(self, gap_markdown, entity_key, entity_value, entity_type="user_defined"):
             """Update an entity in GAP content"""
             data = {
@@ -82,13 +99,14 @@ if USE_API:
             else:
                 raise Exception(f"API Error: {response.text}")
 else:
-    from src.gap import GAPProtocol
+    from src.gap import GAPProtocol, load_glossary, load_platforms
 
     class GAPCliDirect:
         """Direct implementation CLI (no API needed)"""
 
         def __init__(self):
-            self.gap = GAPProtocol()
+            self.gap = GAPProtocol(glossary=load_glossary(os.getenv("GAP_GLOSSARY")))
+            load_platforms(os.getenv("GAP_PLATFORMS"))
 
         def wrap(self, content, platform, chat_id, **kwargs):
             """Wrap content with GAP metadata"""
@@ -112,6 +130,19 @@ else:
                 context_additions
             )
 
+        def transform_many(self, gap_markdown, target_platforms, context_additions=None, include_metadata=True):
+            """Transform GAP content for several target platforms"""
+            parsed = self.gap.from_markdown(gap_markdown)
+            if not parsed:
+                raise ValueError("Invalid GAP markdown format")
+
+            return self.gap.transform_for_platforms(
+                parsed,
+                target_platforms,
+                context_additions,
+                include_metadata
+            )
+
         def update_entity(self, gap_markdown, entity_key, entity_value, entity_type="user_defined"):
             """Update an entity in GAP content"""
             parsed = self.gap.from_markdown(gap_markdown)
@@ -127,6 +158,21 @@ else:
             return self.gap.to_markdown(updated)
 
 
+def read_gap_file(path, block=0, save_index=False):
+    """Read one message block from a .gap file
+
+    An existing offset index is used; one is only written with save_index.
+    """
+    from src.gap.archive import GAPArchive
+
+    with GAPArchive(path, save_index=save_index) as archive:
+        if len(archive):
+            return archive.block(block)
+    # No [GAP:START] delimiters; hand the whole file to the parser
+    with open(path, "r") as f:
+        return f.read()
+
+
 def read_from_stdin():
     """Read content from stdin"""
     if sys.stdin.isatty():
@@ -159,6 +205,21 @@ def write_to_clipboard(content):
         return False
 
 
+def write_outputs(outputs: Dict[str, str], output_dir: str) -> Dict[str, Path]:
+    """Write one file per target into output_dir, in parallel"""
+    directory = Path(output_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {target: directory / f"{target}.md" for target in outputs}
+
+    def write(target):
+        paths[target].write_text(outputs[target])
+
+    with ThreadPoolExecutor(max_workers=min(len(outputs), 8) or 1) as pool:
+        # list() re-raises the first write error
+        list(pool.map(write, outputs))
+    return paths
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="GAP Protocol CLI Tool",
@@ -174,11 +235,22 @@ Examples:
   # Transform for another platform
   gap-cli transform input.gap --target gemini
 
+  # Transform for several platforms at once, one file each in out/
+  gap-cli transform input.gap --target claude.ai,chatgpt,gemini -o out
+
   # Update entity definition
   gap-cli update-entity input.gap --key the_system --value "PostgreSQL 14.5"
 
+  # List the messages in an archive, then transform one of them
+  gap-cli archive history.gap
+  gap-cli archive history.gap --block 42 --target chatgpt
+
   # Pipe content through GAP
   echo "Some content" | gap-cli wrap --platform claude.ai --chat-id test --stdin
+
+  # Compile a project glossary, then detect its terms when wrapping
+  gap-cli build-glossary terms.json -o terms.glossary
+  GAP_GLOSSARY=terms.glossary gap-cli wrap "Content" --platform claude.ai --chat-id chat123
         """
     )
 
@@ -205,17 +277,21 @@ Examples:
     # Transform command
     transform_parser = subparsers.add_parser("transform", help="Transform GAP content")
     transform_parser.add_argument("input_file", nargs="?", help="GAP markdown file (or use --stdin/--clipboard)")
-    transform_parser.add_argument("--target", "-t", required=True, help="Target platform")
+    transform_parser.add_argument("--block", "-b", type=int, default=0, help="Message to use from a multi-message file")
+    transform_parser.add_argument("--index", action="store_true", help="Save an offset index (<file>.idx) for later reads")
+    transform_parser.add_argument("--target", "-t", required=True, help="Target platform, or a comma-separated list")
     transform_parser.add_argument("--context", help="Additional context (JSON)")
     transform_parser.add_argument("--stdin", action="store_true", help="Read from stdin")
     transform_parser.add_argument("--clipboard", action="store_true", help="Read from clipboard")
-    transform_parser.add_argument("--output", "-o", help="Output file")
+    transform_parser.add_argument("--output", "-o", help="Output file (output directory with several targets)")
     transform_parser.add_argument("--copy", action="store_true", help="Copy result to clipboard")
     transform_parser.add_argument("--no-metadata", action="store_true", help="Exclude metadata from transformation")
 
     # Update entity command
     entity_parser = subparsers.add_parser("update-entity", help="Update entity definition")
     entity_parser.add_argument("input_file", nargs="?", help="GAP markdown file (or use --stdin/--clipboard)")
+    entity_parser.add_argument("--block", "-b", type=int, default=0, help="Message to use from a multi-message file")
+    entity_parser.add_argument("--index", action="store_true", help="Save an offset index (<file>.idx) for later reads")
     entity_parser.add_argument("--key", "-k", required=True, help="Entity key")
     entity_parser.add_argument("--value", "-v", required=True, help="Entity value")
     entity_parser.add_argument("--type", default="user_defined", help="Entity type")
@@ -224,9 +300,22 @@ Examples:
     entity_parser.add_argument("--output", "-o", help="Output file")
     entity_parser.add_argument("--copy", action="store_true", help="Copy result to clipboard")
 
+    # Archive command
+    archive_parser = subparsers.add_parser("archive", help="List or transform the messages in a .gap archive")
+    archive_parser.add_argument("input_file", help="File of concatenated GAP messages")
+    archive_parser.add_argument("--block", "-b", type=int, help="Only this message (default: all)")
+    archive_parser.add_argument("--target", "-t", help="Transform messages for this platform instead of listing them")
+    archive_parser.add_argument("--output", "-o", help="Output file")
+    archive_parser.add_argument("--index", action="store_true", help="Save an offset index (<file>.idx) for later reads")
+
     # List platforms command
     platforms_parser = subparsers.add_parser("platforms", help="List supported platforms")
 
+    # Build glossary command
+    glossary_parser = subparsers.add_parser("build-glossary", help="Compile a glossary for fast loading")
+    glossary_parser.add_argument("input_file", help="Glossary source (JSON definitions or one term per line)")
+    glossary_parser.add_argument("--output", "-o", required=True, help="Compiled glossary file")
+
     args = parser.parse_args()
 
     if not args.command:
@@ -286,8 +375,7 @@ Examples:
             elif args.clipboard:
                 gap_markdown = read_from_clipboard()
             elif args.input_file:
-                with open(args.input_file, "r") as f:
-                    gap_markdown = f.read()
+                gap_markdown = read_gap_file(args.input_file, args.block, args.index)
             else:
                 console.print("[red]No input provided. Use positional argument, --stdin, or --clipboard[/red]")
                 return
@@ -300,16 +388,39 @@ Examples:
             if args.context:
                 context_additions = json.loads(args.context)
 
+            targets = [target.strip() for target in args.target.split(",") if target.strip()]
+            if len(targets) > 1:
+                outputs = cli.transform_many(
+                    gap_markdown,
+                    targets,
+                    context_additions,
+                    include_metadata=not args.no_metadata
+                )
+
+                if args.output:
+                    paths = write_outputs(outputs, args.output)
+                    if not args.quiet:
+                        for target, path in paths.items():
+                            console.print(f"[green]✓ {target} transform saved to {path}[/green]")
+                else:
+                    combined = "\n\n".join(
+                        f"===== {target} =====\n{result}" for target, result in outputs.items()
+                    )
+                    if args.copy and write_to_clipboard(combined) and not args.quiet:
+                        console.print("[green]✓ Transformed content copied to clipboard[/green]")
+                    print(combined)
+                return
+
             if hasattr(args, 'no_metadata') and not USE_API:
                 # Direct mode supports no_metadata
                 result = cli.gap.transform_for_platform(
                     cli.gap.from_markdown(gap_markdown),
-                    args.target,
+                    targets[0] if targets else args.target,
                     context_additions,
                     include_metadata=not args.no_metadata
                 )
             else:
-                result = cli.transform(gap_markdown, args.target, context_additions)
+                result = cli.transform(gap_markdown, targets[0] if targets else args.target, context_additions)
 
             # Handle output
             if args.output:
@@ -332,8 +443,7 @@ Examples:
             elif args.clipboard:
                 gap_markdown = read_from_clipboard()
             elif args.input_file:
-                with open(args.input_file, "r") as f:
-                    gap_markdown = f.read()
+                gap_markdown = read_gap_file(args.input_file, args.block, args.index)
             else:
                 console.print("[red]No input provided. Use positional argument, --stdin, or --clipboard[/red]")
                 return
@@ -358,6 +468,38 @@ Examples:
             else:
                 print(result)
 
+        elif args.command == "archive":
+            from src.gap.archive import GAPArchive
+            with GAPArchive(args.input_file, save_index=args.index) as archive:
+                if args.block is not None:
+                    blocks = [(args.block, archive.block(args.block))]
+                else:
+                    blocks = enumerate(archive.iter_blocks())
+
+                invalid = []
+                out = open(args.output, "w") if args.output else sys.stdout
+                try:
+                    for index, gap_markdown in blocks:
+                        parsed = archive.gap.from_markdown(gap_markdown)
+                        if parsed is None:
+                            invalid.append(index)
+                        elif args.target:
+                            out.write(cli.transform(gap_markdown, args.target) + "\n\n")
+                        elif args.block is not None:
+                            out.write(gap_markdown + "\n")
+                        else:
+                            source = parsed.message.source
+                            out.write(f"{index}\t{source.timestamp}\t{source.platform}\t{source.role}\n")
+                finally:
+                    if args.output:
+                        out.close()
+
+                if invalid and not args.quiet:
+                    skipped = ", ".join(map(str, invalid))
+                    console.print(f"[yellow]Skipped invalid GAP messages in blocks: {skipped}[/yellow]")
+                if args.output and not args.quiet:
+                    console.print(f"[green]✓ {len(archive)} archived messages read, output saved to {args.output}[/green]")
+
         elif args.command == "platforms":
             if USE_API:
                 console.print("[yellow]Platform list not available in API mode[/yellow]")
@@ -368,6 +510,13 @@ Examples:
                 for platform in transformer.platforms:
                     console.print(f"  • {platform}")
 
+        elif args.command == "build-glossary":
+            from src.gap import GlossaryMatcher
+            glossary = GlossaryMatcher.from_file(args.input_file)
+            glossary.save(args.output)
+            if not args.quiet:
+                console.print(f"[green]✓ Compiled {len(glossary)} glossary terms to {args.output}[/green]")
+
     except Exception as e:
         console.print(f"[red]Error: {e}[/red]")
         sys.exit(1)
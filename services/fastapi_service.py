@@ -2,20 +2,161 @@
 FastAPI service for GAP Protocol
 """
 
-from fastapi import FastAPI, HTTPException
+import inspect
+import json
+import os
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, get_args, get_origin
 from datetime import datetime
+from pathlib import Path
+
+from src.gap import (
+    COMPACT_VERSION, LEGACY_VERSION, SUPPORTED_VERSIONS, CompactGraph, ContextGraph, Definition, EntityIndex,
+    EntityRecord, EntityTable, GAPArchive, GAPMessage, GAPProtocol, LRUCache, MergedContext, MessageRecord,
+    RecordInterner, WIRE_MEDIA_TYPE, Traversal, ancestors, chat_path, convert_message, decode_message, descendants, load_glossary,
+    load_platforms, neighbourhood, share_entities, to_model
+)
+from src.gap.serialization import JSON_BACKEND, RawJSON, dumps, json_array, json_object, message_json
+from src.gap.substitution import plan_cache
+
+
+class GAPJSONResponse(JSONResponse):
+    """JSON response encoded with the fast backend; RawJSON bodies are sent as-is
+
+    Endpoints return it directly, which also skips FastAPI's generic
+    jsonable_encoder pass over the payload.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _media_type(header: Optional[str]) -> str:
+    """The bare media type of a Content-Type or Accept entry"""
+    return (header or "").split(";")[0].strip().lower()
+
+
+class GAPRoute(APIRoute):
+    """Route that also accepts a GAP message in the binary wire format
+
+    A request sent as application/x-gap carries the message itself as the
+    body and the remaining request fields as query parameters. The message
+    is decoded once into ``request.state.gap_message`` and the fields are
+    handed on as the JSON body the endpoint already validates.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        body_model = next(
+            (
+                parameter.annotation for parameter in inspect.signature(self.endpoint).parameters.values()
+                if inspect.isclass(parameter.annotation) and issubclass(parameter.annotation, BaseModel)
+                and "gap_markdown" in parameter.annotation.model_fields
+            ),
+            None
+        )
+        if body_model is None:
+            return handler
+
+        async def route_handler(request: Request) -> Response:
+            if _media_type(request.headers.get("content-type")) == WIRE_MEDIA_TYPE:
+                request = await self._from_wire(request, body_model)
+            return await handler(request)
+
+        return route_handler
+
+    @staticmethod
+    async def _from_wire(request: Request, body_model) -> Request:
+        try:
+            message = decode_message(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        fields = {"gap_markdown": ""}
+        for name, field in body_model.model_fields.items():
+            if name not in request.query_params:
+                continue
+            kinds = {get_origin(arg) or arg for arg in (field.annotation, *get_args(field.annotation))}
+            if list in kinds:
+                values = request.query_params.getlist(name)
+                # Repeated or comma-separated
+                fields[name] = [item for value in values for item in value.split(",") if item]
+            elif dict in kinds:
+                try:
+                    fields[name] = json.loads(request.query_params[name])
+                except ValueError:
+                    raise HTTPException(status_code=400, detail=f"{name} must be a JSON object")
+            else:
+                fields[name] = request.query_params[name]
+
+        scope = dict(request.scope)
+        scope["headers"] = [
+            (key, value) for key, value in request.scope["headers"] if key not in (b"content-type", b"content-length")
+        ] + [(b"content-type", b"application/json")]
+        scope["state"] = {**request.scope.get("state", {}), "gap_message": message}
+        wrapped = Request(scope, request.receive)
+        wrapped._body = dumps(fields)
+        return wrapped
+
+
+def _message(
+    gap: GAPProtocol,
+    request: Request,
+    gap_markdown: str,
+    redetect: bool,
+    references: bool = False
+) -> Optional[GAPMessage]:
+    """The message sent in the wire format, or the one parsed from markdown
+
+    Markdown lists only defined entities; with references, the ambiguous
+    references in its content are detected even without redetect.
+    """
+    message = getattr(request.state, "gap_message", None)
+    if message is not None:
+        return message
+    message = gap.from_markdown(gap_markdown, redetect=redetect)
+    if message is not None and references and not redetect:
+        gap.add_references(message)
+    return message
+
+
+def _wants_wire(request: Request) -> bool:
+    return any(_media_type(accept) == WIRE_MEDIA_TYPE for accept in request.headers.get("accept", "").split(","))
+
+
+def _wire_response(gap: GAPProtocol, message: GAPMessage, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=gap.to_wire(message), media_type=WIRE_MEDIA_TYPE, headers=headers)
+
+
+def _client_version(request: Request) -> str:
+    """The protocol revision the client asked for with X-GAP-Version, 0.1.0 by default"""
+    version = request.headers.get("x-gap-version", LEGACY_VERSION).strip()
+    if version not in SUPPORTED_VERSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported GAP version {version}; expected one of {', '.join(SUPPORTED_VERSIONS)}"
+        )
+    return version
 
-from src.gap import GAPProtocol, GAPEntity, create_context_graph
+
+def _entities(message: GAPMessage) -> Dict[str, Any]:
+    return {k: v.model_dump() for k, v in message.message.context.entities.items()}
 
 app = FastAPI(
     title="GAP Protocol Service",
     description="Global Addressment Protocol for AI chat context preservation",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=GAPJSONResponse
 )
 
+# Every endpoint taking a GAP message also accepts it as application/x-gap
+app.router.route_class = GAPRoute
+
 # Enable CORS for browser-based clients
 app.add_middleware(
     CORSMiddleware,
@@ -34,74 +175,201 @@ class WrapRequest(BaseModel):
     model: Optional[str] = None
     thread_id: Optional[str] = None
     entities: Optional[Dict[str, Dict[str, str]]] = None
+    # Ids of stored messages this one replies to
+    parent_messages: Optional[List[str]] = None
 
 class TransformRequest(BaseModel):
     gap_markdown: str
     target_platform: str
     context_additions: Optional[Dict[str, str]] = None
     include_metadata: bool = True
+    # Re-run entity detection on the content to report undefined references
+    redetect: bool = False
+    # "text" or "ndjson" to stream the transformed content as it is produced
+    stream: Optional[str] = None
+    # Define undefined references from the entity index before transforming
+    fill_undefined: bool = True
+
+class MultiTransformRequest(BaseModel):
+    gap_markdown: str
+    target_platforms: List[str]
+    context_additions: Optional[Dict[str, str]] = None
+    include_metadata: bool = True
+    redetect: bool = False
+    fill_undefined: bool = True
 
 class EntityUpdateRequest(BaseModel):
     gap_markdown: str
     entity_key: str
     entity_value: str
     entity_type: str = "user_defined"
+    redetect: bool = False
+    # Id of a stored message (from /gap/wrap) to update as well
+    message_id: Optional[str] = None
 
 class LinkChatsRequest(BaseModel):
     chat_ids: List[str]
     relationship: str = "sequential"
 
-# In-memory storage for context graphs (would be a database in production)
-context_store = {}
+# Project glossary shared by every request; a compiled glossary is
+# memory-mapped, so workers start without rebuilding it
+glossary = load_glossary(os.getenv("GAP_GLOSSARY"))
+
+# Extra target platforms from a JSON config file, compiled once at startup
+load_platforms(os.getenv("GAP_PLATFORMS"))
+
+# Detection and suggestion results for recently seen content, shared by every
+# request so re-sent and round-tripped messages skip re-detection
+detection_cache = LRUCache(
+    maxsize=int(os.getenv("GAP_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("GAP_CACHE_TTL", "3600")) or None
+)
+
+# Directory of .gap archives served by /gap/archives; each is opened once and
+# reopened only when the file changes
+archive_dir = os.getenv("GAP_ARCHIVE_DIR")
+archives: Dict[str, GAPArchive] = {}
+
+# In-memory storage for context graphs (would be a database in production).
+# Messages are kept as compact-revision records and converted to the model
+# and revision each client asks for. They are encoded once per (thread, version), and a
+# thread's /gap/context body is kept until the thread changes.
+context_store: Dict[str, List[MessageRecord]] = {}
+# One entity table per thread; its stored messages keep only their keys and
+# the entries that differ from it
+thread_tables: Dict[str, EntityTable] = {}
+# Each thread's context graph and merged context, updated as messages are
+# stored or their entities change rather than rebuilt on every read
+thread_graphs: Dict[str, ContextGraph] = {}
+thread_merged: Dict[str, MergedContext] = {}
+context_json: Dict[Tuple[str, str], List[RawJSON]] = {}
+thread_responses: Dict[Tuple[str, str], RawJSON] = {}
 chat_links = {}
-message_cache = {}
+message_cache: Dict[str, MessageRecord] = {}
+
+# Stored records share their platform, role, key and type strings and
+# identical entities. The memory that saves is measured with tracemalloc
+# and re-measured only as the stores grow by a quarter.
+interner = RecordInterner()
+memory_saved: Dict[str, Any] = {}
+
+# Graph of every stored message for /gap/graph queries, built on the first
+# query and extended as messages are stored
+history_graph: Dict[str, CompactGraph] = {}
+
+# Definitions of every entity key by time, overall and per thread, for
+# /gap/entities and for filling undefined references on transform
+entity_index = EntityIndex()
 
 @app.post("/gap/wrap")
-async def wrap_message(request: WrapRequest):
+async def wrap_message(request: WrapRequest, http_request: Request):
     """Wrap a message with GAP metadata"""
+    version = _client_version(http_request)
     try:
-        gap = GAPProtocol()
-        wrapped = gap.wrap_message(
+        gap = GAPProtocol(version=COMPACT_VERSION, glossary=glossary, cache=detection_cache, interner=interner)
+        record = interner.intern(gap.wrap_record(
             content=request.content,
             platform=request.platform,
             chat_id=request.chat_id,
             role=request.role,
             model=request.model,
             thread_id=request.thread_id,
-            entities=request.entities
-        )
+            entities=request.entities,
+            parent_messages=request.parent_messages
+        ))
 
         # Cache the message
-        message_id = f"{request.platform}_{request.chat_id}_{wrapped.message.source.timestamp}"
-        message_cache[message_id] = wrapped
+        message_id = f"{request.platform}_{request.chat_id}_{record.message.source.timestamp}"
+        message_cache[message_id] = record
+        entity_index.add(record, message_id)
+        graph = history_graph.get("graph")
+        if graph is not None:
+            graph.add(record)
+
+        client_message = convert_message(to_model(record), version)
+        encoded = message_json(client_message)
 
         # Store in context store by thread
         if request.thread_id:
-            if request.thread_id not in context_store:
-                context_store[request.thread_id] = []
-            context_store[request.thread_id].append(wrapped.model_dump())
-
-        return {
+            stored = context_store.setdefault(request.thread_id, [])
+            stored.append(record)
+            table = thread_tables.setdefault(request.thread_id, EntityTable())
+            share_entities(record, table, message_id)
+            thread_graphs.setdefault(request.thread_id, ContextGraph(table)).add(record)
+            thread_merged.setdefault(request.thread_id, MergedContext(table)).add(record)
+            # Other revisions, and this one if it fell behind, are encoded on read
+            encoded_thread = context_json.setdefault((request.thread_id, version), [])
+            if len(encoded_thread) == len(stored) - 1:
+                encoded_thread.append(encoded)
+            for thread_version in SUPPORTED_VERSIONS:
+                thread_responses.pop((request.thread_id, thread_version), None)
+
+        if _wants_wire(http_request):
+            return _wire_response(gap, client_message, {"X-GAP-Message-Id": message_id})
+
+        return GAPJSONResponse(json_object({
             "status": "success",
             "message_id": message_id,
-            "gap_json": wrapped.model_dump(),
-            "gap_markdown": gap.to_markdown(wrapped),
-            "undefined_entities": gap.get_undefined_entities(wrapped),
-            "suggested_definitions": gap.suggest_definitions(wrapped)
-        }
+            "gap_json": encoded,
+            "gap_markdown": gap.to_markdown(record),
+            "undefined_entities": gap.get_undefined_entities(record),
+            "suggested_definitions": gap.suggest_definitions(record)
+        }))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _definition(definition: Definition) -> Dict[str, Any]:
+    return {
+        "value": definition.entity.value,
+        "type": definition.entity.type,
+        "timestamp": definition.timestamp,
+        "message_id": definition.message_id,
+        "thread_id": definition.thread_id
+    }
+
+def _fill_undefined(gap: GAPProtocol, parsed: GAPMessage) -> Dict[str, Dict[str, Any]]:
+    """Define a message's undefined references from the entity index, its thread's first"""
+    thread_id = parsed.message.context.thread_id
+    filled = {}
+    for key in gap.get_undefined_entities(parsed):
+        definition = entity_index.resolve(key, thread_id)
+        if definition is not None:
+            gap.update_entity(parsed, key, definition.entity.value, definition.entity.type)
+            filled[key] = _definition(definition)
+    return filled
+
 @app.post("/gap/transform")
-async def transform_message(request: TransformRequest):
+async def transform_message(request: TransformRequest, http_request: Request):
     """Transform a GAP message for a target platform"""
+    version = _client_version(http_request)
     try:
-        gap = GAPProtocol()
-        parsed = gap.from_markdown(request.gap_markdown)
+        gap = GAPProtocol(version=COMPACT_VERSION, glossary=glossary, cache=detection_cache, interner=interner)
+        parsed = _message(gap, http_request, request.gap_markdown, request.redetect, request.fill_undefined)
 
         if not parsed:
             raise HTTPException(status_code=400, detail="Invalid GAP markdown format")
 
+        original_entities = _entities(convert_message(parsed, version))
+        filled = _fill_undefined(gap, parsed) if request.fill_undefined else {}
+        # Get undefined entities
+        undefined = gap.get_undefined_entities(parsed)
+
+        if request.stream is not None:
+            if request.stream not in ("text", "ndjson"):
+                raise HTTPException(status_code=400, detail="stream must be 'text' or 'ndjson'")
+            chunks = gap.iter_transform_for_platform(
+                parsed,
+                request.target_platform,
+                request.context_additions,
+                request.include_metadata
+            )
+            if request.stream == "text":
+                return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
+            return StreamingResponse(
+                _ndjson_transform(chunks, original_entities, undefined, request.target_platform),
+                media_type="application/x-ndjson"
+            )
+
         transformed_content = gap.transform_for_platform(
             parsed,
             request.target_platform,
@@ -109,29 +377,110 @@ async def transform_message(request: TransformRequest):
             request.include_metadata
         )
 
-        # Get undefined entities
-        undefined = gap.get_undefined_entities(parsed)
-
-        return {
+        return GAPJSONResponse({
             "status": "success",
             "transformed_content": transformed_content,
-            "original_entities": {k: v.model_dump() for k, v in parsed.message.context.entities.items()},
+            "original_entities": original_entities,
             "undefined_entities": undefined,
+            "filled_entities": filled,
             "target_platform": request.target_platform
-        }
+        })
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/gap/transform/multi")
+async def transform_message_multi(request: MultiTransformRequest, http_request: Request):
+    """Transform a GAP message for several target platforms at once"""
+    version = _client_version(http_request)
+    try:
+        gap = GAPProtocol(version=COMPACT_VERSION, glossary=glossary, cache=detection_cache, interner=interner)
+        parsed = _message(gap, http_request, request.gap_markdown, request.redetect, request.fill_undefined)
+
+        if not parsed:
+            raise HTTPException(status_code=400, detail="Invalid GAP markdown format")
+
+        original_entities = _entities(convert_message(parsed, version))
+        filled = _fill_undefined(gap, parsed) if request.fill_undefined else {}
+        transformed = gap.transform_for_platforms(
+            parsed,
+            request.target_platforms,
+            request.context_additions,
+            request.include_metadata
+        )
+
+        return GAPJSONResponse({
+            "status": "success",
+            "transformed": transformed,
+            "original_entities": original_entities,
+            "undefined_entities": gap.get_undefined_entities(parsed),
+            "filled_entities": filled,
+            "target_platforms": request.target_platforms
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _ndjson_transform(chunks, original_entities, undefined, target_platform):
+    """Stream a transform as NDJSON: entity info first, then content chunks"""
+    yield dumps({
+        "type": "start",
+        "original_entities": original_entities,
+        "undefined_entities": undefined,
+        "target_platform": target_platform
+    }) + b"\n"
+    for chunk in chunks:
+        yield dumps({"type": "chunk", "content": chunk}) + b"\n"
+    yield dumps({"type": "end", "status": "success"}) + b"\n"
+
+def _update_stored_entity(
+    gap: GAPProtocol,
+    message_id: str,
+    record: MessageRecord,
+    request: EntityUpdateRequest
+) -> None:
+    """Update a stored message's entity, and its thread's definition and views"""
+    gap.update_entity(record, request.entity_key, request.entity_value, request.entity_type)
+    thread_id = record.message.context.thread_id
+    key = interner.string(request.entity_key)
+    entity = interner.entity(EntityRecord(request.entity_type, request.entity_value))
+    # The definition is made now, not when the message was
+    entity_index.define(key, entity, datetime.now().isoformat(), message_id, thread_id)
+    if not thread_id or thread_id not in thread_tables:
+        return
+
+    # The graph and merged context read definitions from the table, whose
+    # head must stay the thread's last definition: an edit to an earlier
+    # message than the one defining the key last leaves it alone
+    table = thread_tables[thread_id]
+    positions = thread_graphs[thread_id].positions
+    position = positions[message_id]
+    latest = table.defined_in(key)
+    if latest is None or positions.get(latest, -1) <= position:
+        table.set(key, entity, message_id)
+
+    # Re-encode only this message in the thread's encodings
+    for thread_version in SUPPORTED_VERSIONS:
+        encoded = context_json.get((thread_id, thread_version))
+        if encoded is not None and position < len(encoded):
+            encoded[position] = message_json(convert_message(to_model(record), thread_version))
+        thread_responses.pop((thread_id, thread_version), None)
+
 @app.post("/gap/update-entity")
-async def update_entity(request: EntityUpdateRequest):
+async def update_entity(request: EntityUpdateRequest, http_request: Request):
     """Update an entity definition in a GAP message"""
+    version = _client_version(http_request)
     try:
-        gap = GAPProtocol()
-        parsed = gap.from_markdown(request.gap_markdown)
+        gap = GAPProtocol(version=COMPACT_VERSION, glossary=glossary, cache=detection_cache, interner=interner)
+        parsed = _message(gap, http_request, request.gap_markdown, request.redetect)
 
         if not parsed:
             raise HTTPException(status_code=400, detail="Invalid GAP markdown format")
 
+        stored = None
+        if request.message_id is not None:
+            stored = message_cache.get(request.message_id)
+            if stored is None:
+                raise HTTPException(status_code=404, detail=f"Message {request.message_id} not found")
+
         # Update the entity
         updated = gap.update_entity(
             parsed,
@@ -139,11 +488,17 @@ async def update_entity(request: EntityUpdateRequest):
             request.entity_value,
             request.entity_type
         )
+        if stored is not None:
+            _update_stored_entity(gap, request.message_id, stored, request)
+        updated = convert_message(updated, version)
+
+        if _wants_wire(http_request):
+            return _wire_response(gap, updated)
 
         # Return updated markdown
         updated_markdown = gap.to_markdown(updated)
 
-        return {
+        return GAPJSONResponse({
             "status": "success",
             "updated_markdown": updated_markdown,
             "updated_entity": {
@@ -151,8 +506,10 @@ async def update_entity(request: EntityUpdateRequest):
                 "value": request.entity_value,
                 "type": request.entity_type
             },
-            "all_entities": {k: v.model_dump() for k, v in updated.message.context.entities.items()}
-        }
+            "all_entities": _entities(updated)
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -177,38 +534,261 @@ async def link_chats(request: LinkChatsRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/gap/context/{thread_id}")
-async def get_thread_context(thread_id: str):
+async def get_thread_context(thread_id: str, http_request: Request):
     """Get all context for a thread"""
+    key = (thread_id, _client_version(http_request))
     try:
-        thread_context = context_store.get(thread_id, [])
+        body = thread_responses.get(key)
+        if body is None:
+            messages = context_store.get(thread_id, [])
+            encoded = context_json.setdefault(key, []) if messages else []
+            encoded.extend(
+                message_json(convert_message(to_model(message), key[1])) for message in messages[len(encoded):]
+            )
+
+            # The thread's graph and merged context are kept up to date on write
+            graph = thread_graphs[thread_id].as_dict() if messages else None
+            merged = thread_merged[thread_id].as_dict() if messages else None
+            if merged is not None:
+                merged["entities"] = {
+                    key: {"type": entity.type, "value": entity.value, "defined_in": entity.defined_in}
+                    for key, entity in merged["entities"].items()
+                }
+
+            body = json_object({
+                "status": "success",
+                "thread_id": thread_id,
+                "message_count": len(messages),
+                "context": json_array(encoded),
+                "context_graph": graph,
+                "merged_context": merged
+            })
+            if messages:
+                thread_responses[key] = body
+
+        return GAPJSONResponse(body)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Create a context graph if we have messages
-        if thread_context:
-            from src.gap.models import GAPMessage
-            messages = [GAPMessage(**msg_data) for msg_data in thread_context]
-            graph = create_context_graph(messages)
-        else:
-            graph = None
+def _open_archive(name: str) -> GAPArchive:
+    """Return the named archive from GAP_ARCHIVE_DIR, reopening it if it changed"""
+    if not archive_dir:
+        raise HTTPException(status_code=404, detail="No archive directory configured")
+    root = Path(archive_dir).resolve()
+    path = (root / name).resolve()
+    if path.parent != root or not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Archive {name} not found")
+
+    archive = archives.get(name)
+    if archive is None or archive.stale:
+        if archive is not None:
+            archive.close()
+        archive = GAPArchive(path, gap=GAPProtocol(version=COMPACT_VERSION, glossary=glossary, cache=detection_cache, interner=interner))
+        archives[name] = archive
+    return archive
+
+@app.get("/gap/archives/{name}")
+async def get_archive(name: str):
+    """Get the number of messages in an archive"""
+    archive = _open_archive(name)
+    return {
+        "status": "success",
+        "name": name,
+        "messages": len(archive)
+    }
 
-        return {
+@app.get("/gap/archives/{name}/messages")
+async def list_archive_messages(name: str, http_request: Request, offset: int = 0, limit: int = 100):
+    """Get a page of messages from an archive"""
+    archive = _open_archive(name)
+    version = _client_version(http_request)
+    try:
+        stop = offset + max(0, min(limit, 1000))
+        messages = [
+            message_json(convert_message(archive[index], version))
+            for index in range(max(0, offset), min(stop, len(archive)))
+        ]
+        return GAPJSONResponse(json_object({
             "status": "success",
-            "thread_id": thread_id,
-            "message_count": len(thread_context),
-            "context": thread_context,
-            "context_graph": graph
-        }
+            "name": name,
+            "total": len(archive),
+            "offset": offset,
+            "messages": json_array(messages)
+        }))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/gap/archives/{name}/messages/{index}")
+async def get_archive_message(name: str, index: int, http_request: Request):
+    """Get one message from an archive by position"""
+    archive = _open_archive(name)
+    version = _client_version(http_request)
+    try:
+        gap_markdown = archive.block(index)
+    except IndexError:
+        raise HTTPException(status_code=404, detail=f"Message {index} not found in {name}")
+    try:
+        message = convert_message(archive[index], version)
+        if _wants_wire(http_request):
+            return _wire_response(archive.gap, message)
+        return GAPJSONResponse(json_object({
+            "status": "success",
+            "name": name,
+            "index": index,
+            "gap_json": message_json(message),
+            "gap_markdown": gap_markdown
+        }))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/gap/platforms")
 async def get_supported_platforms():
     """Get list of supported platforms for transformation"""
-    gap = GAPProtocol()
+    gap = GAPProtocol(version=COMPACT_VERSION, glossary=glossary, cache=detection_cache, interner=interner)
     return {
         "status": "success",
         "platforms": gap.platform_transformer.platforms
     }
 
+def _history_graph() -> CompactGraph:
+    graph = history_graph.get("graph")
+    if graph is None:
+        graph = history_graph["graph"] = CompactGraph(list(message_cache.values()))
+    return graph
+
+def _graph_message(graph: CompactGraph, message_id: str) -> int:
+    node = graph.index(message_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Message {message_id} not found")
+    return node
+
+def _graph_node(graph: CompactGraph, node: int, depth: Optional[int] = None) -> Dict[str, Any]:
+    record = graph.messages[node]
+    entry = {"id": graph.node_id(node), **graph.node(node)}
+    entry["chat_id"] = record.message.source.chat_id
+    entry["thread_id"] = record.message.context.thread_id
+    if depth is not None:
+        entry["depth"] = depth
+    return entry
+
+def _edge_types(edge_types: Optional[str]) -> Optional[List[str]]:
+    return [edge_type.strip() for edge_type in edge_types.split(",") if edge_type.strip()] if edge_types else None
+
+def _traversal(message_id: str, query, **limits) -> Dict[str, Any]:
+    """Run a traversal from a stored message and describe the nodes found"""
+    graph = _history_graph()
+    node = _graph_message(graph, message_id)
+    try:
+        found: Traversal = query(graph, node, **limits)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": "success",
+        "message_id": message_id,
+        "nodes": [_graph_node(graph, other, depth) for other, depth in found.nodes],
+        "truncated": found.truncated
+    }
+
+@app.get("/gap/graph/messages/{message_id}/ancestors")
+async def get_ancestors(
+    message_id: str,
+    max_depth: Optional[int] = None,
+    limit: int = 100,
+    edge_types: Optional[str] = None
+):
+    """Messages leading to a message: earlier thread messages and parents"""
+    return _traversal(
+        message_id, ancestors,
+        max_depth=max_depth, limit=max(0, min(limit, 1000)), edge_types=_edge_types(edge_types)
+    )
+
+@app.get("/gap/graph/messages/{message_id}/descendants")
+async def get_descendants(
+    message_id: str,
+    max_depth: Optional[int] = None,
+    limit: int = 100,
+    edge_types: Optional[str] = None
+):
+    """Messages following a message: later thread messages and replies"""
+    return _traversal(
+        message_id, descendants,
+        max_depth=max_depth, limit=max(0, min(limit, 1000)), edge_types=_edge_types(edge_types)
+    )
+
+@app.get("/gap/graph/messages/{message_id}/neighbourhood")
+async def get_neighbourhood(message_id: str, hops: int = 1, limit: int = 100, edge_types: Optional[str] = None):
+    """Messages within a number of links of a message, in either direction"""
+    return _traversal(
+        message_id, neighbourhood,
+        hops=max(0, hops), limit=max(0, min(limit, 1000)), edge_types=_edge_types(edge_types)
+    )
+
+@app.get("/gap/graph/chats/path")
+async def get_chat_path(
+    from_chat: str,
+    to_chat: str,
+    max_depth: Optional[int] = None,
+    limit: int = 10_000,
+    edge_types: Optional[str] = None
+):
+    """Shortest chain of linked messages between two chats"""
+    graph = _history_graph()
+    try:
+        path = chat_path(
+            graph, from_chat, to_chat,
+            max_depth=max_depth, limit=max(0, min(limit, 100_000)), edge_types=_edge_types(edge_types)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": "success",
+        "from_chat": from_chat,
+        "to_chat": to_chat,
+        "path": [_graph_node(graph, node) for node in path] if path is not None else None,
+        "length": len(path) - 1 if path is not None else None
+    }
+
+@app.get("/gap/entities/{key}")
+async def get_entity(
+    key: str,
+    as_of: Optional[str] = None,
+    thread_id: Optional[str] = None,
+    history: bool = False
+):
+    """Definition of an entity, currently or as of a time, overall or in a thread"""
+    if key not in entity_index:
+        raise HTTPException(status_code=404, detail=f"Entity {key} not found")
+    if as_of is not None:
+        try:
+            definition = entity_index.as_of(key, as_of, thread_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"as_of must be an ISO timestamp, not {as_of}")
+    else:
+        definition = entity_index.current(key, thread_id)
+    response = {
+        "status": "success",
+        "key": key,
+        "as_of": as_of,
+        "thread_id": thread_id,
+        "definition": _definition(definition) if definition is not None else None
+    }
+    if history:
+        response["history"] = [_definition(entry) for entry in entity_index.history(key, thread_id)]
+    return GAPJSONResponse(response)
+
+def _memory_saved() -> Dict[str, Any]:
+    """Memory interning saves across the stored messages"""
+    count = interner.interned
+    measured = memory_saved.get("messages", 0)
+    if not memory_saved or (count != measured and (measured == 0 or count >= measured * 1.25)):
+        memory_saved.update(interner.measure())
+    # In between, the measured saving per message is scaled to the stores
+    return {
+        **memory_saved,
+        "messages": count,
+        "saved_bytes": int(memory_saved["saved_per_message"] * count)
+    }
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -217,7 +797,12 @@ async def health_check():
         "version": "0.1.0",
         "cached_messages": len(message_cache),
         "active_threads": len(context_store),
-        "chat_links": len(chat_links)
+        "chat_links": len(chat_links),
+        "detection_cache": detection_cache.stats(),
+        "plan_cache": plan_cache.stats(),
+        "json_backend": JSON_BACKEND,
+        "gap_versions": list(SUPPORTED_VERSIONS),
+        "interning": {**interner.stats(), "memory_saved": _memory_saved()}
     }
 
 @app.get("/")
@@ -229,9 +814,12 @@ async def root():
         "endpoints": {
             "wrap": "POST /gap/wrap - Wrap content with GAP metadata",
             "transform": "POST /gap/transform - Transform GAP content for target platform",
+            "transform_multi": "POST /gap/transform/multi - Transform GAP content for several platforms",
             "update_entity": "POST /gap/update-entity - Update entity definitions",
             "link_chats": "POST /gap/link-chats - Link chat sessions",
             "get_context": "GET /gap/context/{thread_id} - Get thread context",
+            "entities": "GET /gap/entities/{key} - Get an entity's definition, as of a time or in a thread",
+            "archives": "GET /gap/archives/{name}/messages - Read messages from a .gap archive",
             "platforms": "GET /gap/platforms - Get supported platforms",
             "health": "GET /health - Service health check"
         }
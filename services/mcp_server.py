@@ -19,7 +19,7 @@ except ImportError:
     exit(1)
 
 # Import our GAP protocol
-from src.gap import GAPProtocol
+from src.gap import GAPProtocol, MessageRecord, to_model
 
 class GAPMCPServer:
     def __init__(self):
@@ -27,6 +27,12 @@ class GAPMCPServer:
         self.gap = GAPProtocol()
         self.context_store = {}
 
+    @staticmethod
+    def _record_json(value: Any) -> Dict[str, Any]:
+        if isinstance(value, MessageRecord):
+            return to_model(value).model_dump()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
     async def setup_handlers(self):
         """Setup MCP server handlers"""
 
@@ -46,7 +52,8 @@ class GAPMCPServer:
         async def read_resource(uri: str) -> str:
             """Read GAP resource content"""
             if uri == "gap://context-store":
-                return json.dumps(self.context_store, indent=2)
+                # Stored records become models only when read
+                return json.dumps(self.context_store, indent=2, default=self._record_json)
             else:
                 raise ValueError(f"Unknown resource: {uri}")
 
@@ -102,7 +109,7 @@ class GAPMCPServer:
 
             if name == "gap_wrap_message":
                 try:
-                    wrapped = self.gap.wrap_message(**arguments)
+                    wrapped = self.gap.wrap_record(**arguments)
                     markdown = self.gap.to_markdown(wrapped)
 
                     # Store in context
@@ -111,7 +118,7 @@ class GAPMCPServer:
                         self.context_store[thread_id] = []
 
                     self.context_store[thread_id].append({
-                        'wrapped_message': wrapped.dict(),
+                        'wrapped_message': wrapped,
                         'markdown': markdown,
                         'timestamp': wrapped.message.source.timestamp
                     })
@@ -129,7 +136,7 @@ class GAPMCPServer:
 
             elif name == "gap_transform_message":
                 try:
-                    parsed = self.gap.from_markdown(arguments['gap_markdown'])
+                    parsed = self.gap.markdown_record(arguments['gap_markdown'])
                     if not parsed:
                         raise ValueError("Invalid GAP markdown format")
 
@@ -4,17 +4,49 @@ GAP (Global Addressment Protocol) - Core Package
 A protocol for preserving context and continuity across AI conversations.
 """
 
-from .protocol import GAPProtocol, create_context_graph
+from .protocol import ContextGraph, GAPProtocol, create_context_graph
+from .compact_graph import CompactGraph
+from .traversal import Traversal, ancestors, chat_path, descendants, neighbourhood
 from .models import (
     GAPMessage,
     GAPMessageContent,
     GAPSource,
     GAPContext,
     GAPEntity,
+    GAPEntityEvent,
     GAPTransformHints,
 )
+from .records import (
+    EntityRecord,
+    SourceRecord,
+    ContextRecord,
+    TransformHintsRecord,
+    MessageContentRecord,
+    MessageRecord,
+    to_model,
+    to_record,
+)
+from .interning import RecordInterner
+from .entity_tables import EntityTable, EntityView, share_entities
+from .entity_index import Definition, EntityIndex
 from .entities import EntityDetector, PronounTransformer
-from .transformers import PlatformTransformer, ContextMerger
+from .glossary import GlossaryMatcher, load_glossary
+from .streaming import StreamingDetector
+from .archive import GAPArchive
+from .batch import detection_pool
+from .cache import LRUCache
+from .substitution import SubstitutionPlan
+from .platforms import PlatformRegistry, PlatformRenderer
+from .transformers import PlatformTransformer, ContextMerger, MergedContext, load_platforms
+from .revisions import (
+    COMPACT_VERSION,
+    LEGACY_VERSION,
+    SUPPORTED_VERSIONS,
+    convert_message,
+    downgrade_message,
+    upgrade_message,
+)
+from .wire import WIRE_MEDIA_TYPE, decode_message, encode_message
 
 __version__ = "0.1.0"
 __all__ = [
@@ -24,10 +56,52 @@ __all__ = [
     "GAPSource",
     "GAPContext",
     "GAPEntity",
+    "GAPEntityEvent",
     "GAPTransformHints",
+    "EntityRecord",
+    "SourceRecord",
+    "ContextRecord",
+    "TransformHintsRecord",
+    "MessageContentRecord",
+    "MessageRecord",
+    "to_model",
+    "to_record",
+    "RecordInterner",
+    "EntityTable",
+    "EntityView",
+    "share_entities",
+    "Definition",
+    "EntityIndex",
     "EntityDetector",
     "PronounTransformer",
+    "GlossaryMatcher",
+    "load_glossary",
+    "StreamingDetector",
+    "GAPArchive",
+    "detection_pool",
+    "LRUCache",
+    "SubstitutionPlan",
     "PlatformTransformer",
+    "PlatformRegistry",
+    "PlatformRenderer",
+    "load_platforms",
     "ContextMerger",
+    "MergedContext",
+    "LEGACY_VERSION",
+    "COMPACT_VERSION",
+    "SUPPORTED_VERSIONS",
+    "upgrade_message",
+    "downgrade_message",
+    "convert_message",
+    "WIRE_MEDIA_TYPE",
+    "encode_message",
+    "decode_message",
+    "ContextGraph",
     "create_context_graph",
+    "CompactGraph",
+    "Traversal",
+    "ancestors",
+    "descendants",
+    "neighbourhood",
+    "chat_path",
 ]
@@ -0,0 +1,172 @@
+"""
+Memory-mapped reading of multi-message .gap archives
+"""
+
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple, Union
+
+from .models import GAPMessage
+
+if TYPE_CHECKING:
+    from .protocol import GAPProtocol
+
+_DELIMITER = re.compile(rb"\[GAP:(START|END)\]")
+
+# Offsets are written in native byte order, which the magic records; an
+# index from a host of the other order is rebuilt like a stale one
+_INDEX_MAGIC = b"GAPIDX" + (b"L1" if sys.byteorder == "little" else b"B1")
+# magic, archive size, archive mtime in ns, block count
+_INDEX_HEADER = struct.Struct("<8sQQQ")
+
+
+class GAPArchive:
+    """Random and sequential access to the blocks of a .gap archive
+
+    An archive is any number of ``[GAP:START] ... [GAP:END]`` blocks, as
+    written by ``to_markdown``, one after another. The file is memory-mapped
+    and scanned once for delimiters. The start and end offset of every
+    block go to a sidecar index (``<archive>.idx``), which later opens reuse
+    while the archive's size and modification time still match; with
+    ``save_index=False`` a valid index is still used but none is written. Blocks are
+    decoded and parsed only when asked for, so memory use does not grow with
+    the archive.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        gap: Optional["GAPProtocol"] = None,
+        index_path: Optional[Union[str, Path]] = None,
+        save_index: bool = True
+    ):
+        self.path = Path(path)
+        self.index_path = Path(index_path) if index_path else self.path.with_name(self.path.name + ".idx")
+        self._gap = gap
+
+        stat = os.stat(self.path)
+        self._stamp = (stat.st_size, stat.st_mtime_ns)
+        self._mapped: Optional[mmap.mmap] = None
+        if stat.st_size:
+            with open(self.path, "rb") as f:
+                self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._index_map: Optional[mmap.mmap] = None
+        self._offsets = self._load_index()
+        if self._offsets is None:
+            self._offsets = self._scan()
+            if save_index:
+                self._save_index()
+
+    @property
+    def gap(self) -> "GAPProtocol":
+        """Protocol used to parse blocks, created on first use"""
+        if self._gap is None:
+            from .protocol import GAPProtocol
+            self._gap = GAPProtocol()
+        return self._gap
+
+    @property
+    def stale(self) -> bool:
+        """Whether the file has changed since it was opened"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) != self._stamp
+
+    def __len__(self) -> int:
+        return len(self._offsets) // 2
+
+    def __getitem__(self, index: int) -> GAPMessage:
+        message = self.gap.from_markdown(self.block(index))
+        if message is None:
+            raise ValueError(f"Block {index} of {self.path} is not a valid GAP message")
+        return message
+
+    def __iter__(self) -> Iterator[GAPMessage]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __enter__(self) -> "GAPArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """Byte offsets of a block, from [GAP:START] to the end of [GAP:END]"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("archive block index out of range")
+        return self._offsets[2 * index], self._offsets[2 * index + 1]
+
+    def block(self, index: int) -> str:
+        """Return the markdown of one block"""
+        start, end = self.span(index)
+        return self._mapped[start:end].decode("utf-8")
+
+    def iter_blocks(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """Yield block markdown lazily, in file order"""
+        for index in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield self.block(index)
+
+    def close(self) -> None:
+        """Release the memory maps"""
+        if self._index_map is not None:
+            self._offsets.release()
+            self._offsets = array("Q")
+            self._index_map.close()
+            self._index_map = None
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    def _scan(self) -> array:
+        """Find every block's offsets in one pass over the file"""
+        offsets = array("Q")
+        if self._mapped is None:
+            return offsets
+
+        start = None
+        for match in _DELIMITER.finditer(self._mapped):
+            if match.group(1) == b"START":
+                # A block without an end is dropped at the next start
+                start = match.start()
+            elif start is not None:
+                offsets.append(start)
+                offsets.append(match.end())
+                start = None
+        return offsets
+
+    def _load_index(self) -> Optional[memoryview]:
+        """Map a sidecar index that still matches the archive, or return None"""
+        try:
+            with open(self.index_path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mapped) >= _INDEX_HEADER.size:
+            magic, size, mtime_ns, count = _INDEX_HEADER.unpack_from(mapped)
+            body = len(mapped) - _INDEX_HEADER.size
+            if magic == _INDEX_MAGIC and (size, mtime_ns) == self._stamp and body == count * 16:
+                self._index_map = mapped
+                return memoryview(mapped)[_INDEX_HEADER.size:].cast("Q")
+        mapped.close()
+        return None
+
+    def _save_index(self) -> None:
+        """Write the sidecar index; an unwritable location only costs a rescan"""
+        try:
+            with open(self.index_path, "wb") as f:
+                f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, *self._stamp, len(self)))
+                f.write(self._offsets.tobytes())
+        except OSError:
+            pass
@@ -0,0 +1,106 @@
+"""
+Batch entity detection across a process pool
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Type, Union
+
+from .glossary import GlossaryMatcher
+from .records import EntityRecord
+
+if TYPE_CHECKING:
+    from .entities import EntityDetector
+
+DetectionResult = Dict[str, EntityRecord]
+
+# Messages sent to a worker per task
+DEFAULT_CHUNK_SIZE = 256
+
+# Detector built once per worker process by _init_worker
+_worker_detector: Optional["EntityDetector"] = None
+
+
+def _glossary_source(glossary: Optional[GlossaryMatcher]) -> Union[str, bytes, None]:
+    """Describe a glossary so workers can open their own copy"""
+    if glossary is None:
+        return None
+    # A memory-mapped glossary is reopened by path, sharing its pages
+    return glossary.path or glossary.to_bytes()
+
+
+def _init_worker(detector_cls: Type["EntityDetector"], glossary_source: Union[str, bytes, None]):
+    """Build the worker's detector; its pattern tables compile on import"""
+    global _worker_detector
+    glossary = None
+    if isinstance(glossary_source, str):
+        glossary = GlossaryMatcher.load(glossary_source)
+    elif glossary_source is not None:
+        glossary = GlossaryMatcher(glossary_source)
+    _worker_detector = detector_cls(glossary=glossary)
+
+
+def _detect_chunk(contents: List[str]) -> List[DetectionResult]:
+    """Detect entities for one chunk of messages inside a worker"""
+    return [_worker_detector.detect_entities(content) for content in contents]
+
+
+def _chunks(contents: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Split contents into lists of at most size items"""
+    iterator = iter(contents)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def detection_pool(
+    detector: "EntityDetector",
+    max_workers: Optional[int] = None
+) -> ProcessPoolExecutor:
+    """Create a process pool whose workers each hold a copy of detector
+
+    The detector's class and glossary are sent once per worker at startup,
+    not with every task. Reuse the pool across batches to avoid paying for
+    worker startup each time.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(type(detector), _glossary_source(detector.glossary))
+    )
+
+
+def detect_batch(
+    detector: "EntityDetector",
+    contents: Iterable[str],
+    pool: Optional[ProcessPoolExecutor] = None,
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[DetectionResult]:
+    """Detect entities for many messages, in input order
+
+    Work is split into chunks of ``chunk_size`` messages and fanned out to
+    ``pool`` (see ``detection_pool``), or to a pool created for this call.
+    A batch that fits in a single chunk is detected in-process.
+    """
+    chunks = _chunks(contents, chunk_size)
+    first = next(chunks, [])
+    second = next(chunks, None)
+    if second is None:
+        return [detector.detect_entities(content) for content in first]
+
+    def all_chunks() -> Iterator[List[str]]:
+        yield first
+        yield second
+        yield from chunks
+
+    owned = pool is None
+    if owned:
+        pool = detection_pool(detector, max_workers)
+    try:
+        results = []
+        for chunk_results in pool.map(_detect_chunk, all_chunks()):
+            results.extend(chunk_results)
+        return results
+    finally:
+        if owned:
+            pool.shutdown()
@@ -0,0 +1,484 @@
+"""
+Compact, array-backed context graphs for large message histories
+
+create_context_graph returns nested dicts: every node costs several
+dicts, its id string and a content preview. CompactGraph numbers nodes
+from 0 in message order and keeps their attributes in typed columns and
+their edges in CSR form (compressed sparse rows), about seventy bytes
+per message. as_dict renders the create_context_graph shape
+when it is needed.
+
+Columns are NumPy arrays when NumPy is installed and ``array.array``
+otherwise; both index and slice the same way.
+"""
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .entity_tables import EntityTable
+from .records import AnyMessage
+
+try:
+    import numpy as np
+except ImportError:  # optional: pip install gap-protocol[graph]
+    np = None
+
+# Edge types, by the id stored in the kind columns
+EDGE_TYPES = ("thread_connection", "parent")
+THREAD_EDGE = 0
+PARENT_EDGE = 1
+
+# Column types: int8, int16, int32 and int64
+_DTYPES = {"b": "int8", "h": "int16", "i": "int32", "q": "int64"}
+
+# Nodes the overflow holds at least before it is compacted
+_MIN_OVERFLOW = 1024
+
+# Timestamps are stored as microseconds since this naive epoch
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _column(values: array) -> Sequence[int]:
+    """A finished column: a NumPy view of the array when NumPy is installed"""
+    if np is None:
+        return values
+    dtype = _DTYPES[values.typecode]
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype)
+
+
+def _micros(timestamp: str) -> Optional[int]:
+    """Microseconds since the epoch of a naive ISO timestamp that formats back the same"""
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != timestamp:
+        return None
+    delta = parsed - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _format(micros: int) -> str:
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _csr(
+    count: int,
+    sources: array,
+    targets: array,
+    kinds: array
+) -> Tuple[Sequence[int], Sequence[int], Sequence[int]]:
+    """Row pointers, targets and kinds of edges grouped by source, keeping their order"""
+    if np is not None:
+        source_column = _column(sources)
+        order = np.argsort(source_column, kind="stable")
+        indptr = np.zeros(count + 1, dtype="int64")
+        np.cumsum(np.bincount(source_column, minlength=count), out=indptr[1:])
+        return indptr, _column(targets)[order], _column(kinds)[order]
+
+    # Counting sort
+    indptr = array("q", bytes(8 * (count + 1)))
+    for source in sources:
+        indptr[source + 1] += 1
+    for index in range(count):
+        indptr[index + 1] += indptr[index]
+    fill = array("q", indptr)
+    ordered_targets = array("i", bytes(4 * len(targets)))
+    ordered_kinds = array("b", bytes(len(kinds)))
+    for source, target, kind in zip(sources, targets, kinds):
+        position = fill[source]
+        ordered_targets[position] = target
+        ordered_kinds[position] = kind
+        fill[source] = position + 1
+    return indptr, ordered_targets, ordered_kinds
+
+
+def _array(typecode: str, column: Sequence[int]) -> array:
+    """A growable copy of a column"""
+    if np is not None and not isinstance(column, array):
+        values = array(typecode)
+        values.frombytes(np.ascontiguousarray(column, dtype=_DTYPES[typecode]).tobytes())
+        return values
+    return array(typecode, column)
+
+
+def _edge_list(
+    count: int,
+    indptr: Sequence[int],
+    indices: Sequence[int],
+    kinds: Sequence[int],
+    overflow: Dict[int, List[Tuple[int, int]]]
+) -> Tuple[array, array, array]:
+    """Sources, targets and kinds of the CSR edges of count nodes, then of the overflow's"""
+    if np is not None:
+        sources = _array("i", np.repeat(np.arange(count, dtype="int32"), np.diff(indptr)))
+    else:
+        sources = array("i")
+        for node in range(count):
+            sources.extend([node] * (indptr[node + 1] - indptr[node]))
+    targets, edge_kinds = _array("i", indices), _array("b", kinds)
+    for source, edges in overflow.items():
+        for target, kind in edges:
+            sources.append(source)
+            targets.append(target)
+            edge_kinds.append(kind)
+    return sources, targets, edge_kinds
+
+
+class _Names:
+    """Ids for repeated strings, in order of first appearance"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def id(self, name: str) -> int:
+        found = self.ids.get(name)
+        if found is None:
+            found = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return found
+
+
+class CompactGraph:
+    """Context graph of a list of messages in typed columns and CSR edges
+
+    Nodes are the messages' positions. Edges are those of ContextGraph: to
+    the previous message of the thread, and from each listed parent. Both
+    directions are indexed, so successors and predecessors of a node are a
+    slice each. Messages are kept by reference, for content previews only.
+
+    Messages added later go to an overflow: their attributes in a list and
+    their edges in per-node lists next to the CSR arrays. Once the overflow
+    outgrows a quarter of the compacted nodes, it is folded into the
+    columns, so adding a message costs amortised constant time.
+    """
+
+    def __init__(self, messages: Sequence[AnyMessage], table: Optional[EntityTable] = None):
+        self.messages = list(messages)
+        self.table = table
+
+        platforms, roles, chats, threads = _Names(), _Names(), _Names(), _Names()
+        platform_ids, role_ids, chat_ids, thread_ids = array("i"), array("h"), array("i"), array("i")
+        timestamps = array("q")
+        # Timestamps that are not naive ISO timestamps, by node
+        self.raw_timestamps: Dict[int, str] = {}
+
+        sources, targets, kinds = array("i"), array("i"), array("b")
+        last_in_thread: Dict[int, Tuple[int, str]] = {}
+        parents: List[Tuple[int, str]] = []
+        hashes = array("q")
+
+        for index, msg in enumerate(self.messages):
+            message = msg.message
+            source = message.source
+            context = message.context
+
+            platform_ids.append(platforms.id(source.platform))
+            role_ids.append(roles.id(source.role))
+            chat_ids.append(chats.id(source.chat_id))
+            micros = _micros(source.timestamp)
+            if micros is None:
+                self.raw_timestamps[index] = source.timestamp
+                micros = 0
+            timestamps.append(micros)
+
+            node_id = f"{source.platform}_{source.chat_id}_{source.timestamp}"
+            hashes.append(hash(node_id))
+
+            if context.thread_id:
+                thread = threads.id(context.thread_id)
+                thread_ids.append(thread)
+                previous = last_in_thread.get(thread)
+                if previous is not None and previous[1] != node_id:
+                    sources.append(previous[0])
+                    targets.append(index)
+                    kinds.append(THREAD_EDGE)
+                last_in_thread[thread] = (index, node_id)
+            else:
+                thread_ids.append(-1)
+
+            for parent_id in context.parent_messages:
+                if parent_id != node_id:
+                    parents.append((index, parent_id))
+
+        self._platforms, self._roles, self._chats, self._threads = platforms, roles, chats, threads
+        self.platforms, self.roles = platforms.names, roles.names
+        self.chats, self.threads = chats.names, threads.names
+        self._thread_index = threads.ids
+        self._chat_index = chats.ids
+        self._last_in_thread = last_in_thread
+        # Children waiting for a parent not added yet
+        self._waiting: Dict[str, List[int]] = {}
+        # Nodes of each chat, grouped on first use
+        self._chat_nodes: Optional[Dict[int, array]] = None
+        self.platform_ids = _column(platform_ids)
+        self.role_ids = _column(role_ids)
+        self.chat_ids = _column(chat_ids)
+        self.thread_ids = _column(thread_ids)
+        self.timestamps = _column(timestamps)
+        self._index_hashes(hashes)
+
+        # Overflow: attributes of nodes added since the last compaction, as
+        # (platform, role, chat, thread, timestamp) ids, and their edges
+        self.compacted = len(self.messages)
+        self._added: List[Tuple[int, int, int, int, int]] = []
+        self._added_ids: Dict[str, int] = {}
+        self._added_chats: Dict[int, List[int]] = {}
+        self._added_threads: Dict[int, List[int]] = {}
+        self.out_overflow: Dict[int, List[Tuple[int, int]]] = {}
+        self.in_overflow: Dict[int, List[Tuple[int, int]]] = {}
+        self._overflow_edges = 0
+
+        for index, parent_id in parents:
+            parent = self.index(parent_id)
+            if parent is not None:
+                sources.append(parent)
+                targets.append(index)
+                kinds.append(PARENT_EDGE)
+            else:
+                self._waiting.setdefault(parent_id, []).append(index)
+
+        count = len(self.messages)
+        self.indptr, self.indices, self.kinds = _csr(count, sources, targets, kinds)
+        self.in_indptr, self.in_indices, self.in_kinds = _csr(count, targets, sources, kinds)
+
+    def _index_hashes(self, hashes: array) -> None:
+        """Node ids are found by hash: hashes sorted, with the node each came from"""
+        if np is not None:
+            hash_column = _column(hashes)
+            self._order = np.argsort(hash_column, kind="stable")
+            self._hashes = hash_column[self._order]
+        else:
+            self._order = array("i", sorted(range(len(hashes)), key=hashes.__getitem__))
+            self._hashes = array("q", (hashes[index] for index in self._order))
+
+    def add(self, msg: AnyMessage) -> int:
+        """Add a message as the next node, returning it"""
+        message = msg.message
+        source = message.source
+        context = message.context
+        node = len(self.messages)
+        self.messages.append(msg)
+
+        micros = _micros(source.timestamp)
+        if micros is None:
+            self.raw_timestamps[node] = source.timestamp
+            micros = 0
+        chat = self._chats.id(source.chat_id)
+        thread = self._threads.id(context.thread_id) if context.thread_id else -1
+        self._added.append((self._platforms.id(source.platform), self._roles.id(source.role), chat, thread, micros))
+        self._added_chats.setdefault(chat, []).append(node)
+
+        node_id = f"{source.platform}_{source.chat_id}_{source.timestamp}"
+        self._added_ids[node_id] = node
+
+        if thread >= 0:
+            self._added_threads.setdefault(thread, []).append(node)
+            previous = self._last_in_thread.get(thread)
+            if previous is not None and previous[1] != node_id:
+                self._link(previous[0], node, THREAD_EDGE)
+            self._last_in_thread[thread] = (node, node_id)
+
+        for parent_id in context.parent_messages:
+            if parent_id == node_id:
+                continue
+            parent = self.index(parent_id)
+            if parent is not None:
+                self._link(parent, node, PARENT_EDGE)
+            else:
+                self._waiting.setdefault(parent_id, []).append(node)
+        for child in self._waiting.pop(node_id, ()):
+            self._link(node, child, PARENT_EDGE)
+
+        if len(self._added) > max(_MIN_OVERFLOW, self.compacted // 4):
+            self.compact()
+        return node
+
+    def _link(self, source: int, target: int, kind: int) -> None:
+        self.out_overflow.setdefault(source, []).append((target, kind))
+        self.in_overflow.setdefault(target, []).append((source, kind))
+        self._overflow_edges += 1
+
+    def compact(self) -> None:
+        """Fold the overflow into the columns and CSR arrays"""
+        added = self._added
+        if not added and not self._overflow_edges:
+            return
+        count = len(self.messages)
+        hashes = _array("q", self._hashes)
+        node_hashes = array("q", bytes(8 * self.compacted))
+        for position, node in enumerate(self._order):
+            node_hashes[int(node)] = hashes[position]
+        for msg in self.messages[self.compacted:]:
+            source = msg.message.source
+            node_hashes.append(hash(f"{source.platform}_{source.chat_id}_{source.timestamp}"))
+
+        columns = ("platform_ids", "i"), ("role_ids", "h"), ("chat_ids", "i"), ("thread_ids", "i"), ("timestamps", "q")
+        for field, (name, typecode) in enumerate(columns):
+            values = _array(typecode, getattr(self, name))
+            values.extend(attributes[field] for attributes in added)
+            setattr(self, name, _column(values))
+        self._index_hashes(node_hashes)
+
+        self.indptr, self.indices, self.kinds = _csr(
+            count, *_edge_list(self.compacted, self.indptr, self.indices, self.kinds, self.out_overflow)
+        )
+        self.in_indptr, self.in_indices, self.in_kinds = _csr(
+            count, *_edge_list(self.compacted, self.in_indptr, self.in_indices, self.in_kinds, self.in_overflow)
+        )
+
+        if self._chat_nodes is not None:
+            for chat, nodes in self._added_chats.items():
+                self._chat_nodes.setdefault(chat, array("i")).extend(nodes)
+
+        self.compacted = count
+        self._added = []
+        self._added_ids = {}
+        self._added_chats = {}
+        self._added_threads = {}
+        self.out_overflow = {}
+        self.in_overflow = {}
+        self._overflow_edges = 0
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) + self._overflow_edges
+
+    def _value(self, column: Sequence[int], field: int, node: int) -> int:
+        if node < self.compacted:
+            return int(column[node])
+        return self._added[node - self.compacted][field]
+
+    def timestamp(self, node: int) -> str:
+        raw = self.raw_timestamps.get(node)
+        return raw if raw is not None else _format(self._value(self.timestamps, 4, node))
+
+    def node_id(self, node: int) -> str:
+        """The string id create_context_graph gives a node"""
+        platform = self.platforms[self._value(self.platform_ids, 0, node)]
+        return f"{platform}_{self.chats[self._value(self.chat_ids, 2, node)]}_{self.timestamp(node)}"
+
+    def index(self, node_id: str) -> Optional[int]:
+        """The node with a string id, the last one if several share it"""
+        found = self._added_ids.get(node_id)
+        if found is not None:
+            return found
+        target = hash(node_id)
+        hashes = self._hashes
+        position = int(np.searchsorted(hashes, target)) if np is not None else bisect_left(hashes, target)
+        while position < len(hashes) and hashes[position] == target:
+            node = int(self._order[position])
+            if (found is None or node > found) and self.node_id(node) == node_id:
+                found = node
+            position += 1
+        return found
+
+    def successors(self, node: int) -> List[int]:
+        return [target for target, _ in self._edges(node, True)]
+
+    def predecessors(self, node: int) -> List[int]:
+        return [source for source, _ in self._edges(node, False)]
+
+    def out_edges(self, node: int) -> List[Tuple[int, str]]:
+        """Targets of a node's edges with their types"""
+        return [(target, EDGE_TYPES[kind]) for target, kind in self._edges(node, True)]
+
+    def _edges(self, node: int, forward: bool) -> List[Tuple[int, int]]:
+        """A node's neighbours in one direction, with the kinds of the edges"""
+        if forward:
+            indptr, indices, kinds, overflow = self.indptr, self.indices, self.kinds, self.out_overflow
+        else:
+            indptr, indices, kinds, overflow = self.in_indptr, self.in_indices, self.in_kinds, self.in_overflow
+        edges = []
+        if node < self.compacted:
+            start, stop = int(indptr[node]), int(indptr[node + 1])
+            edges = list(zip(indices[start:stop].tolist(), kinds[start:stop].tolist()))
+        edges.extend(overflow.get(node, ()))
+        return edges
+
+    def thread_nodes(self, thread_id: str) -> List[int]:
+        """A thread's nodes in order"""
+        thread = self._thread_index.get(thread_id)
+        if thread is None:
+            return []
+        if np is not None:
+            nodes = np.flatnonzero(self.thread_ids == thread).tolist()
+        else:
+            nodes = [node for node, value in enumerate(self.thread_ids) if value == thread]
+        return nodes + self._added_threads.get(thread, [])
+
+    def chat_nodes(self, chat_id: str) -> List[int]:
+        """A chat's nodes in order"""
+        chat = self._chat_index.get(chat_id)
+        if chat is None:
+            return []
+        if self._chat_nodes is None:
+            groups: Dict[int, array] = {}
+            for node, value in enumerate(self.chat_ids.tolist()):
+                groups.setdefault(value, array("i")).append(node)
+            self._chat_nodes = groups
+        nodes = self._chat_nodes.get(chat)
+        return (nodes.tolist() if nodes is not None else []) + self._added_chats.get(chat, [])
+
+    def node(self, node: int) -> Dict[str, Any]:
+        """A node's attributes as create_context_graph gives them"""
+        return {
+            "platform": self.platforms[self._value(self.platform_ids, 0, node)],
+            "content": self.messages[node].message.content[:100] + "...",
+            "timestamp": self.timestamp(node),
+            "role": self.roles[self._value(self.role_ids, 1, node)]
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The graph in the shape create_context_graph returns
+
+        It has the same nodes and edges, but edges are listed by source node
+        rather than in the order messages were added.
+        """
+        ids = [self.node_id(node) for node in range(len(self))]
+        nodes: Dict[str, Dict[str, Any]] = {}
+        adjacency: Dict[str, List[str]] = {}
+        for node, node_id in enumerate(ids):
+            nodes[node_id] = self.node(node)
+            adjacency.setdefault(node_id, [])
+
+        # Edges grouped by source node
+        edges = []
+        for node, node_id in enumerate(ids):
+            for target, edge_type in self.out_edges(node):
+                adjacency[node_id].append(ids[target])
+                edges.append({"from": node_id, "to": ids[target], "type": edge_type})
+
+        threads: Dict[str, List[str]] = {}
+        for node in range(len(self)):
+            thread = self._value(self.thread_ids, 3, node)
+            if thread >= 0:
+                threads.setdefault(self.threads[thread], []).append(ids[node])
+
+        if self.table is not None:
+            table = self.table
+            entity_definitions = {
+                key: {"value": entity.value, "type": entity.type, "defined_in": table.defined_in(key)}
+                for key, entity in table.current.items()
+            }
+        else:
+            entity_definitions = {}
+            for node_id, msg in zip(ids, self.messages):
+                for key, entity in msg.message.context.entities.items():
+                    if entity.value != "[NEEDS_DEFINITION]":
+                        entity_definitions[key] = {"value": entity.value, "type": entity.type, "defined_in": node_id}
+
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "adjacency": adjacency,
+            "threads": threads,
+            "entity_definitions": entity_definitions,
+            "timeline": ids
+        }
@@ -2,9 +2,243 @@
 Entity detection and management for GAP Protocol
 """
 
+import hashlib
 import re
-from typing import Dict, List, Optional, Tuple
-from .models import GAPEntity
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .records import UNDEFINED_ENTITY, EntityRecord, entity_record
+from .glossary import GlossaryMatcher
+from .batch import DEFAULT_CHUNK_SIZE, detect_batch
+from .substitution import SubstitutionPlan, _trie_regex, plan_cache, plan_key
+
+
+# An ambiguous pattern that is nothing but a literal phrase between word
+# boundaries; these are folded into one trie-shaped alternation
+_LITERAL_PHRASE = re.compile(r"^\\b([\w ]+)\\b$")
+
+# The words a keyword pattern must start with: one word, or a group of
+# alternative words, not made optional or repeated
+_LEADING_WORDS = re.compile(r"\\b(?:\(([A-Za-z]+(?:\|[A-Za-z]+)*)\)|([A-Za-z]+))(?![?*+{|])")
+
+
+def _leading_words(pattern: str) -> Optional[List[str]]:
+    """Words one of which starts every match of pattern, if they can be told"""
+    match = _LEADING_WORDS.match(pattern)
+    if match is None or "|" in pattern[match.end():]:
+        return None
+    return (match.group(1) or match.group(2)).split("|")
+
+
+def _findall_value(groups: Tuple[Optional[str], ...], whole: str) -> str:
+    """Reproduce the value re.findall would report for a match"""
+    if not groups:
+        return whole
+    if len(groups) == 1:
+        return groups[0] or ""
+    return " ".join(group or "" for group in groups)
+
+
+# A word introducing a definition, followed by whitespace and at least one
+# more character of the same sentence
+_COPULA = re.compile(r"(?:is|are|was|were|means|refers to|represents)(?=\s[^.])", re.IGNORECASE)
+
+# Phrases the suggestion scan matches as literals; others are searched alone
+_PLAIN_PHRASE = re.compile(r"[\w ]+")
+
+
+@lru_cache(maxsize=256)
+def _phrase_finder(phrases: Tuple[str, ...]) -> Tuple[re.Pattern, Dict[int, Tuple[str, ...]]]:
+    """Compile a zero-width scan that stops wherever one of phrases starts
+
+    Returns the pattern and, per marker group index, the phrases that start
+    at a position where that group matched: its own phrase and any phrase
+    it begins with, which the longest-first trie would otherwise hide.
+    """
+    named = [(phrase, f"p{index}") for index, phrase in enumerate(phrases)]
+    pattern = re.compile(f"(?={_trie_regex(named, boundary=False)})", re.IGNORECASE)
+    found = {
+        pattern.groupindex[group_name]: tuple(other for other in phrases if phrase.startswith(other))
+        for phrase, group_name in named
+    }
+    return pattern, found
+
+
+class _EntityScanner:
+    """Compiled form of an EntityDetector's pattern tables
+
+    Every literal ambiguous phrase and every keyword-anchored technical
+    pattern is matched by a single combined regex in one pass over the
+    content, which only runs when one of those phrases or keywords occurs
+    in it. Technical patterns that can overlap other matches keep their
+    own scan, but only run when their trigger text is present.
+    """
+
+    def __init__(
+        self,
+        ambiguous_patterns: Dict[str, str],
+        tech_patterns: Dict[str, List[Tuple[str, str]]],
+        keyword_types: Tuple[str, ...],
+        tech_triggers: Dict[str, str]
+    ):
+        # Identifies this table configuration in cached detection results
+        self.digest = hashlib.blake2b(
+            repr((ambiguous_patterns, tech_patterns, keyword_types, tech_triggers)).encode(),
+            digest_size=8
+        ).hexdigest()
+
+        self.separate_ambiguous: List[Tuple[str, re.Pattern]] = []
+        self.tech_types: List[str] = []
+        self.separate_tech: List[Tuple[int, re.Pattern, Optional[str]]] = []
+
+        phrases = []
+        group_names: Dict[str, str] = {}
+        for index, (entity_key, pattern) in enumerate(ambiguous_patterns.items()):
+            literal = _LITERAL_PHRASE.match(pattern)
+            if literal:
+                group_name = f"a{index}"
+                phrases.append((literal.group(1), group_name))
+                group_names[group_name] = entity_key
+            else:
+                self.separate_ambiguous.append((entity_key, re.compile(pattern, re.IGNORECASE)))
+
+        # Longest text a literal phrase matches; other patterns are unbounded
+        self.longest_phrase = max((len(phrase) for phrase, _ in phrases), default=0)
+
+        # The literal phrases alone, for finding references without the
+        # technical patterns
+        self.references = None
+        self.reference_groups: Dict[int, str] = {}
+        self.reference_triggers = tuple(dict.fromkeys(phrase.casefold() for phrase, _ in phrases))
+        if phrases:
+            self.references = re.compile(rf"\b{_trie_regex(phrases)}", re.IGNORECASE)
+            self.reference_groups = {
+                group_index: group_names[group_name]
+                for group_name, group_index in self.references.groupindex.items()
+            }
+
+        alternatives = []
+        if phrases:
+            alternatives.append(_trie_regex(phrases))
+
+        # Text one of which every combined match contains, compared casefolded;
+        # None when a keyword pattern's leading words cannot be told
+        triggers: Optional[List[str]] = [phrase for phrase, _ in phrases]
+
+        # (pattern index, number of inner groups) per keyword alternative
+        keyword_groups: Dict[str, Tuple[int, int]] = {}
+        for pattern_list in tech_patterns.values():
+            for pattern, entity_type in pattern_list:
+                index = len(self.tech_types)
+                self.tech_types.append(entity_type)
+                compiled = re.compile(pattern, re.IGNORECASE)
+                if entity_type in keyword_types and pattern.startswith(r"\b"):
+                    group_name = f"t{index}"
+                    alternatives.append(f"(?P<{group_name}>{pattern})")
+                    keyword_groups[group_name] = (index, compiled.groups)
+                    words = _leading_words(pattern)
+                    triggers = triggers + words if triggers is not None and words else None
+                else:
+                    self.separate_tech.append((index, compiled, tech_triggers.get(entity_type)))
+
+        # Every alternative starts at a word boundary; checking it once up
+        # front lets the scan skip mid-word positions cheaply
+        self.combined = None
+        if alternatives:
+            self.combined = re.compile(rf"\b(?:{'|'.join(alternatives)})", re.IGNORECASE)
+        self.triggers = (
+            tuple(dict.fromkeys(trigger.casefold() for trigger in triggers))
+            if triggers is not None else None
+        )
+
+        # Resolve group names to indexes once so scanning can use lastindex
+        self.ambiguous_groups: Dict[int, str] = {}
+        self.keyword_groups: Dict[int, Tuple[int, int]] = {}
+        if self.combined is not None:
+            for group_name, group_index in self.combined.groupindex.items():
+                if group_name in group_names:
+                    self.ambiguous_groups[group_index] = group_names[group_name]
+                else:
+                    self.keyword_groups[group_index] = keyword_groups[group_name]
+
+    def triggered(self, content: str) -> bool:
+        """Prefilter: whether content has any text the combined scan can match"""
+        if self.triggers is None:
+            return True
+        folded = content.casefold()
+        return any(trigger in folded for trigger in self.triggers)
+
+    def scan_references(self, content: str) -> Set[str]:
+        """Keys of the ambiguous references in content, without the technical scans"""
+        found = set()
+        folded = content.casefold()
+        if self.references is not None and any(trigger in folded for trigger in self.reference_triggers):
+            found.update(self.reference_groups[match.lastindex] for match in self.references.finditer(content))
+        found.update(entity_key for entity_key, regex in self.separate_ambiguous if regex.search(content))
+        return found
+
+    def scan(
+        self,
+        content: str,
+        pos: int = 0,
+        tech_pos: Optional[List[int]] = None
+    ) -> Tuple[Dict[str, List[Tuple[int, int]]], List[List[Tuple[int, int, str]]]]:
+        """Find ambiguous phrase spans by key and technical matches by pattern
+
+        Scanning starts at ``pos``, or for separately scanned technical
+        patterns at their entry in ``tech_pos`` if later; text before it
+        still counts for word boundaries.
+        """
+        ambiguous: Dict[str, List[Tuple[int, int]]] = {}
+        tech: List[List[Tuple[int, int, str]]] = [[] for _ in self.tech_types]
+
+        if self.combined is not None and self.triggered(content):
+            for match in self.combined.finditer(content, pos):
+                group_index = match.lastindex
+                entity_key = self.ambiguous_groups.get(group_index)
+                if entity_key is not None:
+                    ambiguous.setdefault(entity_key, []).append(match.span())
+                    continue
+                pattern_index, inner_groups = self.keyword_groups[group_index]
+                groups = match.groups()[group_index:group_index + inner_groups]
+                tech[pattern_index].append(
+                    (*match.span(), _findall_value(groups, match.group(group_index)))
+                )
+
+        for entity_key, regex in self.separate_ambiguous:
+            spans = [match.span() for match in regex.finditer(content, pos)]
+            if spans:
+                ambiguous[entity_key] = spans
+
+        # Prefilter: skip patterns whose trigger text never occurs
+        for pattern_index, regex, trigger in self.separate_tech:
+            if trigger is not None and trigger not in content:
+                continue
+            start = max(pos, tech_pos[pattern_index]) if tech_pos else pos
+            tech[pattern_index] = [
+                (*match.span(), _findall_value(match.groups(), match.group()))
+                for match in regex.finditer(content, start)
+            ]
+
+        return ambiguous, tech
+
+
+class _ScannerCache:
+    """Compiles a detector class's pattern tables on first use
+
+    Each class, subclasses included, gets its own scanner from the tables
+    it defines or inherits.
+    """
+
+    def __get__(self, instance, owner) -> _EntityScanner:
+        scanner = owner.__dict__.get("_compiled_scanner")
+        if scanner is None:
+            scanner = _EntityScanner(
+                owner.AMBIGUOUS_PATTERNS, owner.TECH_PATTERNS, owner.KEYWORD_TYPES, owner.TECH_TRIGGERS
+            )
+            owner._compiled_scanner = scanner
+        return scanner
 
 
 class EntityDetector:
@@ -52,66 +286,166 @@ class EntityDetector:
         ],
     }
 
-    def detect_entities(self, content: str) -> Dict[str, GAPEntity]:
+    # Technical entity types whose patterns start at a fixed keyword after a
+    # word boundary. Their matches never overlap an ambiguous phrase or each
+    # other, so they share the single combined scan with AMBIGUOUS_PATTERNS.
+    KEYWORD_TYPES = ("python_version", "node_version", "framework", "database")
+
+    # Literal text the remaining technical patterns cannot match without;
+    # content lacking it skips that scan entirely
+    TECH_TRIGGERS = {
+        "software_version": ".",
+        "file_reference": ".",
+    }
+
+    _scanner = _ScannerCache()
+
+    def __init__(self, glossary: Optional[GlossaryMatcher] = None):
+        self.glossary = glossary
+        self._config_version: Optional[str] = None
+
+    @property
+    def config_version(self) -> str:
+        """Identify the pattern tables and glossary that detection depends on"""
+        if self._config_version is None:
+            version = self._scanner.digest
+            if self.glossary is not None:
+                version += f"+{self.glossary.digest}"
+            self._config_version = version
+        return self._config_version
+
+    def longest_match(self) -> int:
+        """Length of the longest ambiguous phrase or glossary term
+
+        These are the matches of bounded length; technical patterns such as
+        versions can match any amount of whitespace.
+        """
+        longest = self._scanner.longest_phrase
+        if self.glossary is not None:
+            longest = max(longest, self.glossary.longest_term)
+        return longest
+
+    def detect_entities(self, content: str) -> Dict[str, EntityRecord]:
         """Auto-detect entities from content"""
+        ambiguous, tech = self._scanner.scan(content)
+        glossary_matches = self.glossary.find(content) if self.glossary is not None else []
+        return self._entities(ambiguous, tech, glossary_matches)
+
+    def detect_references(self, content: str) -> List[str]:
+        """Keys of the ambiguous references in content, in AMBIGUOUS_PATTERNS order
+
+        Runs only the reference patterns, not the technical or glossary scans.
+        """
+        found = self._scanner.scan_references(content)
+        return [entity_key for entity_key in self.AMBIGUOUS_PATTERNS if entity_key in found]
+
+    def detect_many(
+        self,
+        contents: Iterable[str],
+        pool: Optional[ProcessPoolExecutor] = None,
+        max_workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> List[Dict[str, EntityRecord]]:
+        """Auto-detect entities for many messages across a process pool"""
+        return detect_batch(self, contents, pool, max_workers, chunk_size)
+
+    def detect_spans(self, content: str) -> List[Tuple[int, int, str, str]]:
+        """Detect entities as (start, end, key, type) spans in content order"""
+        return self.detect_with_spans(content)[1]
+
+    def detect_with_spans(
+        self,
+        content: str
+    ) -> Tuple[Dict[str, EntityRecord], List[Tuple[int, int, str, str]]]:
+        """Detect entities and their character spans in a single pass"""
+        ambiguous, tech = self._scanner.scan(content)
+        glossary_matches = self.glossary.find(content) if self.glossary is not None else []
+        return (
+            self._entities(ambiguous, tech, glossary_matches),
+            self._spans(ambiguous, tech, glossary_matches)
+        )
+
+    def _entities(
+        self,
+        ambiguous: Dict[str, List[Tuple[int, int]]],
+        tech: List[List[Tuple[int, int, str]]],
+        glossary_matches: List[Tuple[int, int, int]]
+    ) -> Dict[str, EntityRecord]:
+        """Turn raw scan matches into entities"""
         entities = {}
 
-        # Detect ambiguous references
-        for entity_key, pattern in self.AMBIGUOUS_PATTERNS.items():
-            if re.search(pattern, content, re.IGNORECASE):
-                entities[entity_key] = GAPEntity(
-                    type="ambiguous_reference",
-                    value="[NEEDS_DEFINITION]"
-                )
+        # Detect ambiguous references (reported in AMBIGUOUS_PATTERNS order)
+        for entity_key in self.AMBIGUOUS_PATTERNS:
+            if entity_key in ambiguous:
+                entities[entity_key] = UNDEFINED_ENTITY
 
-        # Detect technical components
-        for pattern_list in self.TECH_PATTERNS.values():
-            for pattern, entity_type in pattern_list:
-                matches = re.findall(pattern, content, re.IGNORECASE)
-                for match in matches:
-                    if isinstance(match, tuple):
-                        value = " ".join(match)
-                    else:
-                        value = match
-
-                    entity_key = f"{entity_type}_{value.replace(' ', '_').replace('.', '_')}"
-                    entities[entity_key] = GAPEntity(
-                        type=entity_type,
-                        value=value
-                    )
+        # Detect technical components (reported in TECH_PATTERNS order)
+        for entity_type, matches in zip(self._scanner.tech_types, tech):
+            for _, _, value in matches:
+                entities[self.tech_entity_key(entity_type, value)] = EntityRecord(entity_type, value)
+
+        # Detect project glossary terms
+        for _, _, entry_index in glossary_matches:
+            entity_key, entity_type, value = self.glossary.entry(entry_index)
+            entities[entity_key] = EntityRecord(entity_type, value, "glossary")
 
         return entities
 
+    def _spans(
+        self,
+        ambiguous: Dict[str, List[Tuple[int, int]]],
+        tech: List[List[Tuple[int, int, str]]],
+        glossary_matches: List[Tuple[int, int, int]]
+    ) -> List[Tuple[int, int, str, str]]:
+        """Turn raw scan matches into (start, end, key, type) spans in content order"""
+        spans = [
+            (start, end, entity_key, "ambiguous_reference")
+            for entity_key, found in ambiguous.items()
+            for start, end in found
+        ]
+        for entity_type, matches in zip(self._scanner.tech_types, tech):
+            spans.extend(
+                (start, end, self.tech_entity_key(entity_type, value), entity_type)
+                for start, end, value in matches
+            )
+        for start, end, entry_index in glossary_matches:
+            entity_key, entity_type, _ = self.glossary.entry(entry_index)
+            spans.append((start, end, entity_key, entity_type))
+        spans.sort()
+        return spans
+
+    @staticmethod
+    def tech_entity_key(entity_type: str, value: str) -> str:
+        """Build the entity key for a technical component match"""
+        return f"{entity_type}_{value.replace(' ', '_').replace('.', '_')}"
+
     def merge_entities(
         self,
-        detected: Dict[str, GAPEntity],
+        detected: Dict[str, EntityRecord],
         provided: Optional[Dict[str, Dict[str, str]]]
-    ) -> Dict[str, GAPEntity]:
-        """Merge detected entities with user-provided ones"""
+    ) -> Dict[str, EntityRecord]:
+        """Merge detected entities with user-provided ones, validating those"""
         if not provided:
             return detected
 
         merged = detected.copy()
         for key, entity_data in provided.items():
-            merged[key] = GAPEntity(**entity_data)
+            merged[key] = entity_record(entity_data)
 
         return merged
 
     def update_entity(
         self,
-        entities: Dict[str, GAPEntity],
+        entities: Dict[str, EntityRecord],
         key: str,
         value: str,
         entity_type: str = "user_defined"
-    ) -> Dict[str, GAPEntity]:
+    ) -> Dict[str, EntityRecord]:
         """Update or add an entity definition"""
-        entities[key] = GAPEntity(
-            type=entity_type,
-            value=value
-        )
+        entities[key] = EntityRecord(entity_type, value)
         return entities
 
-    def find_undefined_entities(self, entities: Dict[str, GAPEntity]) -> List[str]:
+    def find_undefined_entities(self, entities: Dict[str, EntityRecord]) -> List[str]:
         """Find entities that need definition"""
         undefined = []
         for key, entity in entities.items():
@@ -119,23 +453,80 @@ class EntityDetector:
                 undefined.append(key)
         return undefined
 
-    def suggest_entity_definitions(self, content: str, entities: Dict[str, GAPEntity]) -> Dict[str, str]:
-        """Suggest possible definitions for undefined entities based on context"""
-        suggestions = {}
+    def suggest_entity_definitions(
+        self,
+        content: str,
+        entities: Dict[str, EntityRecord],
+        undefined: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """Suggest possible definitions for undefined entities based on context
 
-        for key in self.find_undefined_entities(entities):
-            # Convert key back to natural language
-            phrase = key.replace("_", " ")
+        A phrase followed later in its sentence by a word such as "is" or
+        "means" is defined by the rest of that sentence. Sentence breaks,
+        definition words and phrase occurrences are each found in a single
+        pass, so the cost stays linear in content length however few
+        sentence breaks the content has. ``undefined`` overrides the keys
+        taken from placeholder entities, as compact messages list them
+        separately.
+        """
+        if undefined is None:
+            undefined = self.find_undefined_entities(entities)
+        phrases = {key: key.replace("_", " ") for key in undefined}
+        definitions = self._first_definitions(content, tuple(dict.fromkeys(
+            phrase.lower() for phrase in phrases.values() if _PLAIN_PHRASE.fullmatch(phrase)
+        )))
 
-            # Look for context clues around the phrase
-            pattern = rf"({phrase})[^.]*?(?:is|are|was|were|means|refers to|represents)\s+([^.]+)"
-            match = re.search(pattern, content, re.IGNORECASE)
+        suggestions = {}
+        for key in undefined:
+            phrase = phrases[key]
+            if _PLAIN_PHRASE.fullmatch(phrase):
+                value = definitions.get(phrase.lower())
+            else:
+                # Phrases with pattern syntax keep the original per-phrase search
+                pattern = rf"({phrase})[^.]*?(?:is|are|was|were|means|refers to|represents)\s+([^.]+)"
+                match = re.search(pattern, content, re.IGNORECASE)
+                value = match.group(2) if match else None
 
-            if match:
-                suggestions[key] = match.group(2).strip()
+            if value is not None:
+                suggestions[key] = value.strip()
 
         return suggestions
 
+    @staticmethod
+    def _first_definitions(content: str, phrases: Tuple[str, ...]) -> Dict[str, str]:
+        """Map each lowercased phrase to the text after its first definition word"""
+        if not phrases:
+            return {}
+
+        sentence_ends = [match.start() for match in re.finditer(r"\.", content)]
+        copulas = [(match.start(), match.end()) for match in _COPULA.finditer(content)]
+        copula_starts = [start for start, _ in copulas]
+
+        pattern, found = _phrase_finder(phrases)
+        remaining = set(phrases)
+        definitions = {}
+        for match in pattern.finditer(content):
+            for phrase in found[match.lastindex]:
+                if phrase not in remaining:
+                    continue
+                end = match.start() + len(phrase)
+                index = bisect_left(copula_starts, end)
+                if index == len(copulas):
+                    # No definition word follows, here or anywhere later
+                    remaining.discard(phrase)
+                    continue
+                copula_start, copula_end = copulas[index]
+                index = bisect_left(sentence_ends, end)
+                sentence_end = sentence_ends[index] if index < len(sentence_ends) else len(content)
+                if copula_start < sentence_end:
+                    definitions[phrase] = content[copula_end:sentence_end]
+                    remaining.discard(phrase)
+            if not remaining:
+                break
+
+        return definitions
+
+
 
 class PronounTransformer:
     """Handle pronoun transformations for different contexts"""
@@ -178,14 +569,12 @@ class PronounTransformer:
 
     def apply_pronouns(self, content: str, pronoun_map: Dict[str, str]) -> str:
         """Apply pronoun transformations to content"""
-        transformed = content
-
-        # Sort by length to avoid partial replacements
-        sorted_pronouns = sorted(pronoun_map.items(), key=lambda x: len(x[0]), reverse=True)
-
-        for old_pronoun, new_pronoun in sorted_pronouns:
-            # Use word boundaries for accurate replacement
-            pattern = r'\b' + re.escape(old_pronoun) + r'\b'
-            transformed = re.sub(pattern, new_pronoun, transformed, flags=re.IGNORECASE)
+        key = plan_key("pronouns", pronoun_map, {})
+        plan = plan_cache.get(key)
+        if plan is None:
+            # Sort by length to avoid partial replacements
+            sorted_pronouns = sorted(pronoun_map.items(), key=lambda x: len(x[0]), reverse=True)
+            plan = SubstitutionPlan(dict(sorted_pronouns), {})
+            plan_cache.set(key, plan)
 
-        return transformed
+        return plan.apply(content)
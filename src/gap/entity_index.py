@@ -0,0 +1,152 @@
+"""
+Global index of entity definitions over time
+
+create_context_graph and ContextMerger take the last definition of each
+entity by walking a thread's messages. EntityIndex keeps, for every key,
+the definitions stored messages made in time order, across threads and
+within each thread, so the current definition is the last entry and the
+definition as of a time is a bisect.
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .records import AnyMessage, EntityRecord
+from .revisions import NEEDS_DEFINITION
+
+
+class Definition(NamedTuple):
+    """One definition of an entity, and the message and time that made it"""
+    timestamp: str
+    entity: EntityRecord
+    message_id: Optional[str]
+    thread_id: Optional[str]
+
+
+# Sorted instants (see _instant), with the definition made at each
+_History = Tuple[List[datetime], List[Definition]]
+
+
+def _instant(timestamp: str) -> datetime:
+    """An ISO timestamp as a naive UTC datetime, naive timestamps taken as UTC
+
+    Raises ValueError for anything but an ISO timestamp.
+    """
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _record(entity) -> EntityRecord:
+    if isinstance(entity, EntityRecord):
+        return entity
+    return EntityRecord(entity.type, entity.value, entity.defined_in)
+
+
+class EntityIndex:
+    """Definitions of every entity key by time, overall and per thread
+
+    Timestamps are ISO timestamps, ordered by the instant they name: offsets
+    are applied and naive timestamps are taken as UTC. A definition
+    repeating the one before it in the same history is not recorded again,
+    so each entry marks where a key's definition changed. Undefined
+    references are never recorded.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, _History] = {}
+        self._threads: Dict[Tuple[str, str], _History] = {}
+        self.definitions = 0
+
+    def define(
+        self,
+        key: str,
+        entity: EntityRecord,
+        timestamp: str,
+        message_id: Optional[str] = None,
+        thread_id: Optional[str] = None
+    ) -> bool:
+        """Record a definition, returning whether it changed the key's history
+
+        Raises ValueError when timestamp is not an ISO timestamp.
+        """
+        entity = _record(entity)
+        if entity.value == NEEDS_DEFINITION:
+            return False
+        instant = _instant(timestamp)
+        definition = Definition(timestamp, entity, message_id, thread_id)
+        changed = self._insert(self._keys.setdefault(key, ([], [])), instant, definition)
+        if thread_id:
+            changed = self._insert(
+                self._threads.setdefault((key, thread_id), ([], [])), instant, definition
+            ) or changed
+        return changed
+
+    def _insert(self, history: _History, instant: datetime, definition: Definition) -> bool:
+        instants, definitions = history
+        # Messages mostly arrive in time order: append in O(1)
+        if not instants or instant >= instants[-1]:
+            position = len(instants)
+        else:
+            position = bisect_right(instants, instant)
+        if position and definitions[position - 1].entity == definition.entity:
+            return False
+        instants.insert(position, instant)
+        definitions.insert(position, definition)
+        self.definitions += 1
+        return True
+
+    def add(self, msg: AnyMessage, message_id: Optional[str] = None) -> int:
+        """Record a message's definitions, returning how many changed a history"""
+        message = msg.message
+        timestamp = message.source.timestamp
+        thread_id = message.context.thread_id
+        return sum(
+            self.define(key, entity, timestamp, message_id, thread_id)
+            for key, entity in message.context.entities.items()
+        )
+
+    def _history(self, key: str, thread_id: Optional[str] = None) -> Optional[_History]:
+        if thread_id is None:
+            return self._keys.get(key)
+        return self._threads.get((key, thread_id))
+
+    def current(self, key: str, thread_id: Optional[str] = None) -> Optional[Definition]:
+        """Latest definition of a key, overall or in a thread"""
+        history = self._history(key, thread_id)
+        return history[1][-1] if history else None
+
+    def as_of(self, key: str, timestamp: str, thread_id: Optional[str] = None) -> Optional[Definition]:
+        """Definition of a key in effect at a time, overall or in a thread
+
+        Raises ValueError when timestamp is not an ISO timestamp.
+        """
+        history = self._history(key, thread_id)
+        if not history:
+            return None
+        position = bisect_right(history[0], _instant(timestamp))
+        return history[1][position - 1] if position else None
+
+    def history(self, key: str, thread_id: Optional[str] = None) -> List[Definition]:
+        """Definitions of a key in time order, overall or in a thread"""
+        history = self._history(key, thread_id)
+        return list(history[1]) if history else []
+
+    def resolve(self, key: str, thread_id: Optional[str] = None) -> Optional[Definition]:
+        """Current definition of a key, preferring the thread's own"""
+        if thread_id:
+            definition = self.current(key, thread_id)
+            if definition is not None:
+                return definition
+        return self.current(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,195 @@
+"""
+Thread-scoped entity tables shared by the messages of a thread
+
+Within a thread most messages repeat definitions made earlier. Instead of
+each stored message holding a full entity dict, a thread keeps one
+EntityTable and each message an EntityView: its keys, the table version
+it was stored at, and only the entries that differ from the table.
+"""
+
+from bisect import bisect_right
+from collections.abc import MutableMapping
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .records import EntityRecord, MessageRecord
+from .revisions import NEEDS_DEFINITION
+
+
+class EntityTable:
+    """Versioned entity definitions of one thread
+
+    A persistent map in fat-node form: each key keeps the definitions it
+    had, by the version that set them, so a version is just a number and
+    reading a key as of one is a bisect. Changing an entity appends to its
+    key's history instead of copying the table, and each version's delta
+    is kept, so catching up with the table costs only the changes since.
+    Later definitions override earlier ones and undefined references are
+    never stored, as in ContextMerger.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._current: Dict[str, EntityRecord] = {}
+        self._history: Dict[str, Tuple[List[int], List[EntityRecord]]] = {}
+        # Entries changed by each version; version 0 is the empty table
+        self._deltas: List[Dict[str, EntityRecord]] = [{}]
+        # Last source defining each key, changed or not
+        self._defined_in: Dict[str, Optional[str]] = {}
+
+    def apply(
+        self,
+        entities: Mapping[str, EntityRecord],
+        source: Optional[str] = None
+    ) -> Tuple[int, Dict[str, EntityRecord]]:
+        """Merge a message's entities into the table
+
+        Returns the resulting version and the entries that changed; a new
+        version is only made when something did.
+        """
+        current = self._current
+        changes = {}
+        for key, entity in entities.items():
+            if entity.value == NEEDS_DEFINITION:
+                continue
+            self._defined_in[key] = source
+            if current.get(key) != entity:
+                changes[key] = entity
+
+        if changes:
+            self.version += 1
+            for key, entity in changes.items():
+                current[key] = entity
+                versions, values = self._history.setdefault(key, ([], []))
+                versions.append(self.version)
+                values.append(entity)
+            self._deltas.append(changes)
+        return self.version, changes
+
+    def set(self, key: str, entity: EntityRecord, source: Optional[str] = None) -> int:
+        """Define one entity, returning the resulting version"""
+        return self.apply({key: entity}, source)[0]
+
+    def get(
+        self,
+        key: str,
+        version: Optional[int] = None,
+        default: Optional[EntityRecord] = None
+    ) -> Optional[EntityRecord]:
+        """Definition of a key, currently or as of a version"""
+        if version is None or version >= self.version:
+            return self._current.get(key, default)
+        history = self._history.get(key)
+        if history is None:
+            return default
+        index = bisect_right(history[0], version)
+        return history[1][index - 1] if index else default
+
+    @property
+    def current(self) -> Mapping[str, EntityRecord]:
+        """Read-only view of the current definitions"""
+        return MappingProxyType(self._current)
+
+    def defined_in(self, key: str) -> Optional[str]:
+        """Source of the last message defining a key"""
+        return self._defined_in.get(key)
+
+    def snapshot(self, version: Optional[int] = None) -> Dict[str, EntityRecord]:
+        """Definitions as of a version, in the order keys were first defined"""
+        if version is None or version >= self.version:
+            return dict(self._current)
+        snapshot = {}
+        for key in self._current:
+            entity = self.get(key, version)
+            if entity is not None:
+                snapshot[key] = entity
+        return snapshot
+
+    def changes_since(self, version: int) -> Dict[str, EntityRecord]:
+        """Entries changed after a version, with their current definitions"""
+        changes: Dict[str, EntityRecord] = {}
+        for delta in self._deltas[version + 1:]:
+            changes.update(delta)
+        return changes
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._current
+
+
+class EntityView(MutableMapping):
+    """A message's entities, read from its thread's table
+
+    Holds the message's keys in order, the table version it was stored at,
+    and its own entries where they differ from the table (undefined
+    references and later edits). Writes go to those entries only: the
+    table, and every other message reading it, is left alone.
+    """
+
+    __slots__ = ("table", "version", "names", "own")
+
+    def __init__(
+        self,
+        table: EntityTable,
+        version: int,
+        keys: Tuple[str, ...],
+        own: Optional[Dict[str, EntityRecord]] = None
+    ):
+        self.table = table
+        self.version = version
+        self.names = keys
+        self.own = own
+
+    def __getitem__(self, key: str) -> EntityRecord:
+        own = self.own
+        if own is not None and key in own:
+            return own[key]
+        if key in self.names:
+            entity = self.table.get(key, self.version)
+            if entity is not None:
+                return entity
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, entity: EntityRecord) -> None:
+        if self.own is None:
+            self.own = {}
+        self.own[key] = entity
+        if key not in self.names:
+            self.names = self.names + (key,)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self.names:
+            raise KeyError(key)
+        self.names = tuple(other for other in self.names if other != key)
+        if self.own is not None:
+            self.own.pop(key, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.names
+
+    def __repr__(self) -> str:
+        return f"EntityView({dict(self.items())!r})"
+
+
+def share_entities(record: MessageRecord, table: EntityTable, source: Optional[str] = None) -> int:
+    """Merge a record's entities into its thread's table and replace them with a view
+
+    Returns the table version the record now reads.
+    """
+    context = record.message.context
+    entities = context.entities
+    version, _ = table.apply(entities, source)
+    own = {}
+    for key, entity in entities.items():
+        if table.get(key, version) != entity:
+            own[key] = entity
+    context.entities = EntityView(table, version, tuple(entities), own or None)
+    return version
@@ -0,0 +1,324 @@
+"""
+Dictionary-backed phrase matching for GAP Protocol
+"""
+
+import hashlib
+import json
+import mmap
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# Words and single punctuation marks. Glossary phrases and message content
+# are tokenized the same way, so a phrase matches across any whitespace.
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Arrays are written in native byte order, which the magic records; a
+# glossary from a host of the other order is read from byteswapped copies
+_MAGIC_PREFIX = b"GAPGLO"
+_MAGIC = _MAGIC_PREFIX + (b"L1" if sys.byteorder == "little" else b"B1")
+_SWAPPED_MAGIC = _MAGIC_PREFIX + (b"B1" if sys.byteorder == "little" else b"L1")
+# magic, token count, node count, edge count, entry count
+_HEADER = struct.Struct("<8s4Q")
+
+# Upper bound on the per-matcher cache of content word -> token id lookups
+_TOKEN_CACHE_SIZE = 100_000
+
+
+def _pad(data: bytes) -> bytes:
+    """Pad a section to an 8-byte boundary"""
+    return data + b"\0" * (-len(data) % 8)
+
+
+class GlossaryMatcher:
+    """Match a large dictionary of project terms in one pass over content
+
+    Terms are stored as a word-level trie in a flat layout of sorted arrays
+    that is read in place from a bytes buffer or a memory-mapped file, so a
+    saved glossary loads without being rebuilt. Matching walks the trie
+    from each word and reports the leftmost-longest term; its cost depends
+    on content length and term depth, not on the number of terms.
+    """
+
+    DEFAULT_TYPE = "glossary_term"
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise ValueError("Not a GAP glossary: buffer too small")
+
+        magic, tokens, nodes, edges, entries = _HEADER.unpack_from(view)
+        if magic not in (_MAGIC, _SWAPPED_MAGIC):
+            raise ValueError("Not a GAP glossary: bad magic")
+        swapped = magic == _SWAPPED_MAGIC
+
+        offset = _HEADER.size
+        sections = []
+        for count, fmt in (
+            (tokens + 1, "Q"),   # token offsets into the token blob
+            (edges, "Q"),        # edge keys: parent * tokens + token id, sorted
+            (edges, "Q"),        # edge children, parallel to edge keys
+            (nodes, "q"),        # entry index per trie node, -1 if none
+            (entries * 3 + 1, "Q"),  # key/type/value offsets into the entry blob
+        ):
+            size = count * 8
+            section = view[offset:offset + size]
+            if swapped:
+                values = array(fmt)
+                values.frombytes(section)
+                values.byteswap()
+                sections.append(values)
+            else:
+                sections.append(section.cast(fmt))
+            offset += size
+        self._token_offsets, self._edge_keys, self._edge_children, self._node_entries, \
+            self._entry_offsets = sections
+
+        token_blob_size = self._token_offsets[-1]
+        self._token_blob = view[offset:offset + token_blob_size]
+        offset += token_blob_size + (-token_blob_size % 8)
+        self._entry_blob = view[offset:offset + self._entry_offsets[-1]]
+
+        self._token_count = tokens
+        self._entry_count = entries
+        # Set when the glossary is memory-mapped from a file
+        self.path: Optional[str] = None
+        self._digest: Optional[str] = None
+        self._longest_term: Optional[int] = None
+        self._token_ids: Dict[str, int] = {}
+        self._entries: Dict[int, Tuple[str, str, str]] = {}
+
+    @classmethod
+    def build(cls, terms: Dict[str, Dict[str, str]]) -> "GlossaryMatcher":
+        """Build a matcher from entity definitions keyed by entity key
+
+        Each definition takes the same ``type``/``value`` fields as provided
+        entities, plus an optional ``phrase``; without one the phrase is the
+        key with underscores read as spaces.
+        """
+        entries: List[Tuple[str, str, str]] = []
+        phrases: List[Tuple[str, ...]] = []
+        for key, data in terms.items():
+            phrase = data.get("phrase") or key.replace("_", " ")
+            tokens = tuple(token.lower() for token in _TOKEN.findall(phrase))
+            if not tokens:
+                continue
+            entries.append((key, data.get("type", cls.DEFAULT_TYPE), data.get("value", phrase)))
+            phrases.append(tokens)
+
+        vocabulary = sorted({token for tokens in phrases for token in tokens}, key=str.encode)
+        token_ids = {token: index for index, token in enumerate(vocabulary)}
+
+        children: Dict[Tuple[int, int], int] = {}
+        node_entries = [-1]
+        for entry_index, tokens in enumerate(phrases):
+            node = 0
+            for token in tokens:
+                edge = (node, token_ids[token])
+                child = children.get(edge)
+                if child is None:
+                    child = children[edge] = len(node_entries)
+                    node_entries.append(-1)
+                node = child
+            # Later definitions of the same phrase win, as in merge_entities
+            node_entries[node] = entry_index
+
+        token_count = len(vocabulary)
+        edges = sorted(
+            (parent * token_count + token_id, child)
+            for (parent, token_id), child in children.items()
+        )
+
+        token_blob = bytearray()
+        token_offsets = [0]
+        for token in vocabulary:
+            token_blob += token.encode()
+            token_offsets.append(len(token_blob))
+
+        entry_blob = bytearray()
+        entry_offsets = [0]
+        for entry in entries:
+            for field in entry:
+                entry_blob += field.encode()
+                entry_offsets.append(len(entry_blob))
+
+        buffer = b"".join((
+            _HEADER.pack(_MAGIC, token_count, len(node_entries), len(edges), len(entries)),
+            array("Q", token_offsets).tobytes(),
+            array("Q", (key for key, _ in edges)).tobytes(),
+            array("Q", (child for _, child in edges)).tobytes(),
+            array("q", node_entries).tobytes(),
+            array("Q", entry_offsets).tobytes(),
+            _pad(bytes(token_blob)),
+            bytes(entry_blob),
+        ))
+        return cls(buffer)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "GlossaryMatcher":
+        """Build a matcher from a JSON definitions file or a plain term list
+
+        JSON files hold the same mapping ``build`` takes. Any other file is
+        read as one term per line, optionally followed by a tab and its
+        definition.
+        """
+        path = Path(path)
+        if path.suffix == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.build(json.load(f))
+
+        terms = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                phrase, _, value = line.rstrip("\n").partition("\t")
+                if not phrase.strip():
+                    continue
+                key = "_".join(phrase.lower().split())
+                terms[key] = {"phrase": phrase, "value": value or phrase}
+        return cls.build(terms)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "GlossaryMatcher":
+        """Memory-map a glossary written by ``save``"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        glossary = cls(mapped)
+        glossary.path = str(path)
+        return glossary
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the compact glossary form to disk"""
+        with open(path, "wb") as f:
+            f.write(self._buffer)
+
+    def to_bytes(self) -> bytes:
+        """Return the compact glossary form"""
+        return bytes(self._buffer)
+
+    def __len__(self) -> int:
+        return self._entry_count
+
+    @property
+    def digest(self) -> str:
+        """Content digest of the compact form, computed on first use"""
+        if self._digest is None:
+            self._digest = hashlib.blake2b(self._buffer, digest_size=8).hexdigest()
+        return self._digest
+
+    @property
+    def longest_term(self) -> int:
+        """Characters in the longest term with single spaces between its words
+
+        Content matching a term with wider gaps between its words is longer.
+        """
+        if self._longest_term is None:
+            offsets = self._token_offsets
+            blob = self._token_blob
+            # Nodes are numbered after their parent and edges sorted by
+            # parent, so each parent's length is known before its children
+            lengths = [0] * len(self._node_entries)
+            for key, child in zip(self._edge_keys, self._edge_children):
+                parent, token_id = divmod(key, self._token_count)
+                token = bytes(blob[offsets[token_id]:offsets[token_id + 1]]).decode()
+                lengths[child] = lengths[parent] + len(token) + (1 if parent else 0)
+            self._longest_term = max(
+                (length for length, entry in zip(lengths, self._node_entries) if entry >= 0),
+                default=0
+            )
+        return self._longest_term
+
+    def entry(self, index: int) -> Tuple[str, str, str]:
+        """Return the (key, type, value) of a glossary entry"""
+        entry = self._entries.get(index)
+        if entry is None:
+            offsets = self._entry_offsets
+            blob = self._entry_blob
+            base = index * 3
+            entry = tuple(
+                bytes(blob[offsets[base + field]:offsets[base + field + 1]]).decode()
+                for field in range(3)
+            )
+            self._entries[index] = entry
+        return entry
+
+    def find(self, content: str, pos: int = 0) -> List[Tuple[int, int, int]]:
+        """Find glossary terms as (start, end, entry index), leftmost-longest"""
+        words = [
+            (match.start(), match.end(), match.group().lower())
+            for match in _TOKEN.finditer(content, pos)
+        ]
+        token_ids = [self._token_id(word) for _, _, word in words]
+
+        matches = []
+        position = 0
+        while position < len(words):
+            node = 0
+            best = None
+            cursor = position
+            while cursor < len(words):
+                token_id = token_ids[cursor]
+                if token_id < 0:
+                    break
+                node = self._child(node, token_id)
+                if node < 0:
+                    break
+                cursor += 1
+                entry_index = self._node_entries[node]
+                if entry_index >= 0:
+                    best = (cursor, entry_index)
+
+            if best is None:
+                position += 1
+                continue
+            cursor, entry_index = best
+            matches.append((words[position][0], words[cursor - 1][1], entry_index))
+            position = cursor
+
+        return matches
+
+    def _token_id(self, token: str) -> int:
+        """Return the id of a lowercased token, or -1 if no term uses it"""
+        token_id = self._token_ids.get(token)
+        if token_id is not None:
+            return token_id
+
+        encoded = token.encode()
+        offsets = self._token_offsets
+        blob = self._token_blob
+        index = bisect_left(
+            range(self._token_count),
+            encoded,
+            key=lambda i: bytes(blob[offsets[i]:offsets[i + 1]])
+        )
+        token_id = -1
+        if index < self._token_count and bytes(blob[offsets[index]:offsets[index + 1]]) == encoded:
+            token_id = index
+
+        if len(self._token_ids) >= _TOKEN_CACHE_SIZE:
+            self._token_ids.clear()
+        self._token_ids[token] = token_id
+        return token_id
+
+    def _child(self, node: int, token_id: int) -> int:
+        """Follow a trie edge, returning -1 when there is none"""
+        key = node * self._token_count + token_id
+        index = bisect_left(self._edge_keys, key)
+        if index < len(self._edge_keys) and self._edge_keys[index] == key:
+            return self._edge_children[index]
+        return -1
+
+
+def load_glossary(path: Optional[Union[str, Path]]) -> Optional[GlossaryMatcher]:
+    """Load a compiled glossary, or build one from a source file"""
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        compiled = f.read(len(_MAGIC_PREFIX)) == _MAGIC_PREFIX
+    if compiled:
+        return GlossaryMatcher.load(path)
+    return GlossaryMatcher.from_file(path)
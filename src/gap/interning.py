@@ -0,0 +1,271 @@
+"""
+String interning and flyweight entities for stored GAP messages
+
+Every message parsed from a request brings its own copies of the platform,
+role, entity keys and types, and of entities that are identical across a
+thread. A RecordInterner makes stored records share one instance of each.
+Only fields drawn from a small set of values are pooled, and each pool is
+cleared when it reaches its limit, so the pools stay bounded however many
+messages are stored.
+"""
+
+import threading
+import tracemalloc
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .records import (
+    UNDEFINED_ENTITY,
+    ContextRecord,
+    EntityRecord,
+    MessageContentRecord,
+    MessageRecord,
+    SourceRecord,
+    TransformHintsRecord,
+)
+
+
+def _same(value: Any) -> Any:
+    return value
+
+
+def _fresh(value: Optional[str]) -> Optional[str]:
+    """An equal but separately allocated string, as a parsed request would carry"""
+    if value is None:
+        return None
+    return value.encode("utf-8", "surrogatepass").decode("utf-8", "surrogatepass")
+
+
+def _traced_bytes(build: Callable[[], Any]) -> int:
+    """Bytes tracemalloc sees allocated by build and still held by its result"""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+        del result
+        return size
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+
+class RecordInterner:
+    """Share identical strings and entities between stored message records
+
+    Interning rewrites a record in place. Content, timestamps, chat,
+    thread and message ids and entity values are left alone; they are
+    rarely repeated outside a thread, and pooling them would grow the pool
+    with every message. Entities are immutable, so identical ones are
+    shared outright, and the undefined-reference placeholder is always the
+    one detection uses. A pool reaching its limit is cleared; records
+    interned before keep the instances they share.
+    """
+
+    def __init__(
+        self,
+        sample: int = 256,
+        sample_every: int = 16,
+        max_strings: int = 4096,
+        max_entities: int = 16384
+    ):
+        self._strings: Dict[str, str] = {}
+        self._entities: Dict[EntityRecord, EntityRecord] = {UNDEFINED_ENTITY: UNDEFINED_ENTITY}
+        self._max_strings = max_strings
+        self._max_entities = max_entities
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.clears = 0
+        self.interned = 0
+        # Records as they were before interning, for measure
+        self._samples: "deque[MessageRecord]" = deque(maxlen=sample)
+        self._sample_every = sample_every
+
+    def string(self, value: Optional[str]) -> Optional[str]:
+        """Return the shared instance of a string"""
+        if value is None:
+            return None
+        shared = self._strings.get(value)
+        if shared is None:
+            if len(self._strings) >= self._max_strings:
+                self._strings.clear()
+                self.clears += 1
+            self._strings[value] = value
+            self.misses += 1
+            return value
+        self.hits += 1
+        return shared
+
+    def entity(self, entity: EntityRecord) -> EntityRecord:
+        """Return the shared instance of an entity"""
+        shared = self._entities.get(entity)
+        if shared is None:
+            if len(self._entities) >= self._max_entities:
+                self._entities.clear()
+                self._entities[UNDEFINED_ENTITY] = UNDEFINED_ENTITY
+                self.clears += 1
+            shared = EntityRecord(self.string(entity.type), entity.value, entity.defined_in)
+            self._entities[shared] = shared
+            self.misses += 1
+        else:
+            self.hits += 1
+        return shared
+
+    def detection(self, entities: Dict[str, EntityRecord]) -> Dict[str, EntityRecord]:
+        """Share the keys and entities of a detection result
+
+        Detection results are cached, so interning them before caching
+        lets the cache and the stores hold the same objects.
+        """
+        with self._lock:
+            string = self.string
+            return {string(key): self.entity(entity) for key, entity in entities.items()}
+
+    def intern(self, record: MessageRecord) -> MessageRecord:
+        """Make a record share strings and entities with those interned before"""
+        with self._lock:
+            if self.interned % self._sample_every == 0:
+                self._samples.append(self._copy(record, _same, _same))
+            self.interned += 1
+
+            string = self.string
+            message = record.message
+            source = message.source
+            context = message.context
+            hints = message.transform_hints
+
+            record.gap_version = string(record.gap_version)
+            source.platform = string(source.platform)
+            source.model = string(source.model)
+            source.role = string(source.role)
+
+            context.entities = {string(key): self.entity(entity) for key, entity in context.entities.items()}
+            context.undefined = [string(key) for key in context.undefined]
+
+            hints.maintain_tense = string(hints.maintain_tense)
+            hints.preserve_perspective = string(hints.preserve_perspective)
+            hints.pronoun_profile = string(hints.pronoun_profile)
+            # Keys come from the standard profiles; values are replaced in
+            # place, which keeps the map's compact layout
+            pronoun_map = hints.pronoun_map
+            for key, value in pronoun_map.items():
+                pronoun_map[key] = string(value)
+            return record
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool sizes and lookup counters"""
+        lookups = self.hits + self.misses
+        return {
+            "strings": len(self._strings),
+            "entities": len(self._entities),
+            "clears": self.clears,
+            "records": self.interned,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def measure(self) -> Dict[str, Any]:
+        """Measure with tracemalloc the memory interning saves
+
+        Snapshots of a sample of records, taken before they were interned,
+        are copied twice: once keeping the duplicates interning dropped, as
+        the stores would hold without it, and once sharing pooled objects
+        instead. The difference per message is scaled to every record
+        interned.
+        """
+        with self._lock:
+            sampled = list(self._samples)
+            interned = self.interned
+            if not sampled:
+                return {"messages": interned, "sampled": 0, "saved_bytes": 0, "saved_per_message": 0.0}
+            unshared = _traced_bytes(lambda: self._copy_all(sampled, shared=False))
+            shared = _traced_bytes(lambda: self._copy_all(sampled, shared=True))
+
+        per_message = max(0.0, (unshared - shared) / len(sampled))
+        return {
+            "messages": interned,
+            "sampled": len(sampled),
+            "saved_bytes": int(per_message * interned),
+            "saved_per_message": round(per_message, 1)
+        }
+
+    def _copy_all(self, records: List[MessageRecord], shared: bool) -> List[MessageRecord]:
+        """Copy snapshots as stored without interning, or sharing pooled objects
+
+        Without interning, each object is held once per message, unless it
+        is the pooled instance or the originals already shared it (as for
+        detection cache hits).
+        """
+        if shared:
+            strings = self._strings
+            entities = self._entities
+
+            def string(value: Optional[str]) -> Optional[str]:
+                return strings.get(value, value) if value is not None else None
+
+            def entity(value: EntityRecord) -> EntityRecord:
+                return entities.get(value, value)
+        else:
+            copies: Dict[int, Any] = {}
+
+            def string(value: Optional[str]) -> Optional[str]:
+                if value is None or self._strings.get(value) is value:
+                    return value
+                copy = copies.get(id(value))
+                if copy is None:
+                    copy = copies[id(value)] = _fresh(value)
+                return copy
+
+            def entity(value: EntityRecord) -> EntityRecord:
+                if self._entities.get(value) is value:
+                    return value
+                copy = copies.get(id(value))
+                if copy is None:
+                    copy = copies[id(value)] = EntityRecord(
+                        string(value.type), _fresh(value.value), _fresh(value.defined_in)
+                    )
+                return copy
+
+        return [self._copy(record, string, entity) for record in records]
+
+    @staticmethod
+    def _copy(
+        record: MessageRecord,
+        string: Callable[[Optional[str]], Optional[str]],
+        entity: Callable[[EntityRecord], EntityRecord]
+    ) -> MessageRecord:
+        """Copy a record's structure, taking strings and entities from the given functions
+
+        Fields interning leaves alone are kept as they are; they cost the
+        same with or without it.
+        """
+        message = record.message
+        source = message.source
+        context = message.context
+        hints = message.transform_hints
+        return MessageRecord(
+            string(record.gap_version),
+            MessageContentRecord(
+                message.content,
+                SourceRecord(
+                    string(source.platform), string(source.model), source.chat_id,
+                    source.timestamp, string(source.role)
+                ),
+                ContextRecord(
+                    context.thread_id,
+                    list(context.parent_messages),
+                    {string(key): entity(value) for key, value in context.entities.items()},
+                    [string(key) for key in context.undefined]
+                ),
+                TransformHintsRecord(
+                    string(hints.maintain_tense),
+                    string(hints.preserve_perspective),
+                    {string(key): string(value) for key, value in hints.pronoun_map.items()},
+                    string(hints.pronoun_profile)
+                )
+            )
+        )
@@ -2,8 +2,16 @@
 GAP Protocol Data Models
 """
 
-from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, model_serializer
+
+
+def _omit_unset(data: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """Drop compact-revision fields left empty, keeping the 0.1.0 shape"""
+    for field in fields:
+        if not data.get(field):
+            data.pop(field, None)
+    return data
 
 
 class GAPSource(BaseModel):
@@ -22,18 +30,45 @@ class GAPEntity(BaseModel):
     defined_in: Optional[str] = Field(None, description="Where this entity was defined")
 
 
+class GAPEntityEvent(BaseModel):
+    """Entity discovered while wrapping streamed content"""
+    key: str = Field(..., description="Entity key")
+    entity: GAPEntity
+    start: int = Field(..., description="Start offset of the first occurrence in the content")
+    end: int = Field(..., description="End offset of the first occurrence in the content")
+
+
 class GAPContext(BaseModel):
     """Context information for GAP message"""
     thread_id: Optional[str] = Field(None, description="Thread or conversation ID")
     parent_messages: List[str] = Field(default_factory=list, description="IDs of parent messages")
     entities: Dict[str, GAPEntity] = Field(default_factory=dict, description="Entity definitions")
+    undefined: List[str] = Field(
+        default_factory=list,
+        description="Ambiguous references still needing a definition (0.2.0)"
+    )
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler):
+        return _omit_unset(handler(self), ("undefined",))
 
 
 class GAPTransformHints(BaseModel):
     """Hints for transforming content between platforms"""
     maintain_tense: Optional[str] = Field(None, description="Tense to maintain (past, present, future)")
     preserve_perspective: Optional[str] = Field(None, description="Perspective to preserve (first, second, third)")
-    pronoun_map: Dict[str, str] = Field(default_factory=dict, description="Pronoun replacements")
+    pronoun_map: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Pronoun replacements; with a profile, only those added to it"
+    )
+    pronoun_profile: Optional[str] = Field(
+        None,
+        description="Standard pronoun map referenced by role id (0.2.0)"
+    )
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler):
+        return _omit_unset(handler(self), ("pronoun_profile",))
 
 
 class GAPMessageContent(BaseModel):
@@ -0,0 +1,143 @@
+"""
+Platform registry and precompiled renderers for GAP Protocol
+"""
+
+import hashlib
+import io
+import json
+from pathlib import Path
+from string import Formatter
+from typing import Callable, Dict, List, Optional, Union
+
+LineWriter = Callable[[io.StringIO, str, str], None]
+
+
+def _compile_line(entity_format: str) -> LineWriter:
+    """Turn an entity format string into a writer of one line"""
+    pieces = list(Formatter().parse(entity_format))
+    plain = all(
+        field in (None, "key", "value") and not spec and not conversion
+        for _, field, spec, conversion in pieces
+    )
+    if not plain:
+        # Format specs and conversions keep str.format semantics
+        def write(buffer: io.StringIO, key: str, value: str) -> None:
+            buffer.write(entity_format.format(key=key, value=value))
+            buffer.write("\n")
+        return write
+
+    steps = []
+    for literal, field, _, _ in pieces:
+        if literal:
+            steps.append(literal)
+        if field is not None:
+            steps.append(0 if field == "key" else 1)
+    steps.append("\n")
+
+    def write(buffer: io.StringIO, key: str, value: str) -> None:
+        fields = (key, value)
+        for step in steps:
+            buffer.write(step if isinstance(step, str) else fields[step])
+    return write
+
+
+class PlatformRenderer:
+    """One platform's layout, compiled once
+
+    The prefix block is prebuilt and entity lines are written from the
+    parsed format string, so rendering a header writes straight into a
+    single buffer without formatting templates again.
+    """
+
+    REQUIRED_FIELDS = ("prefix", "entity_format")
+
+    def __init__(self, name: str, config: Dict[str, object]):
+        missing = [field for field in self.REQUIRED_FIELDS if field not in config]
+        if missing:
+            raise ValueError(f"Platform {name!r} is missing {', '.join(missing)}")
+
+        self.name = name
+        self.config = dict(config)
+        self.supports_markdown = bool(config.get("supports_markdown", False))
+        self.prefix = f"{config['prefix']}\n\n"
+        self.entity_format = str(config["entity_format"])
+        self._write_line = _compile_line(self.entity_format)
+        # Identifies this layout in cached renderings
+        self.digest = hashlib.blake2b(
+            json.dumps([name, self.config], sort_keys=True, default=str).encode(),
+            digest_size=8
+        ).hexdigest()
+
+    def render_definitions(self, definitions: Dict[str, str]) -> str:
+        """Render the entity definitions block, or "" when there are none"""
+        if not definitions:
+            return ""
+        buffer = io.StringIO()
+        buffer.write("**Entity Definitions:**\n")
+        for key, value in definitions.items():
+            self._write_line(buffer, key.replace("_", " ").title(), value)
+        buffer.write("\n")
+        return buffer.getvalue()
+
+    def render_header(
+        self,
+        definitions_block: str,
+        source_platform: str,
+        thread_id: Optional[str],
+        context_additions: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Render everything that precedes the transformed content"""
+        buffer = io.StringIO()
+        buffer.write(self.prefix)
+        buffer.write(definitions_block)
+
+        if context_additions:
+            buffer.write("**Additional Context:**\n")
+            for key, value in context_additions.items():
+                self._write_line(buffer, key, value)
+            buffer.write("\n")
+
+        buffer.write(f"*Source: {source_platform} | Thread: {thread_id or 'N/A'}*\n\n---\n\n")
+        return buffer.getvalue()
+
+
+class PlatformRegistry:
+    """Named platform renderers, with a fallback for unknown platforms
+
+    Platforms are registered from config dicts with ``prefix``,
+    ``entity_format`` and optionally ``supports_markdown``, either in code or
+    from a JSON file mapping platform names to configs.
+    """
+
+    def __init__(self, configs: Optional[Dict[str, Dict[str, object]]] = None, fallback: str = "generic"):
+        self.fallback = fallback
+        self._renderers: Dict[str, PlatformRenderer] = {}
+        for name, config in (configs or {}).items():
+            self.register(name, config)
+
+    def register(self, name: str, config: Dict[str, object]) -> PlatformRenderer:
+        """Compile and add a platform, replacing any with the same name"""
+        renderer = PlatformRenderer(name.lower(), config)
+        self._renderers[renderer.name] = renderer
+        return renderer
+
+    def load_file(self, path: Union[str, Path]) -> List[str]:
+        """Register every platform in a JSON config file, returning their names"""
+        with open(path, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+        if not isinstance(configs, dict):
+            raise ValueError("Platform config file must map platform names to configs")
+        return [self.register(name, config).name for name, config in configs.items()]
+
+    def get(self, platform: str) -> PlatformRenderer:
+        """Return a platform's renderer, or the fallback's if it is unknown"""
+        renderer = self._renderers.get(platform.lower())
+        if renderer is None:
+            renderer = self._renderers[self.fallback]
+        return renderer
+
+    def names(self) -> List[str]:
+        return list(self._renderers)
+
+    def __contains__(self, platform: str) -> bool:
+        return platform.lower() in self._renderers
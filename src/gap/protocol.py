@@ -3,28 +3,68 @@ GAP (Global Addressment Protocol) Core Implementation
 """
 
 import re
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Iterable, Iterator, AsyncIterable, Callable, Tuple
 from datetime import datetime
 
-from .models import (
-    GAPSource,
-    GAPContext,
-    GAPTransformHints,
-    GAPMessageContent,
-    GAPMessage
-)
+from .models import GAPEntity, GAPEntityEvent, GAPMessage
+from .batch import DEFAULT_CHUNK_SIZE, detect_batch
+from .cache import LRUCache, content_digest
 from .entities import EntityDetector, PronounTransformer
+from .entity_tables import EntityTable
+from .glossary import GlossaryMatcher
+from .interning import RecordInterner
+from .streaming import StreamingDetector
 from .transformers import PlatformTransformer
+from .records import (
+    AnyMessage,
+    ContextRecord,
+    EntityRecord,
+    MessageContentRecord,
+    MessageRecord,
+    SourceRecord,
+    TransformHintsRecord,
+    UNDEFINED_ENTITY,
+    to_model,
+)
+from .revisions import (
+    COMPACT_VERSION,
+    NEEDS_DEFINITION,
+    UNDEFINED_TYPE,
+    split_entities,
+    split_pronoun_map,
+    undefined_references,
+)
+from .serialization import message_json
+from .wire import BufferLike, decode_message, encode_message
+
+# Header fields written by to_markdown
+_MARKDOWN_FROM = re.compile(r'From: ([^|]+)\|.*Thread: ([^\n]+)')
+_MARKDOWN_CONTEXT = re.compile(r'Context: (\w+) message from ([^\n]+)')
+_MARKDOWN_ENTITIES = re.compile(r'Entities: ([^\n]+)')
+_MARKDOWN_ENTITY_PAIR = re.compile(r'"([^"]+)"\s*=\s*([^,]+)')
 
 
 class GAPProtocol:
     """Core GAP Protocol implementation"""
 
-    def __init__(self, version: str = "0.1.0"):
+    def __init__(
+        self,
+        version: str = "0.1.0",
+        glossary: Optional[GlossaryMatcher] = None,
+        cache: Optional[LRUCache] = None,
+        interner: Optional[RecordInterner] = None
+    ):
         self.version = version
-        self.entity_detector = EntityDetector()
+        self.entity_detector = EntityDetector(glossary=glossary)
         self.pronoun_transformer = PronounTransformer()
         self.platform_transformer = PlatformTransformer()
+        # Optional memo of detection and suggestion results, shareable
+        # between instances
+        self.cache = cache
+        # Optional pool sharing detected keys and entities, for services
+        # keeping many messages
+        self.interner = interner
 
     def wrap_message(
         self,
@@ -34,70 +74,303 @@ class GAPProtocol:
         role: str = "assistant",
         model: Optional[str] = None,
         thread_id: Optional[str] = None,
-        entities: Optional[Dict[str, Dict[str, str]]] = None
+        entities: Optional[Dict[str, Dict[str, str]]] = None,
+        parent_messages: Optional[List[str]] = None
     ) -> GAPMessage:
-        """Wrap content with GAP metadata"""
-
-        # Auto-detect entities from content
-        detected_entities = self.entity_detector.detect_entities(content)
+        """Wrap content with GAP metadata
 
-        # Merge with provided entities
-        merged_entities = self.entity_detector.merge_entities(detected_entities, entities)
-
-        # Create source metadata
-        source = GAPSource(
-            platform=platform,
-            model=model,
-            chat_id=chat_id,
-            timestamp=datetime.now().isoformat(),
-            role=role
+        ``parent_messages`` lists the ids (``platform_chat_timestamp``) of
+        messages this one replies to or builds on.
+        """
+        return to_model(
+            self.wrap_record(content, platform, chat_id, role, model, thread_id, entities, parent_messages)
         )
 
-        # Create context
-        context = GAPContext(
-            thread_id=thread_id,
-            entities=merged_entities
+    def wrap_record(
+        self,
+        content: str,
+        platform: str,
+        chat_id: str,
+        role: str = "assistant",
+        model: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        entities: Optional[Dict[str, Dict[str, str]]] = None,
+        parent_messages: Optional[List[str]] = None
+    ) -> MessageRecord:
+        """Wrap content with GAP metadata as a record, for code that stores or
+        transforms it without needing a validated model"""
+
+        # Auto-detect entities
+        detected_entities = self._detect(content)
+
+        return self._build_message(
+            content, detected_entities, platform, chat_id, role, model, thread_id,
+            entities, timestamp=datetime.now().isoformat(), parent_messages=parent_messages
         )
 
-        # Create transform hints
-        pronoun_map = self.pronoun_transformer.generate_pronoun_map(content, role)
-        transform_hints = GAPTransformHints(pronoun_map=pronoun_map)
-
-        # Create message content
-        message_content = GAPMessageContent(
-            content=content,
-            source=source,
-            context=context,
-            transform_hints=transform_hints
+    def wrap_many(
+        self,
+        messages: Iterable[Dict[str, Any]],
+        pool: Optional[ProcessPoolExecutor] = None,
+        max_workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> List[GAPMessage]:
+        """Wrap many messages, detecting entities across a process pool
+
+        Each message is a dict of ``wrap_message`` arguments, including
+        ``parent_messages``. Only content
+        missing from the detection cache goes to the workers, once per
+        distinct content; results come back in input order and are interned
+        and cached as single wraps are.
+        """
+        messages = list(messages)
+        detected = self._detect_many(
+            [message["content"] for message in messages],
+            pool,
+            max_workers,
+            chunk_size
         )
 
-        return GAPMessage(
-            gap_version=self.version,
-            message=message_content
+        wrapped = []
+        for message, detected_entities in zip(messages, detected):
+            wrapped.append(to_model(self._build_message(
+                message["content"],
+                detected_entities,
+                message["platform"],
+                message["chat_id"],
+                message.get("role", "assistant"),
+                message.get("model"),
+                message.get("thread_id"),
+                message.get("entities"),
+                timestamp=datetime.now().isoformat(),
+                parent_messages=message.get("parent_messages")
+            )))
+        return wrapped
+
+    def wrap_stream(
+        self,
+        chunks: Iterable[str],
+        platform: str,
+        chat_id: str,
+        role: str = "assistant",
+        model: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        entities: Optional[Dict[str, Dict[str, str]]] = None,
+        on_entity: Optional[Callable[[GAPEntityEvent], None]] = None,
+        parent_messages: Optional[List[str]] = None
+    ) -> GAPMessage:
+        """Wrap streamed content, detecting entities as chunks arrive
+
+        ``parent_messages`` is as for ``wrap_message``.
+        """
+        timestamp = datetime.now().isoformat()
+        detector = StreamingDetector(self.entity_detector)
+        parts = []
+
+        for chunk in chunks:
+            parts.append(chunk)
+            self._emit(detector.feed(chunk), on_entity)
+        self._emit(detector.finish(), on_entity)
+
+        return to_model(self._build_message(
+            "".join(parts), detector.entities(), platform, chat_id, role, model,
+            thread_id, entities, timestamp=timestamp, parent_messages=parent_messages
+        ))
+
+    async def wrap_stream_async(
+        self,
+        chunks: AsyncIterable[str],
+        platform: str,
+        chat_id: str,
+        role: str = "assistant",
+        model: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        entities: Optional[Dict[str, Dict[str, str]]] = None,
+        on_entity: Optional[Callable[[GAPEntityEvent], None]] = None,
+        parent_messages: Optional[List[str]] = None
+    ) -> GAPMessage:
+        """Wrap content from an async stream, detecting entities as chunks arrive
+
+        ``parent_messages`` is as for ``wrap_message``.
+        """
+        timestamp = datetime.now().isoformat()
+        detector = StreamingDetector(self.entity_detector)
+        parts = []
+
+        async for chunk in chunks:
+            parts.append(chunk)
+            self._emit(detector.feed(chunk), on_entity)
+        self._emit(detector.finish(), on_entity)
+
+        return to_model(self._build_message(
+            "".join(parts), detector.entities(), platform, chat_id, role, model,
+            thread_id, entities, timestamp=timestamp, parent_messages=parent_messages
+        ))
+
+    def _detection_key(self, content: str) -> Tuple[str, str, str]:
+        return ("detect", self.entity_detector.config_version, content_digest(content))
+
+    def _detect(self, content: str) -> Dict[str, EntityRecord]:
+        """Detect entities, reusing cached results for known content"""
+        if self.cache is None:
+            return self._shared(self.entity_detector.detect_entities(content))
+
+        key = self._detection_key(content)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self._shared(self.entity_detector.detect_entities(content))
+            self.cache.set(key, cached)
+
+        # Callers own the returned dict; the cached one must stay intact
+        return dict(cached)
+
+    def _detect_many(
+        self,
+        contents: List[str],
+        pool: Optional[ProcessPoolExecutor],
+        max_workers: Optional[int],
+        chunk_size: int
+    ) -> List[Dict[str, EntityRecord]]:
+        """Detect entities for many contents, sending only uncached ones to the pool"""
+        results: List[Optional[Dict[str, EntityRecord]]] = [None] * len(contents)
+        # Positions of each distinct content still to detect
+        missing: Dict[str, List[int]] = {}
+        for index, content in enumerate(contents):
+            cached = self.cache.get(self._detection_key(content)) if self.cache is not None else None
+            if cached is not None:
+                results[index] = dict(cached)
+            else:
+                missing.setdefault(content, []).append(index)
+
+        detected = detect_batch(self.entity_detector, list(missing), pool, max_workers, chunk_size)
+        for (content, positions), detected_entities in zip(missing.items(), detected):
+            detected_entities = self._shared(detected_entities)
+            if self.cache is not None:
+                self.cache.set(self._detection_key(content), detected_entities)
+            for index in positions:
+                results[index] = dict(detected_entities)
+        return results
+
+    def _shared(self, detected_entities: Dict[str, EntityRecord]) -> Dict[str, EntityRecord]:
+        """Intern a detection result, when the protocol has an interner"""
+        if self.interner is not None:
+            return self.interner.detection(detected_entities)
+        return detected_entities
+
+    def _emit(
+        self,
+        events: List[GAPEntityEvent],
+        on_entity: Optional[Callable[[GAPEntityEvent], None]]
+    ) -> None:
+        """Pass entity discovery events to the caller's handler"""
+        if on_entity is not None:
+            for event in events:
+                on_entity(event)
+
+    def _build_message(
+        self,
+        content: str,
+        detected_entities: Dict[str, EntityRecord],
+        platform: str,
+        chat_id: str,
+        role: str,
+        model: Optional[str],
+        thread_id: Optional[str],
+        entities: Optional[Dict[str, Dict[str, str]]],
+        timestamp: str,
+        parent_messages: Optional[List[str]] = None
+    ) -> MessageRecord:
+        """Assemble a GAP message record from content and its detected entities"""
+
+        # Merge with provided entities
+        merged_entities = self.entity_detector.merge_entities(detected_entities, entities)
+        pronoun_map = self.pronoun_transformer.generate_pronoun_map(content, role)
+        pronoun_profile = None
+        undefined = []
+
+        # The compact revision lists undefined references by key and refers
+        # to the role's standard pronoun map
+        if self.version == COMPACT_VERSION:
+            undefined, merged_entities = split_entities(merged_entities)
+            pronoun_profile, pronoun_map = split_pronoun_map(pronoun_map, role)
+
+        return MessageRecord(
+            self.version,
+            MessageContentRecord(
+                content,
+                SourceRecord(platform, model, chat_id, timestamp, role),
+                ContextRecord(
+                    thread_id=thread_id,
+                    parent_messages=list(parent_messages) if parent_messages else [],
+                    entities=merged_entities,
+                    undefined=undefined
+                ),
+                TransformHintsRecord(pronoun_map=pronoun_map, pronoun_profile=pronoun_profile)
+            )
         )
 
-    def to_markdown(self, gap_message: GAPMessage) -> str:
+    def to_markdown(self, gap_message: AnyMessage) -> str:
         """Convert GAP message to human-readable markdown format"""
         return self.platform_transformer.transform_for_clipboard(gap_message, format="markdown")
 
-    def from_markdown(self, markdown: str) -> Optional[GAPMessage]:
-        """Parse GAP message from markdown format"""
+    def to_json(self, gap_message: AnyMessage) -> bytes:
+        """Encode a GAP message as compact UTF-8 JSON"""
+        return message_json(to_model(gap_message))
+
+    def to_wire(self, gap_message: AnyMessage) -> bytes:
+        """Encode a GAP message in the compact binary wire format"""
+        return encode_message(gap_message)
+
+    def from_wire(self, data: BufferLike) -> GAPMessage:
+        """Decode a GAP message from the binary wire format
+
+        Unlike markdown, the wire format carries every field, so entities
+        come back exactly as they were sent. Raises ValueError on
+        malformed input.
+        """
+        return decode_message(data)
+
+    def from_markdown(self, markdown: str, redetect: bool = False) -> Optional[GAPMessage]:
+        """Parse GAP message from markdown format
+
+        The message is rebuilt from the header and content as written,
+        keeping the original timestamp and the listed entities. Pass
+        ``redetect=True`` to also run entity detection over the content, as
+        wrapping it again would; undefined references are only listed in
+        the result then.
+        """
+        record = self.markdown_record(markdown, redetect)
+        return to_model(record) if record is not None else None
+
+    def markdown_record(self, markdown: str, redetect: bool = False) -> Optional[MessageRecord]:
+        """Parse GAP markdown into a record, as from_markdown does"""
         try:
             # Extract content between GAP:CONTENT and GAP:END
-            content_match = re.search(r'\[GAP:CONTENT\](.*?)\[GAP:END\]', markdown, re.DOTALL)
-            if not content_match:
+            content_start = markdown.find("[GAP:CONTENT]")
+            if content_start < 0:
+                return None
+            content_end = markdown.find("[GAP:END]", content_start + len("[GAP:CONTENT]"))
+            if content_end < 0:
                 return None
 
-            content = content_match.group(1).strip()
+            # Trim surrounding whitespace before slicing, copying the content once
+            begin = content_start + len("[GAP:CONTENT]")
+            while begin < content_end and markdown[begin].isspace():
+                begin += 1
+            while content_end > begin and markdown[content_end - 1].isspace():
+                content_end -= 1
+            content = markdown[begin:content_end]
 
-            # Extract metadata
-            from_match = re.search(r'From: ([^|]+)\|.*Thread: ([^\n]+)', markdown)
-            context_match = re.search(r'Context: (\w+) message from ([^\n]+)', markdown)
-            entities_match = re.search(r'Entities: ([^\n]+)', markdown)
+            # Extract metadata from the header only
+            header = markdown[:content_start]
+            from_match = _MARKDOWN_FROM.search(header)
+            context_match = _MARKDOWN_CONTEXT.search(header)
+            entities_match = _MARKDOWN_ENTITIES.search(header)
 
             platform = from_match.group(1).strip() if from_match else "unknown"
             thread_id = from_match.group(2).strip() if from_match else None
             role = context_match.group(1) if context_match else "assistant"
+            timestamp = context_match.group(2).strip() if context_match else datetime.now().isoformat()
 
             # Parse entities
             entities = {}
@@ -105,20 +378,17 @@ class GAPProtocol:
                 entities_str = entities_match.group(1)
                 if entities_str != "None":
                     # Parse entity pairs
-                    entity_pairs = re.findall(r'"([^"]+)"\s*=\s*([^,]+)', entities_str)
-                    for key, value in entity_pairs:
+                    for key, value in _MARKDOWN_ENTITY_PAIR.findall(entities_str):
                         entities[key.strip()] = {
                             "type": "parsed",
                             "value": value.strip()
                         }
 
-            return self.wrap_message(
-                content=content,
-                platform=platform,
-                chat_id="parsed_from_markdown",
-                role=role,
-                thread_id=thread_id if thread_id != "Unknown" else None,
-                entities=entities
+            detected_entities = self._detect(content) if redetect else {}
+
+            return self._build_message(
+                content, detected_entities, platform, "parsed_from_markdown", role, None,
+                thread_id if thread_id != "Unknown" else None, entities, timestamp=timestamp
             )
 
         except Exception as e:
@@ -127,7 +397,7 @@ class GAPProtocol:
 
     def transform_for_platform(
         self,
-        gap_message: GAPMessage,
+        gap_message: AnyMessage,
         target_platform: str,
         context_additions: Optional[Dict[str, str]] = None,
         include_metadata: bool = True
@@ -140,77 +410,229 @@ class GAPProtocol:
             include_metadata
         )
 
+    def iter_transform_for_platform(
+        self,
+        gap_message: AnyMessage,
+        target_platform: str,
+        context_additions: Optional[Dict[str, str]] = None,
+        include_metadata: bool = True,
+        chunk_size: int = 65536
+    ) -> Iterator[str]:
+        """Transform GAP message content for target platform, yielding it in pieces"""
+        return self.platform_transformer.iter_transform_for_platform(
+            gap_message,
+            target_platform,
+            context_additions,
+            include_metadata,
+            chunk_size
+        )
+
+    def transform_for_platforms(
+        self,
+        gap_message: AnyMessage,
+        targets: List[str],
+        context_additions: Optional[Dict[str, str]] = None,
+        include_metadata: bool = True
+    ) -> Dict[str, str]:
+        """Transform GAP message content for several platforms, substituting once"""
+        return self.platform_transformer.transform_for_platforms(
+            gap_message,
+            targets,
+            context_additions,
+            include_metadata
+        )
+
     def update_entity(
         self,
-        gap_message: GAPMessage,
+        gap_message: AnyMessage,
         entity_key: str,
         entity_value: str,
         entity_type: str = "user_defined"
-    ) -> GAPMessage:
-        """Update an entity definition in a GAP message"""
-        gap_message.message.context.entities = self.entity_detector.update_entity(
-            gap_message.message.context.entities,
-            entity_key,
-            entity_value,
-            entity_type
-        )
+    ) -> AnyMessage:
+        """Update an entity definition in a GAP message or record"""
+        context = gap_message.message.context
+        if isinstance(gap_message, MessageRecord):
+            context.entities = self.entity_detector.update_entity(
+                context.entities,
+                entity_key,
+                entity_value,
+                entity_type
+            )
+        else:
+            context.entities[entity_key] = GAPEntity(type=entity_type, value=entity_value)
+        if entity_key in context.undefined:
+            context.undefined = [key for key in context.undefined if key != entity_key]
         return gap_message
 
-    def get_undefined_entities(self, gap_message: GAPMessage) -> List[str]:
+    def add_references(self, gap_message: AnyMessage) -> List[str]:
+        """Mark the ambiguous references in a message's content it does not define
+
+        Markdown lists only defined entities, so a message parsed without
+        ``redetect`` has none. This finds the ones redetection would, running
+        only the reference patterns, and returns the keys added.
+        """
+        context = gap_message.message.context
+        known = set(undefined_references(gap_message))
+        added = [
+            key for key in self.entity_detector.detect_references(gap_message.message.content)
+            if key not in context.entities and key not in known
+        ]
+        if gap_message.gap_version == COMPACT_VERSION:
+            context.undefined = list(context.undefined) + added
+        else:
+            for key in added:
+                context.entities[key] = (
+                    UNDEFINED_ENTITY if isinstance(gap_message, MessageRecord)
+                    else GAPEntity(type=UNDEFINED_TYPE, value=NEEDS_DEFINITION)
+                )
+        return added
+
+    def get_undefined_entities(self, gap_message: AnyMessage) -> List[str]:
         """Get list of undefined entities in message"""
-        return self.entity_detector.find_undefined_entities(
-            gap_message.message.context.entities
-        )
+        return undefined_references(gap_message)
 
-    def suggest_definitions(self, gap_message: GAPMessage) -> Dict[str, str]:
+    def suggest_definitions(self, gap_message: AnyMessage) -> Dict[str, str]:
         """Suggest entity definitions based on context"""
-        return self.entity_detector.suggest_entity_definitions(
-            gap_message.message.content,
-            gap_message.message.context.entities
-        )
-
+        if self.cache is None:
+            return self.entity_detector.suggest_entity_definitions(
+                gap_message.message.content,
+                gap_message.message.context.entities,
+                self.get_undefined_entities(gap_message)
+            )
 
-def create_context_graph(messages: List[GAPMessage]) -> Dict[str, Any]:
-    """Create a context graph from multiple GAP messages"""
-    graph = {
-        "nodes": {},
-        "edges": [],
-        "entity_definitions": {},
-        "timeline": []
-    }
+        # Suggestions depend on the content and which entities are undefined
+        undefined = self.get_undefined_entities(gap_message)
+        key = (
+            "suggest",
+            self.entity_detector.config_version,
+            content_digest(gap_message.message.content),
+            tuple(undefined)
+        )
+        suggestions = self.cache.get(key)
+        if suggestions is None:
+            suggestions = self.entity_detector.suggest_entity_definitions(
+                gap_message.message.content,
+                gap_message.message.context.entities,
+                undefined
+            )
+            self.cache.set(key, suggestions)
+        return dict(suggestions)
+
+
+class ContextGraph:
+    """Context graph of a list of messages, extended as messages are added
+
+    Each message is linked to the previous message of its thread by a
+    ``thread_connection`` edge and to the messages it lists in
+    ``parent_messages`` by ``parent`` edges, including parents added after
+    it. Adding a message costs only its own links, so a thread's graph can
+    be kept up to date instead of rebuilt.
+
+    With a thread's entity table, entity definitions are read from it when
+    the graph is output, so changes to the table need no update here;
+    ``defined_in`` is then the source the messages were shared with.
+    """
+
+    def __init__(self, table: Optional[EntityTable] = None):
+        self.table = table
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.edges: List[Dict[str, str]] = []
+        self.adjacency: Dict[str, List[str]] = {}
+        self.threads: Dict[str, List[str]] = {}
+        self.entity_definitions: Dict[str, Dict[str, Any]] = {}
+        self.timeline: List[str] = []
+        # Timeline position of each node
+        self.positions: Dict[str, int] = {}
+        # Children waiting for a parent not added yet
+        self._waiting: Dict[str, List[str]] = {}
+
+    def _link(self, from_id: str, to_id: str, edge_type: str) -> None:
+        self.adjacency[from_id].append(to_id)
+        self.edges.append({"from": from_id, "to": to_id, "type": edge_type})
+
+    def add(self, msg: AnyMessage) -> str:
+        """Add a message, returning its node id"""
+        message = msg.message
+        source = message.source
+        context = message.context
 
-    for msg in messages:
         # Add node for this message
-        node_id = f"{msg.message.source.platform}_{msg.message.source.chat_id}_{msg.message.source.timestamp}"
-        graph["nodes"][node_id] = {
-            "platform": msg.message.source.platform,
-            "content": msg.message.content[:100] + "...",
-            "timestamp": msg.message.source.timestamp,
-            "role": msg.message.source.role
+        node_id = f"{source.platform}_{source.chat_id}_{source.timestamp}"
+        self.nodes[node_id] = {
+            "platform": source.platform,
+            "content": message.content[:100] + "...",
+            "timestamp": source.timestamp,
+            "role": source.role
         }
+        self.adjacency.setdefault(node_id, [])
 
         # Add to timeline
-        graph["timeline"].append(node_id)
+        self.positions[node_id] = len(self.timeline)
+        self.timeline.append(node_id)
 
         # Merge entity definitions
-        for entity_key, entity in msg.message.context.entities.items():
-            if entity.value != "[NEEDS_DEFINITION]":
-                graph["entity_definitions"][entity_key] = {
-                    "value": entity.value,
-                    "type": entity.type,
-                    "defined_in": node_id
-                }
-
-        # Add edges based on thread_id
-        if msg.message.context.thread_id:
-            # Find other nodes in same thread
-            for existing_id, existing_node in graph["nodes"].items():
-                if existing_id != node_id:
-                    # Simple connection based on thread
-                    graph["edges"].append({
-                        "from": existing_id,
-                        "to": node_id,
-                        "type": "thread_connection"
-                    })
-
-    return graph
+        if self.table is None:
+            for entity_key, entity in context.entities.items():
+                if entity.value != "[NEEDS_DEFINITION]":
+                    self.define(entity_key, entity, node_id)
+
+        # Link to the previous message of the same thread
+        if context.thread_id:
+            thread = self.threads.setdefault(context.thread_id, [])
+            if thread and thread[-1] != node_id:
+                self._link(thread[-1], node_id, "thread_connection")
+            thread.append(node_id)
+
+        for parent_id in context.parent_messages:
+            if parent_id == node_id:
+                continue
+            if parent_id in self.nodes:
+                self._link(parent_id, node_id, "parent")
+            else:
+                self._waiting.setdefault(parent_id, []).append(node_id)
+        for child_id in self._waiting.pop(node_id, ()):
+            self._link(node_id, child_id, "parent")
+
+        return node_id
+
+    def define(self, entity_key: str, entity: Any, node_id: str) -> None:
+        """Record an entity definition made by a node, overriding earlier ones"""
+        self.entity_definitions[entity_key] = {
+            "value": entity.value,
+            "type": entity.type,
+            "defined_in": node_id
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The graph as create_context_graph returns it; its parts are shared, not copied"""
+        entity_definitions = self.entity_definitions
+        if self.table is not None:
+            table = self.table
+            entity_definitions = {
+                entity_key: {"value": entity.value, "type": entity.type, "defined_in": table.defined_in(entity_key)}
+                for entity_key, entity in table.current.items()
+            }
+        return {
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "adjacency": self.adjacency,
+            "threads": self.threads,
+            "entity_definitions": entity_definitions,
+            "timeline": self.timeline
+        }
+
+
+def create_context_graph(messages: List[AnyMessage], table: Optional[EntityTable] = None) -> Dict[str, Any]:
+    """Create a context graph from multiple GAP messages
+
+    Built in one pass (see ContextGraph). ``adjacency`` lists each node's
+    successors and ``threads`` each thread's nodes in order; ``edges``
+    lists the same edges as pairs.
+
+    As for ContextMerger.merge_contexts, a thread's entity table gives the
+    entity definitions of all of its stored messages directly.
+    """
+    graph = ContextGraph(table)
+    for msg in messages:
+        graph.add(msg)
+    return graph.as_dict()
@@ -0,0 +1,115 @@
+"""
+Compact internal representation of GAP messages
+
+The pydantic models in models.py validate every instance they build, and
+each instance costs a full model's memory. Detection, transformation and
+the service stores work on these slotted dataclasses instead. They mirror
+the models attribute for attribute, so code reading a message accepts
+either one. ``to_model`` and ``to_record`` convert at the HTTP/MCP boundary.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from .models import GAPEntity, GAPMessage
+
+
+@dataclass(frozen=True, slots=True)
+class EntityRecord:
+    """Entity definition; immutable, so one instance can be shared"""
+    type: str
+    value: str
+    defined_in: Optional[str] = None
+
+
+# Detection shares one placeholder between every undefined reference
+UNDEFINED_ENTITY = EntityRecord("ambiguous_reference", "[NEEDS_DEFINITION]")
+
+
+@dataclass(slots=True)
+class SourceRecord:
+    platform: str
+    model: Optional[str]
+    chat_id: str
+    timestamp: str
+    role: str = "assistant"
+
+
+@dataclass(slots=True)
+class ContextRecord:
+    thread_id: Optional[str] = None
+    parent_messages: List[str] = field(default_factory=list)
+    entities: Dict[str, EntityRecord] = field(default_factory=dict)
+    undefined: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class TransformHintsRecord:
+    maintain_tense: Optional[str] = None
+    preserve_perspective: Optional[str] = None
+    pronoun_map: Dict[str, str] = field(default_factory=dict)
+    pronoun_profile: Optional[str] = None
+
+
+@dataclass(slots=True)
+class MessageContentRecord:
+    content: str
+    source: SourceRecord
+    context: ContextRecord
+    transform_hints: TransformHintsRecord
+
+
+@dataclass(slots=True)
+class MessageRecord:
+    gap_version: str
+    message: MessageContentRecord
+
+
+# Either form of a message, for code that only reads it
+AnyMessage = Union[GAPMessage, MessageRecord]
+
+
+def entity_record(data: Dict[str, Any]) -> EntityRecord:
+    """Validate entity fields given by a caller into a record"""
+    entity = GAPEntity(**data)
+    return EntityRecord(entity.type, entity.value, entity.defined_in)
+
+
+def to_model(record: AnyMessage) -> GAPMessage:
+    """Validate a record into a GAP message; messages are returned as-is"""
+    if isinstance(record, GAPMessage):
+        return record
+    return GAPMessage.model_validate(record, from_attributes=True)
+
+
+def to_record(gap_message: AnyMessage) -> MessageRecord:
+    """Copy a GAP message into a record; records are returned as-is"""
+    if isinstance(gap_message, MessageRecord):
+        return gap_message
+
+    message = gap_message.message
+    source = message.source
+    context = message.context
+    hints = message.transform_hints
+    return MessageRecord(
+        gap_message.gap_version,
+        MessageContentRecord(
+            message.content,
+            SourceRecord(source.platform, source.model, source.chat_id, source.timestamp, source.role),
+            ContextRecord(
+                context.thread_id,
+                list(context.parent_messages),
+                {
+                    key: EntityRecord(entity.type, entity.value, entity.defined_in)
+                    for key, entity in context.entities.items()
+                },
+                list(context.undefined)
+            ),
+            TransformHintsRecord(
+                hints.maintain_tense,
+                hints.preserve_perspective,
+                dict(hints.pronoun_map),
+                hints.pronoun_profile
+            )
+        )
+    )
@@ -0,0 +1,152 @@
+"""
+GAP protocol revisions and conversion between them
+
+0.1.0 messages carry the full pronoun map of their role and a
+``[NEEDS_DEFINITION]`` entity for every ambiguous reference. The compact
+0.2.0 revision refers to a standard pronoun map by profile id, keeping only
+replacements added to it, and lists undefined references as keys in
+``context.undefined``. Both carry the same information; the helpers here
+convert between them and read either.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .entities import PronounTransformer
+from .models import GAPEntity, GAPMessage, GAPTransformHints
+
+LEGACY_VERSION = "0.1.0"
+COMPACT_VERSION = "0.2.0"
+SUPPORTED_VERSIONS = (LEGACY_VERSION, COMPACT_VERSION)
+
+NEEDS_DEFINITION = "[NEEDS_DEFINITION]"
+UNDEFINED_TYPE = "ambiguous_reference"
+
+# Standard pronoun maps by profile id
+PRONOUN_PROFILES = PronounTransformer.PRONOUN_MAPS
+
+
+def is_undefined_reference(entity: GAPEntity) -> bool:
+    """Whether an entity is the placeholder 0.1.0 uses for an undefined reference"""
+    return entity.value == NEEDS_DEFINITION and entity.type == UNDEFINED_TYPE and entity.defined_in is None
+
+
+def split_pronoun_map(pronoun_map: Dict[str, str], role: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """Split a pronoun map into a standard profile id and the replacements added to it
+
+    A profile is used only when the map starts with its entries in order,
+    so resolving the result gives back the same map, order included.
+    """
+    items = list(pronoun_map.items())
+    for profile in (role, *PRONOUN_PROFILES):
+        standard = PRONOUN_PROFILES.get(profile)
+        if standard and items[:len(standard)] == list(standard.items()):
+            return profile, dict(items[len(standard):])
+    return None, dict(pronoun_map)
+
+
+def split_entities(entities: Dict[str, GAPEntity]) -> Tuple[List[str], Dict[str, GAPEntity]]:
+    """Split 0.1.0 entities into leading undefined reference keys and the rest
+
+    Only the placeholders leading the entities, where detection puts them,
+    are split off. A later one, such as a detected reference a provided
+    entity was merged ahead of, stays in place, so putting the keys back in
+    front gives the same entities, order included.
+    """
+    undefined = []
+    for key, entity in entities.items():
+        if not is_undefined_reference(entity):
+            break
+        undefined.append(key)
+    if not undefined:
+        return undefined, entities
+    return undefined, dict(list(entities.items())[len(undefined):])
+
+
+def resolve_pronoun_map(hints: GAPTransformHints) -> Dict[str, str]:
+    """Return the effective pronoun map of either revision; callers must not modify it"""
+    if hints.pronoun_profile is None:
+        return hints.pronoun_map
+    standard = PRONOUN_PROFILES.get(hints.pronoun_profile)
+    if standard is None:
+        raise ValueError(f"Unknown pronoun profile: {hints.pronoun_profile}")
+    if not hints.pronoun_map:
+        return standard
+    return {**standard, **hints.pronoun_map}
+
+
+def undefined_references(gap_message: GAPMessage) -> List[str]:
+    """Keys of references still needing a definition, in either revision"""
+    context = gap_message.message.context
+    undefined = list(context.undefined)
+    undefined.extend(key for key, entity in context.entities.items() if entity.value == NEEDS_DEFINITION)
+    return undefined
+
+
+def upgrade_message(gap_message: GAPMessage) -> GAPMessage:
+    """Return a message in the compact 0.2.0 revision
+
+    Undefined references leading the entities move to ``context.undefined``;
+    see ``split_entities``.
+    """
+    if gap_message.gap_version == COMPACT_VERSION:
+        return gap_message
+
+    message = gap_message.message
+    context = message.context
+    hints = message.transform_hints
+
+    undefined, entities = split_entities(context.entities)
+    undefined = list(context.undefined) + undefined
+    profile, pronoun_map = split_pronoun_map(resolve_pronoun_map(hints), message.source.role)
+
+    return gap_message.model_copy(update={
+        "gap_version": COMPACT_VERSION,
+        "message": message.model_copy(update={
+            "context": context.model_copy(update={"entities": entities, "undefined": undefined}),
+            "transform_hints": hints.model_copy(update={
+                "pronoun_profile": profile,
+                "pronoun_map": pronoun_map
+            })
+        })
+    })
+
+
+def downgrade_message(gap_message: GAPMessage) -> GAPMessage:
+    """Return a message in the 0.1.0 revision
+
+    Undefined references become placeholder entities ahead of the others,
+    where detection and ``upgrade_message`` put them, and the pronoun
+    profile is expanded.
+    """
+    if gap_message.gap_version == LEGACY_VERSION:
+        return gap_message
+
+    message = gap_message.message
+    context = message.context
+    hints = message.transform_hints
+
+    entities = {
+        key: GAPEntity(type=UNDEFINED_TYPE, value=NEEDS_DEFINITION)
+        for key in context.undefined
+    }
+    entities.update(context.entities)
+
+    return gap_message.model_copy(update={
+        "gap_version": LEGACY_VERSION,
+        "message": message.model_copy(update={
+            "context": context.model_copy(update={"entities": entities, "undefined": []}),
+            "transform_hints": hints.model_copy(update={
+                "pronoun_profile": None,
+                "pronoun_map": dict(resolve_pronoun_map(hints))
+            })
+        })
+    })
+
+
+def convert_message(gap_message: GAPMessage, version: str) -> GAPMessage:
+    """Return a message in the given protocol revision"""
+    if version == COMPACT_VERSION:
+        return upgrade_message(gap_message)
+    if version == LEGACY_VERSION:
+        return downgrade_message(gap_message)
+    raise ValueError(f"Unsupported GAP version {version}; expected one of {', '.join(SUPPORTED_VERSIONS)}")
@@ -0,0 +1,57 @@
+"""
+Fast JSON encoding for GAP messages and service responses
+"""
+
+import json
+from typing import Any, Dict, Iterable
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # optional: pip install gap-protocol[fast]
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+class RawJSON(bytes):
+    """Already encoded JSON, spliced in as-is by json_object and json_array"""
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON
+
+    Uses orjson when it is installed and the standard library otherwise.
+    Pydantic models anywhere in the value are encoded by their fields;
+    pass a whole model to message_json instead, which is faster.
+    """
+    if isinstance(value, RawJSON):
+        return value
+    if isinstance(value, BaseModel):
+        return to_json(value)
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def message_json(message: BaseModel) -> RawJSON:
+    """Encode a GAP message (or any model) with pydantic's compiled serializer"""
+    return RawJSON(to_json(message))
+
+
+def json_object(fields: Dict[str, Any]) -> RawJSON:
+    """Encode an object whose RawJSON values are inserted without re-encoding"""
+    return RawJSON(b"{" + b",".join(dumps(key) + b":" + dumps(value) for key, value in fields.items()) + b"}")
+
+
+def json_array(items: Iterable[Any]) -> RawJSON:
+    """Encode an array whose RawJSON items are inserted without re-encoding"""
+    return RawJSON(b"[" + b",".join(dumps(item) for item in items) + b"]")
@@ -0,0 +1,152 @@
+"""
+Incremental entity detection for streamed GAP content
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+
+from .entities import EntityDetector
+from .models import GAPEntity, GAPEntityEvent
+from .records import EntityRecord
+
+
+class StreamingDetector:
+    """Detect entities over a stream of text chunks in bounded memory
+
+    Text is scanned a window at a time. Matches ending in the last
+    ``overlap`` characters of a window are left for the next one, which
+    starts ``overlap`` characters before that point, so phrases split across
+    chunks or windows are still found. Only the unscanned tail of the text
+    is held; for matches shorter than ``overlap`` the result equals
+    detecting over the whole content at once. The overlap is raised to the
+    detector's longest ambiguous phrase or glossary term when that is
+    longer, so those are never missed.
+    """
+
+    def __init__(self, detector: EntityDetector, window: int = 65536, overlap: int = 512):
+        if window <= 2 * overlap + 1:
+            raise ValueError("window must be more than twice the overlap")
+        overlap = max(overlap, detector.longest_match())
+        self.detector = detector
+        self.window = max(window, 2 * overlap + 2)
+        self.overlap = overlap
+
+        self._buffer = ""    # unscanned tail, starting at absolute offset _base
+        self._base = 0
+        self._pos = 0        # where scanning starts in _buffer; earlier text is context
+        self._settled = 0    # absolute offset up to which matches are final
+
+        self._ambiguous: Dict[str, List[Tuple[int, int]]] = {}
+        self._tech: List[List[Tuple[int, int, str]]] = [
+            [] for _ in detector._scanner.tech_types
+        ]
+        self._glossary: List[Tuple[int, int, int]] = []
+        self._seen: Set[str] = set()
+        self._finished = False
+
+    def feed(self, chunk: str) -> List[GAPEntityEvent]:
+        """Add a chunk of text, returning entities discovered so far"""
+        if self._finished:
+            raise ValueError("Stream already finished")
+
+        events = []
+        # Take oversized chunks a window at a time so the buffer stays bounded
+        for offset in range(0, len(chunk), self.window):
+            self._buffer += chunk[offset:offset + self.window]
+            while len(self._buffer) >= self.window:
+                events.extend(self._scan(final=False))
+        return events
+
+    def finish(self) -> List[GAPEntityEvent]:
+        """Scan the remaining text, returning the last discovered entities"""
+        if self._finished:
+            return []
+        events = self._scan(final=True)
+        self._finished = True
+        return events
+
+    def entities(self) -> Dict[str, EntityRecord]:
+        """Return the detected entities, as detect_entities would"""
+        if not self._finished:
+            raise ValueError("Stream not finished")
+        return self.detector._entities(self._ambiguous, self._tech, self._glossary)
+
+    def result(self) -> Tuple[Dict[str, EntityRecord], List[Tuple[int, int, str, str]]]:
+        """Return the detected entities and spans, as detect_with_spans would"""
+        spans = self.detector._spans(self._ambiguous, self._tech, self._glossary)
+        return self.entities(), spans
+
+    def _scan(self, final: bool) -> List[GAPEntityEvent]:
+        """Scan the buffer and settle matches that later text cannot change"""
+        detector = self.detector
+        text = self._buffer
+        base = self._base
+        cutoff = len(text) if final else len(text) - self.overlap
+        settled = base + cutoff
+
+        def is_new(end: int) -> bool:
+            return self._settled < base + end <= settled
+
+        # Overlapping patterns resume where their last settled match ended,
+        # as a single scan of the whole content would
+        tech_pos = [
+            matches[-1][1] - base if matches else 0 for matches in self._tech
+        ]
+
+        events = []
+        ambiguous, tech = detector._scanner.scan(text, self._pos, tech_pos)
+
+        for entity_key, spans in ambiguous.items():
+            for start, end in spans:
+                if is_new(end):
+                    self._ambiguous.setdefault(entity_key, []).append((base + start, base + end))
+                    self._discover(events, entity_key, "ambiguous_reference", "[NEEDS_DEFINITION]",
+                                   base + start, base + end)
+
+        for entity_type, matches, settled_matches in zip(
+            detector._scanner.tech_types, tech, self._tech
+        ):
+            for start, end, value in matches:
+                if is_new(end):
+                    settled_matches.append((base + start, base + end, value))
+                    self._discover(events, detector.tech_entity_key(entity_type, value),
+                                   entity_type, value, base + start, base + end)
+
+        if detector.glossary is not None:
+            glossary_pos = self._glossary[-1][1] - base if self._glossary else 0
+            for start, end, entry_index in detector.glossary.find(text, max(self._pos, glossary_pos)):
+                if is_new(end):
+                    self._glossary.append((base + start, base + end, entry_index))
+                    entity_key, entity_type, value = detector.glossary.entry(entry_index)
+                    self._discover(events, entity_key, entity_type, value,
+                                   base + start, base + end, defined_in="glossary")
+
+        self._settled = settled
+        if not final:
+            # Keep the unsettled tail, an overlap's worth before it for
+            # matches reaching back, and one character of word-boundary context
+            retain = cutoff - self.overlap - 1
+            self._buffer = text[retain:]
+            self._base = base + retain
+            self._pos = 1
+        return events
+
+    def _discover(
+        self,
+        events: List[GAPEntityEvent],
+        entity_key: str,
+        entity_type: str,
+        value: str,
+        start: int,
+        end: int,
+        defined_in: Optional[str] = None
+    ) -> None:
+        """Record an event the first time an entity key is seen"""
+        if entity_key in self._seen:
+            return
+        self._seen.add(entity_key)
+        events.append(GAPEntityEvent(
+            key=entity_key,
+            entity=GAPEntity(type=entity_type, value=value, defined_in=defined_in),
+            start=start,
+            end=end
+        ))
@@ -0,0 +1,235 @@
+"""
+Single-scan pronoun and entity substitution for GAP Protocol
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .cache import LRUCache
+
+# Patterns and replacements must start and end on word characters, like a
+# \b-bounded search, for the single-scan analysis below to hold
+_WORD_EDGES = re.compile(r"^\w(?:.*\w)?$", re.DOTALL)
+_NON_WORD = re.compile(r"\W")
+_WORD_START = re.compile(r"\b(?=\w)")
+_WORD_END = re.compile(r"(?<=\w)\b")
+
+# Compiled plans shared by every transformer in the process
+plan_cache = LRUCache(maxsize=512)
+
+
+def _trie_regex(phrases: List[Tuple[str, str]], boundary: bool = True) -> str:
+    """Build a prefix-shared alternation marking each phrase with a named group"""
+    trie: Dict[str, dict] = {}
+    for phrase, group_name in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = group_name
+
+    def render(node: dict) -> str:
+        # Longer continuations first, then the phrase ending at this node
+        alternatives = [re.escape(char) + render(child) for char, child in node.items() if char]
+        if "" in node:
+            alternatives.append((r"\b" if boundary else "") + f"(?P<{node['']}>)")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return render(trie)
+
+
+def legacy_substitute(content: str, pronoun_map: Dict[str, str], definitions: Dict[str, str]) -> str:
+    """Apply replacements one pattern at a time, pronouns first, then entities"""
+    for old_pronoun, new_pronoun in pronoun_map.items():
+        pattern = r'\b' + re.escape(old_pronoun) + r'\b'
+        content = re.sub(pattern, new_pronoun, content, flags=re.IGNORECASE)
+
+    for entity_key, value in definitions.items():
+        pattern = entity_key.replace("_", " ")
+        content = re.sub(r'\b' + re.escape(pattern) + r'\b', value, content, flags=re.IGNORECASE)
+
+    return content
+
+
+class SubstitutionPlan:
+    """Pronoun and entity replacements compiled into a single scan
+
+    Every pronoun and defined phrase is folded into one prefix-shared regex
+    and replaced through a lookup on the matched alternative, so the cost of
+    a transform depends on content length rather than on the number of
+    replacements. Applying the replacements one after another, as
+    ``legacy_substitute`` does, lets one replacement feed the next; plans
+    where that could change the result (a replacement containing or
+    completing a pattern, patterns overlapping each other) are detected when
+    compiled and fall back to the sequential path.
+    """
+
+    def __init__(self, pronoun_map: Dict[str, str], definitions: Dict[str, str]):
+        self.pronoun_map = dict(pronoun_map)
+        self.definitions = dict(definitions)
+        self.pattern = None
+        self._values: Dict[int, str] = {}
+        self.single_pass = self._compile([
+            *self.pronoun_map.items(),
+            *((key.replace("_", " "), value) for key, value in self.definitions.items())
+        ])
+
+    def apply(self, content: str, check_parity: bool = False) -> str:
+        """Apply all replacements to content
+
+        With ``check_parity`` the result is compared against the sequential
+        replacements and a ValueError is raised if they differ.
+        """
+        if not self.single_pass:
+            return legacy_substitute(content, self.pronoun_map, self.definitions)
+
+        result = content
+        if self.pattern is not None:
+            result = self.pattern.sub(self._replace, content)
+
+        if check_parity:
+            expected = legacy_substitute(content, self.pronoun_map, self.definitions)
+            if result != expected:
+                raise ValueError(
+                    f"Substitution parity mismatch: got {result!r}, expected {expected!r}"
+                )
+        return result
+
+    def iter_apply(self, content: str, chunk_size: int = 65536, check_parity: bool = False) -> Iterator[str]:
+        """Apply all replacements, yielding the result in chunks of about chunk_size
+
+        A single-scan plan builds each chunk as it goes, so the whole result
+        is never held at once. Sequential plans, and parity checks, need the
+        complete result first.
+        """
+        if not self.single_pass or self.pattern is None or check_parity:
+            result = self.apply(content, check_parity=check_parity)
+            for offset in range(0, len(result), chunk_size):
+                yield result[offset:offset + chunk_size]
+            return
+
+        pieces: List[str] = []
+        size = 0
+        last = 0
+        for match in self.pattern.finditer(content):
+            # Long stretches without matches are cut into chunk-sized pieces
+            while match.start() - last >= chunk_size - size:
+                cut = last + chunk_size - size
+                pieces.append(content[last:cut])
+                yield "".join(pieces)
+                pieces, size, last = [], 0, cut
+            value = self._values[match.lastindex]
+            pieces.append(content[last:match.start()])
+            pieces.append(value)
+            size += match.start() - last + len(value)
+            last = match.end()
+            if size >= chunk_size:
+                yield "".join(pieces)
+                pieces, size = [], 0
+
+        while len(content) - last > chunk_size - size:
+            cut = last + chunk_size - size
+            pieces.append(content[last:cut])
+            yield "".join(pieces)
+            pieces, size, last = [], 0, cut
+        pieces.append(content[last:])
+        tail = "".join(pieces)
+        if tail:
+            yield tail
+
+    def _replace(self, match: re.Match) -> str:
+        return self._values[match.lastindex]
+
+    def _compile(self, replacements: List[Tuple[str, str]]) -> bool:
+        """Build the combined pattern, or return False if order matters"""
+        if not replacements:
+            return True
+        # re.sub reads backslashes in replacements as escapes
+        if any(not _WORD_EDGES.match(text) or "\\" in value for text, value in replacements):
+            return False
+
+        # The first replacement for a pattern wins; later ones find nothing
+        first: Dict[str, str] = {}
+        for text, value in replacements:
+            first.setdefault(text.lower(), value)
+
+        # Where a phrase can be split so that the piece joins non-word text
+        heads, tails, middles = set(), set(), set()
+        for text in first:
+            breaks = [match.start() for match in _NON_WORD.finditer(text)]
+            after = [index + 1 for index in breaks]
+            heads.update(text[:index] for index in breaks)
+            tails.update(text[index:] for index in after)
+            middles.update(text[i:j] for i in after for j in breaks if i <= j)
+
+        # Patterns that contain or overlap one another
+        for text in first:
+            starts = [match.start() for match in _WORD_START.finditer(text)]
+            ends = [match.start() for match in _WORD_END.finditer(text)]
+            if any(text[i:] in heads for i in starts[1:]):
+                return False
+            if any(
+                text[i:j] in first for i in starts for j in ends
+                if i < j and (i, j) != (0, len(text))
+            ):
+                return False
+
+        named = [(text, f"s{index}") for index, text in enumerate(first)]
+        pattern = re.compile(rf"\b(?:{_trie_regex(named)})", re.IGNORECASE)
+
+        # Replacements that contain a pattern, or complete one with the text
+        # around them, would be matched again by a later pattern
+        for value in set(first.values()):
+            if pattern.search(value):
+                return False
+            value = value.lower()
+            if value in middles:
+                return False
+            if any(value[match.start():] in heads for match in _WORD_START.finditer(value)):
+                return False
+            if any(value[:match.start()] in tails for match in _WORD_END.finditer(value)):
+                return False
+
+        self.pattern = pattern
+        self._values = {
+            pattern.groupindex[group_name]: first[text] for text, group_name in named
+        }
+        return True
+
+
+def plan_key(
+    kind: str,
+    pronoun_map: Dict[str, str],
+    definitions: Dict[str, str],
+    platform: Optional[str] = None
+) -> str:
+    """Stable digest of everything a compiled plan depends on
+
+    Map order is part of the key: it decides which replacement wins when a
+    plan falls back to sequential replacements.
+    """
+    encoded = json.dumps(
+        [kind, list(pronoun_map.items()), list(definitions.items()), platform],
+        ensure_ascii=False
+    )
+    return hashlib.blake2b(encoded.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def compile_plan(
+    pronoun_map: Dict[str, str],
+    definitions: Dict[str, str],
+    cache: Optional[LRUCache] = plan_cache
+) -> SubstitutionPlan:
+    """Return the substitution plan for a pronoun map and definitions, reusing a cached one"""
+    if cache is None:
+        return SubstitutionPlan(pronoun_map, definitions)
+
+    key = plan_key("substitution", pronoun_map, definitions)
+    plan = cache.get(key)
+    if plan is None:
+        plan = SubstitutionPlan(pronoun_map, definitions)
+        cache.set(key, plan)
+    return plan
@@ -2,9 +2,13 @@
 Platform-specific transformers for GAP Protocol
 """
 
-import re
-from typing import Dict, Optional
-from .models import GAPMessage
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .cache import LRUCache
+from .entity_tables import EntityTable
+from .platforms import PlatformRegistry, PlatformRenderer
+from .records import AnyMessage, to_model
+from .revisions import resolve_pronoun_map
+from .substitution import SubstitutionPlan, compile_plan, plan_cache as default_plan_cache, plan_key
 
 
 class PlatformTransformer:
@@ -43,92 +47,137 @@ class PlatformTransformer:
         }
     }
 
-    def __init__(self):
-        self.platforms = list(self.PLATFORM_CONFIGS.keys())
+    def __init__(
+        self,
+        check_parity: bool = False,
+        plan_cache: Optional[LRUCache] = None,
+        registry: Optional[PlatformRegistry] = None
+    ):
+        # Renderers compiled from PLATFORM_CONFIGS at import, plus any
+        # platforms registered or loaded from a config file since
+        self.registry = registry if registry is not None else platform_registry
+        # Compare every substitution with the sequential replacements
+        self.check_parity = check_parity
+        # Compiled plans are shared process-wide unless a cache is given
+        self.plan_cache = plan_cache if plan_cache is not None else default_plan_cache
+
+    @property
+    def platforms(self) -> List[str]:
+        return self.registry.names()
 
     def transform_for_platform(
         self,
-        gap_message: GAPMessage,
+        gap_message: AnyMessage,
         target_platform: str,
         context_additions: Optional[Dict[str, str]] = None,
         include_metadata: bool = True
     ) -> str:
         """Transform GAP message content for target platform"""
+        renderer = self.registry.get(target_platform)
+        plan, definitions_block = self._plan(gap_message, renderer)
+        content = plan.apply(gap_message.message.content, check_parity=self.check_parity)
+        if not include_metadata:
+            return content
+        return self._render_header(gap_message, renderer, definitions_block, context_additions) + content
+
+    def iter_transform_for_platform(
+        self,
+        gap_message: AnyMessage,
+        target_platform: str,
+        context_additions: Optional[Dict[str, str]] = None,
+        include_metadata: bool = True,
+        chunk_size: int = 65536
+    ) -> Iterator[str]:
+        """Transform GAP message content for target platform, yielding it in pieces
+
+        The header (prefix, entity definitions and source line) is yielded
+        first, then the transformed content in chunks of about ``chunk_size``
+        characters.
+        Joined together they equal ``transform_for_platform``'s result.
+        """
+        renderer = self.registry.get(target_platform)
+        plan, definitions_block = self._plan(gap_message, renderer)
 
-        # Get platform config or use generic
-        config = self.PLATFORM_CONFIGS.get(
-            target_platform.lower(),
-            self.PLATFORM_CONFIGS["generic"]
-        )
-
-        content = gap_message.message.content
+        if include_metadata:
+            yield self._render_header(gap_message, renderer, definitions_block, context_additions)
 
-        # Apply pronoun transformations
-        for old_pronoun, new_pronoun in gap_message.message.transform_hints.pronoun_map.items():
-            pattern = r'\b' + re.escape(old_pronoun) + r'\b'
-            content = re.sub(pattern, new_pronoun, content, flags=re.IGNORECASE)
+        # Add the transformed content
+        yield from plan.iter_apply(
+            gap_message.message.content,
+            chunk_size,
+            check_parity=self.check_parity
+        )
 
-        # Replace ambiguous entities with their definitions
-        for entity_key, entity in gap_message.message.context.entities.items():
-            if entity.value != "[NEEDS_DEFINITION]":
-                # Replace the ambiguous reference with the actual value
-                pattern = entity_key.replace("_", " ")
-                content = re.sub(
-                    r'\b' + re.escape(pattern) + r'\b',
-                    entity.value,
-                    content,
-                    flags=re.IGNORECASE
-                )
-
-        # Build the final message
-        parts = []
+    def transform_for_platforms(
+        self,
+        gap_message: AnyMessage,
+        targets: List[str],
+        context_additions: Optional[Dict[str, str]] = None,
+        include_metadata: bool = True
+    ) -> Dict[str, str]:
+        """Transform GAP message content for several platforms at once
+
+        Substitution does not depend on the platform, so the transformed
+        content is computed once and each platform's header is rendered
+        around it. Results are keyed by target as given.
+        """
+        results = {}
+        content = None
+        for target in targets:
+            renderer = self.registry.get(target)
+            plan, definitions_block = self._plan(gap_message, renderer)
+            if content is None:
+                content = plan.apply(gap_message.message.content, check_parity=self.check_parity)
+
+            header = ""
+            if include_metadata:
+                header = self._render_header(gap_message, renderer, definitions_block, context_additions)
+            results[target] = header + content
+
+        return results
+
+    def _render_header(
+        self,
+        gap_message: AnyMessage,
+        renderer: PlatformRenderer,
+        definitions_block: str,
+        context_additions: Optional[Dict[str, str]]
+    ) -> str:
+        """Render the metadata that precedes transformed content"""
+        msg = gap_message.message
+        return renderer.render_header(
+            definitions_block,
+            msg.source.platform,
+            msg.context.thread_id,
+            context_additions
+        )
 
-        if include_metadata:
-            # Add platform-specific prefix
-            parts.append(config["prefix"])
-            parts.append("")
-
-            # Add entity definitions if any are defined
-            defined_entities = {
-                k: v for k, v in gap_message.message.context.entities.items()
-                if v.value != "[NEEDS_DEFINITION]"
-            }
-
-            if defined_entities:
-                parts.append("**Entity Definitions:**")
-                for key, entity in defined_entities.items():
-                    readable_key = key.replace("_", " ").title()
-                    parts.append(config["entity_format"].format(
-                        key=readable_key,
-                        value=entity.value
-                    ))
-                parts.append("")
-
-            # Add context additions if provided
-            if context_additions:
-                parts.append("**Additional Context:**")
-                for key, value in context_additions.items():
-                    parts.append(config["entity_format"].format(
-                        key=key,
-                        value=value
-                    ))
-                parts.append("")
-
-            # Add source information
-            parts.append(f"*Source: {gap_message.message.source.platform} | "
-                        f"Thread: {gap_message.message.context.thread_id or 'N/A'}*")
-            parts.append("")
-            parts.append("---")
-            parts.append("")
+    def _plan(self, gap_message: AnyMessage, renderer: PlatformRenderer) -> Tuple[SubstitutionPlan, str]:
+        """Return the compiled substitution and entity definitions block for a message
 
-        # Add the transformed content
-        parts.append(content)
+        Messages in a thread mostly share a pronoun map and defined entities,
+        so both are cached by those and the platform's layout.
+        """
+        msg = gap_message.message
+        pronoun_map = resolve_pronoun_map(msg.transform_hints)
+        defined = {
+            key: entity.value for key, entity in msg.context.entities.items()
+            if entity.value != "[NEEDS_DEFINITION]"
+        }
 
-        return "\n".join(parts)
+        key = plan_key("transform", pronoun_map, defined, renderer.digest)
+        cached = self.plan_cache.get(key)
+        if cached is None:
+            cached = (
+                compile_plan(pronoun_map, defined, self.plan_cache),
+                renderer.render_definitions(defined)
+            )
+            self.plan_cache.set(key, cached)
+        return cached
 
     def transform_for_clipboard(
         self,
-        gap_message: GAPMessage,
+        gap_message: AnyMessage,
         format: str = "markdown"
     ) -> str:
         """Transform GAP message for clipboard copying"""
@@ -138,11 +187,11 @@ class PlatformTransformer:
         elif format == "plain":
             return self._to_plain_text(gap_message)
         elif format == "json":
-            return gap_message.model_dump_json(indent=2)
+            return to_model(gap_message).model_dump_json(indent=2)
         else:
             return gap_message.message.content
 
-    def _to_markdown(self, gap_message: GAPMessage) -> str:
+    def _to_markdown(self, gap_message: AnyMessage) -> str:
         """Convert to markdown format for clipboard"""
         msg = gap_message.message
 
@@ -161,7 +210,7 @@ Entities: {entities_str}
 {msg.content}
 [GAP:END]"""
 
-    def _to_plain_text(self, gap_message: GAPMessage) -> str:
+    def _to_plain_text(self, gap_message: AnyMessage) -> str:
         """Convert to plain text format"""
         msg = gap_message.message
 
@@ -185,41 +234,76 @@ Entities: {entities_str}
         return "\n".join(parts)
 
 
-class ContextMerger:
-    """Merge context from multiple GAP messages"""
+class MergedContext:
+    """Merged context of a list of messages, extended as messages are added
 
-    def merge_contexts(self, messages: list[GAPMessage]) -> Dict[str, any]:
-        """Merge contexts from multiple messages"""
-        merged = {
-            "entities": {},
-            "threads": set(),
-            "platforms": set(),
-            "timeline": []
-        }
+    With a thread's entity table, the merged entities are its current
+    definitions, read when the context is output.
+    """
 
-        for msg in messages:
-            # Merge entities (later definitions override earlier)
+    def __init__(self, table: Optional[EntityTable] = None):
+        self.table = table
+        self.entities: Dict[str, Any] = {}
+        # Dicts keep threads and platforms in order of first appearance
+        self.threads: Dict[str, None] = {}
+        self.platforms: Dict[str, None] = {}
+        self.timeline: List[Dict[str, Any]] = []
+
+    def add(self, msg: AnyMessage) -> None:
+        """Merge one more message"""
+        # Merge entities (later definitions override earlier)
+        if self.table is None:
             for key, entity in msg.message.context.entities.items():
                 if entity.value != "[NEEDS_DEFINITION]":
-                    merged["entities"][key] = entity
+                    self.entities[key] = entity
+
+        # Collect threads
+        if msg.message.context.thread_id:
+            self.threads[msg.message.context.thread_id] = None
+
+        # Collect platforms
+        self.platforms[msg.message.source.platform] = None
+
+        # Build timeline
+        self.timeline.append({
+            "timestamp": msg.message.source.timestamp,
+            "platform": msg.message.source.platform,
+            "role": msg.message.source.role,
+            "summary": msg.message.content[:100] + "..."
+        })
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The merged context as merge_contexts returns it; the timeline is shared, not copied"""
+        return {
+            "entities": self.table.snapshot() if self.table is not None else dict(self.entities),
+            "threads": list(self.threads),
+            "platforms": list(self.platforms),
+            "timeline": self.timeline
+        }
+
+
+class ContextMerger:
+    """Merge context from multiple GAP messages"""
 
-            # Collect threads
-            if msg.message.context.thread_id:
-                merged["threads"].add(msg.message.context.thread_id)
+    def merge_contexts(self, messages: list[AnyMessage], table: Optional[EntityTable] = None) -> Dict[str, any]:
+        """Merge contexts from multiple messages
+
+        When the messages are all those stored in a thread, in order, pass
+        the thread's entity table: its current definitions are the merged
+        entities, which then need no merging message by message.
+        """
+        merged = MergedContext(table)
+        for msg in messages:
+            merged.add(msg)
+        return merged.as_dict()
 
-            # Collect platforms
-            merged["platforms"].add(msg.message.source.platform)
 
-            # Build timeline
-            merged["timeline"].append({
-                "timestamp": msg.message.source.timestamp,
-                "platform": msg.message.source.platform,
-                "role": msg.message.source.role,
-                "summary": msg.message.content[:100] + "..."
-            })
+# Renderers for the built-in platforms, compiled once at import
+platform_registry = PlatformRegistry(PlatformTransformer.PLATFORM_CONFIGS)
 
-        # Convert sets to lists for JSON serialization
-        merged["threads"] = list(merged["threads"])
-        merged["platforms"] = list(merged["platforms"])
 
-        return merged
+def load_platforms(path: Optional[str]) -> List[str]:
+    """Register the platforms in a JSON config file with the shared registry"""
+    if not path:
+        return []
+    return platform_registry.load_file(path)
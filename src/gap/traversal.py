@@ -0,0 +1,159 @@
+"""
+Breadth-first queries over a CompactGraph
+
+Queries visit nodes in order of distance from where they start and stop at
+a depth cap or a limit on the nodes found, so they cost only the part of
+the graph they reach. Edges of messages added since the graph was last
+compacted are read from its overflow. Edges can be restricted to some types, e.g. only
+``parent`` links from ``parent_messages``.
+"""
+
+from collections import deque
+from typing import Collection, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from .compact_graph import EDGE_TYPES, CompactGraph
+
+
+class Traversal(NamedTuple):
+    """Nodes found, with their distance, and whether the limit cut the search short"""
+    nodes: List[Tuple[int, int]]
+    truncated: bool
+
+
+def _kinds(edge_types: Optional[Collection[str]]) -> Optional[Set[int]]:
+    if edge_types is None:
+        return None
+    unknown = set(edge_types) - set(EDGE_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown edge types: {', '.join(sorted(unknown))}")
+    return {EDGE_TYPES.index(edge_type) for edge_type in edge_types}
+
+
+def _neighbours(
+    graph: CompactGraph,
+    node: int,
+    forward: bool,
+    backward: bool,
+    kinds: Optional[Set[int]]
+) -> Iterator[int]:
+    compacted = node < graph.compacted
+    if forward:
+        if compacted:
+            start, stop = int(graph.indptr[node]), int(graph.indptr[node + 1])
+            for target, kind in zip(graph.indices[start:stop].tolist(), graph.kinds[start:stop].tolist()):
+                if kinds is None or kind in kinds:
+                    yield target
+        for target, kind in graph.out_overflow.get(node, ()):
+            if kinds is None or kind in kinds:
+                yield target
+    if backward:
+        if compacted:
+            start, stop = int(graph.in_indptr[node]), int(graph.in_indptr[node + 1])
+            for source, kind in zip(graph.in_indices[start:stop].tolist(), graph.in_kinds[start:stop].tolist()):
+                if kinds is None or kind in kinds:
+                    yield source
+        for source, kind in graph.in_overflow.get(node, ()):
+            if kinds is None or kind in kinds:
+                yield source
+
+
+def _search(
+    graph: CompactGraph,
+    starts: List[int],
+    forward: bool,
+    backward: bool,
+    max_depth: Optional[int],
+    limit: Optional[int],
+    edge_types: Optional[Collection[str]],
+    goals: Optional[Set[int]] = None
+) -> Tuple[Traversal, dict, Optional[int]]:
+    """BFS from starts; returns the nodes found, each one's predecessor, and the goal reached"""
+    kinds = _kinds(edge_types)
+    came_from = {start: None for start in starts}
+    found: List[Tuple[int, int]] = []
+    queue = deque((start, 0) for start in starts)
+
+    if goals is not None:
+        for start in starts:
+            if start in goals:
+                return Traversal(found, False), came_from, start
+
+    while queue:
+        node, depth = queue.popleft()
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for neighbour in _neighbours(graph, node, forward, backward, kinds):
+            if neighbour in came_from:
+                continue
+            if limit is not None and len(found) >= limit:
+                return Traversal(found, True), came_from, None
+            came_from[neighbour] = node
+            found.append((neighbour, depth + 1))
+            if goals is not None and neighbour in goals:
+                return Traversal(found, False), came_from, neighbour
+            queue.append((neighbour, depth + 1))
+
+    return Traversal(found, False), came_from, None
+
+
+def ancestors(
+    graph: CompactGraph,
+    node: int,
+    max_depth: Optional[int] = None,
+    limit: Optional[int] = None,
+    edge_types: Optional[Collection[str]] = None
+) -> Traversal:
+    """Nodes a node can be reached from: earlier thread messages and parents"""
+    return _search(graph, [node], False, True, max_depth, limit, edge_types)[0]
+
+
+def descendants(
+    graph: CompactGraph,
+    node: int,
+    max_depth: Optional[int] = None,
+    limit: Optional[int] = None,
+    edge_types: Optional[Collection[str]] = None
+) -> Traversal:
+    """Nodes reachable from a node: later thread messages and replies"""
+    return _search(graph, [node], True, False, max_depth, limit, edge_types)[0]
+
+
+def neighbourhood(
+    graph: CompactGraph,
+    node: int,
+    hops: int = 1,
+    limit: Optional[int] = None,
+    edge_types: Optional[Collection[str]] = None
+) -> Traversal:
+    """Nodes within a number of links of a node, in either direction"""
+    return _search(graph, [node], True, True, hops, limit, edge_types)[0]
+
+
+def chat_path(
+    graph: CompactGraph,
+    from_chat: str,
+    to_chat: str,
+    max_depth: Optional[int] = None,
+    limit: Optional[int] = None,
+    edge_types: Optional[Collection[str]] = None
+) -> Optional[List[int]]:
+    """Shortest chain of linked messages from any message of one chat to one of another
+
+    Links are followed in either direction. Returns None when the chats are
+    not connected within the depth cap and limit.
+    """
+    starts = graph.chat_nodes(from_chat)
+    goals = set(graph.chat_nodes(to_chat))
+    if not starts or not goals:
+        return None
+
+    _, came_from, reached = _search(graph, starts, True, True, max_depth, limit, edge_types, goals)
+    if reached is None:
+        return None
+    path = []
+    node = reached
+    while node is not None:
+        path.append(node)
+        node = came_from[node]
+    path.reverse()
+    return path
@@ -0,0 +1,285 @@
+"""
+Compact binary wire format for GAP messages
+
+Layout (integers are unsigned LEB128 varints unless noted)::
+
+    "GAPW" | version (1 byte) | header size | header | content size | content
+
+    header  = strings | fields size | fields
+    strings = count, then each string as size + UTF-8
+    fields  = string references and counts, in model field order
+
+A string reference is 0 for None, otherwise an index (plus one) into the
+static table below followed by the message's own strings. The content is
+last and kept as UTF-8, so it can be sliced out of a buffer as-is.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from .models import GAPMessage
+from .records import AnyMessage
+
+WIRE_MEDIA_TYPE = "application/x-gap"
+WIRE_VERSION = 1
+
+_MAGIC = b"GAPW"
+
+# Strings most messages repeat, referenced by position instead of being
+# written out. Part of the format: entries may only be appended, together
+# with a new WIRE_VERSION.
+_STATIC_STRINGS: Tuple[str, ...] = (
+    "0.1.0",
+    "assistant", "user", "system",
+    "claude.ai", "chatgpt", "gemini", "copilot", "perplexity", "generic",
+    "parsed_from_markdown",
+    # Entity types
+    "ambiguous_reference", "user_defined", "parsed", "glossary_term",
+    "software_version", "python_version", "node_version", "framework",
+    "database", "file_reference",
+    "[NEEDS_DEFINITION]",
+    # Ambiguous reference keys
+    "the_system", "the_database", "the_code", "the_approach", "the_solution",
+    "the_problem", "the_issue", "the_error", "the_project", "the_file",
+    "the_function", "the_method", "the_class", "the_module", "the_package",
+    "that_approach", "that_method", "that_solution", "this_implementation",
+    "this_approach", "this_solution",
+    # Pronoun maps
+    "I", "me", "my", "mine", "myself", "we", "us", "our", "ours",
+    "the AI assistant", "the AI assistant's", "the AI assistant itself",
+    "the AI assistants", "the AI assistants'",
+    "the user", "the user's", "the user themselves", "the users", "the users'",
+    "the system", "the system's", "the system itself",
+    "0.2.0",
+)
+_STATIC_INDEX = {value: index for index, value in enumerate(_STATIC_STRINGS)}
+
+# One varint: any continuation bytes, then a final byte
+_VARINT = re.compile(rb"[\x80-\xff]*[\x00-\x7f]")
+
+BufferLike = Union[bytes, bytearray, memoryview]
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    """Append an unsigned LEB128 integer"""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buffer: BufferLike, pos: int) -> Tuple[int, int]:
+    """Read an unsigned LEB128 integer, returning it and the next position"""
+    result = shift = 0
+    try:
+        while True:
+            byte = buffer[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result, pos
+            shift += 7
+    except IndexError:
+        raise ValueError("Truncated GAP wire message") from None
+
+
+class _Encoder:
+    """Collects a message's strings into a table while writing references"""
+
+    def __init__(self):
+        self._strings: Dict[str, int] = {}
+        self.fields = bytearray()
+
+    def index(self, value: Optional[str]) -> int:
+        # 0 is None, then the static table, then this message's strings
+        if value is None:
+            return 0
+        index = _STATIC_INDEX.get(value)
+        if index is None:
+            index = self._strings.get(value)
+            if index is None:
+                index = self._strings[value] = len(_STATIC_STRINGS) + len(self._strings)
+        return index + 1
+
+    def ref(self, value: Optional[str]) -> None:
+        _write_varint(self.fields, self.index(value))
+
+    def count(self, value: int) -> None:
+        _write_varint(self.fields, value)
+
+    def table(self) -> bytearray:
+        out = bytearray()
+        _write_varint(out, len(self._strings))
+        for value in self._strings:
+            data = value.encode("utf-8")
+            _write_varint(out, len(data))
+            out += data
+        return out
+
+
+def encode_message(gap_message: AnyMessage) -> bytes:
+    """Encode a message in the binary wire format
+
+    Field names are implied by position, and strings repeated within the
+    message or listed in the static table are written at most once.
+    """
+    message = gap_message.message
+    source = message.source
+    context = message.context
+    hints = message.transform_hints
+
+    encoder = _Encoder()
+    ref = encoder.ref
+    count = encoder.count
+
+    ref(gap_message.gap_version)
+    ref(source.platform)
+    ref(source.model)
+    ref(source.chat_id)
+    ref(source.timestamp)
+    ref(source.role)
+
+    ref(context.thread_id)
+    count(len(context.parent_messages))
+    for parent in context.parent_messages:
+        ref(parent)
+    count(len(context.entities))
+    for key, entity in context.entities.items():
+        ref(key)
+        ref(entity.type)
+        ref(entity.value)
+        ref(entity.defined_in)
+    count(len(context.undefined))
+    for key in context.undefined:
+        ref(key)
+
+    ref(hints.maintain_tense)
+    ref(hints.preserve_perspective)
+    ref(hints.pronoun_profile)
+    count(len(hints.pronoun_map))
+    for pronoun, replacement in hints.pronoun_map.items():
+        ref(pronoun)
+        ref(replacement)
+
+    header = encoder.table()
+    _write_varint(header, len(encoder.fields))
+    header += encoder.fields
+
+    content = message.content.encode("utf-8")
+    out = bytearray(_MAGIC)
+    out.append(WIRE_VERSION)
+    _write_varint(out, len(header))
+    out += header
+    _write_varint(out, len(content))
+    out += content
+    return bytes(out)
+
+
+def _sections(data: BufferLike) -> Tuple[memoryview, int, int]:
+    """Check the preamble; return a byte view and the header's start and end"""
+    view = memoryview(data).cast("B")
+    if len(view) < len(_MAGIC) + 1 or view[:len(_MAGIC)] != _MAGIC:
+        raise ValueError("Not a GAP wire message: bad magic")
+    version = view[len(_MAGIC)]
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported GAP wire version {version}")
+    size, start = _read_varint(view, len(_MAGIC) + 1)
+    if start + size > len(view):
+        raise ValueError("Truncated GAP wire message")
+    return view, start, start + size
+
+
+def content_view(data: BufferLike) -> memoryview:
+    """Return the UTF-8 content of an encoded message as a view into ``data``
+
+    Lets content be forwarded or hashed without decoding the message.
+    """
+    view, _, end = _sections(data)
+    size, start = _read_varint(view, end)
+    if start + size > len(view):
+        raise ValueError("Truncated GAP wire message")
+    if start + size < len(view):
+        raise ValueError("Trailing data after GAP wire message")
+    return view[start:]
+
+
+def decode_message(data: BufferLike) -> GAPMessage:
+    """Decode a message written by ``encode_message``
+
+    ``data`` may be any buffer, such as a memory-mapped file or a slice of a
+    larger body. Only the header is copied out for parsing; the content is
+    decoded straight from ``data``. Raises ValueError on malformed input.
+    """
+    view, start, end = _sections(data)
+    content = content_view(view)
+    head = bytes(view[start:end])
+
+    strings: List[Optional[str]] = [None]
+    strings += _STATIC_STRINGS
+    table_size, pos = _read_varint(head, 0)
+    for _ in range(table_size):
+        size, pos = _read_varint(head, pos)
+        strings.append(head[pos:pos + size].decode("utf-8"))
+        pos += size
+
+    # Fields are only varints; split them in one scan
+    fields_size, pos = _read_varint(head, pos)
+    fields_end = pos + fields_size
+    if fields_end > len(head) or (fields_size and head[fields_end - 1] & 0x80):
+        raise ValueError("Truncated GAP wire message")
+    values = iter([
+        token[0] if len(token) == 1 else _read_varint(token, 0)[0]
+        for token in _VARINT.findall(head, pos, fields_end)
+    ])
+    take = values.__next__
+
+    def ref() -> Optional[str]:
+        return strings[take()]
+
+    try:
+        gap_version = ref()
+        source = {"platform": ref(), "model": ref(), "chat_id": ref(), "timestamp": ref(), "role": ref()}
+        thread_id = ref()
+        parents = [ref() for _ in range(take())]
+        entities = {}
+        for _ in range(take()):
+            key = ref()
+            entities[key] = {"type": ref(), "value": ref(), "defined_in": ref()}
+        undefined = [ref() for _ in range(take())]
+        maintain_tense = ref()
+        preserve_perspective = ref()
+        pronoun_profile = ref()
+        pronoun_map = {}
+        for _ in range(take()):
+            pronoun = ref()
+            pronoun_map[pronoun] = ref()
+    except IndexError:
+        raise ValueError("Bad string reference in GAP wire message") from None
+    except StopIteration:
+        raise ValueError("Truncated GAP wire message") from None
+    if next(values, None) is not None:
+        raise ValueError("Malformed GAP wire message fields")
+
+    if fields_end != len(head):
+        raise ValueError("Malformed GAP wire message header")
+
+    # Validation also rejects missing required strings
+    return GAPMessage.model_validate({
+        "gap_version": gap_version,
+        "message": {
+            "content": str(content, "utf-8"),
+            "source": source,
+            "context": {
+                "thread_id": thread_id,
+                "parent_messages": parents,
+                "entities": entities,
+                "undefined": undefined
+            },
+            "transform_hints": {
+                "maintain_tense": maintain_tense,
+                "preserve_perspective": preserve_perspective,
+                "pronoun_map": pronoun_map,
+                "pronoun_profile": pronoun_profile
+            }
+        }
+    })
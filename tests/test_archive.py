@@ -0,0 +1,79 @@
+"""Tests for reading .gap archives"""
+
+import os
+
+import pytest
+
+from src.gap import GAPArchive, GAPProtocol
+from src.gap.archive import _INDEX_HEADER
+
+
+@pytest.fixture
+def archive_path(tmp_path):
+    gap = GAPProtocol()
+    blocks = [
+        gap.to_markdown(gap.wrap_message(f"Message {index} about the code", "claude.ai", f"chat{index}"))
+        for index in range(5)
+    ]
+    # A block without an end is dropped at the next start
+    path = tmp_path / "history.gap"
+    path.write_text(blocks[0] + "\n[GAP:START]\nbroken\n" + "\n\n".join(blocks[1:]) + "\n")
+    return path
+
+
+def index_path(path):
+    return path.with_name(path.name + ".idx")
+
+
+def test_blocks_are_read_by_index(archive_path):
+    with GAPArchive(archive_path) as archive:
+        assert len(archive) == 5
+        assert archive[2].message.content == "Message 2 about the code"
+        assert archive[-1].message.content == "Message 4 about the code"
+        assert archive.block(0).startswith("[GAP:START]")
+        assert archive.block(0).endswith("[GAP:END]")
+        assert [message.message.content for message in archive][1] == "Message 1 about the code"
+        with pytest.raises(IndexError):
+            archive.block(5)
+
+
+def test_index_is_reused_while_the_archive_is_unchanged(archive_path):
+    with GAPArchive(archive_path) as archive:
+        offsets = [archive.span(index) for index in range(len(archive))]
+    assert index_path(archive_path).exists()
+
+    with GAPArchive(archive_path) as archive:
+        assert archive._index_map is not None
+        assert [archive.span(index) for index in range(len(archive))] == offsets
+
+    # A changed archive is scanned again
+    with open(archive_path, "a") as f:
+        f.write("[GAP:START]\n[GAP:CONTENT]\nmore\n[GAP:END]\n")
+    stat = os.stat(archive_path)
+    os.utime(archive_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    with GAPArchive(archive_path) as archive:
+        assert archive._index_map is None
+        assert len(archive) == 6
+
+
+def test_reads_without_save_index_write_nothing(archive_path):
+    with GAPArchive(archive_path, save_index=False) as archive:
+        assert len(archive) == 5
+    assert not index_path(archive_path).exists()
+
+    GAPArchive(archive_path).close()
+    with GAPArchive(archive_path, save_index=False) as archive:
+        assert archive._index_map is not None
+
+
+def test_index_of_the_other_byte_order_is_rebuilt(archive_path):
+    GAPArchive(archive_path).close()
+    path = index_path(archive_path)
+    data = bytearray(path.read_bytes())
+    magic = _INDEX_HEADER.unpack_from(data)[0]
+    data[6:7] = b"B" if magic[6:7] == b"L" else b"L"
+    path.write_bytes(bytes(data))
+
+    with GAPArchive(archive_path, save_index=False) as archive:
+        assert archive._index_map is None
+        assert len(archive) == 5
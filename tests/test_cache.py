@@ -0,0 +1,121 @@
+"""Tests for LRUCache and the results cached with it"""
+
+import pytest
+
+from src.gap import GAPProtocol, LRUCache, PlatformTransformer
+
+CONTENT = "I fixed the code in main.py; that method now calls React 18.2 and the database."
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_hits_misses_and_eviction():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b", "gone") == "gone"
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {
+        "size": 2, "maxsize": 2, "ttl": None, "hits": 3, "misses": 2,
+        "hit_rate": 0.6, "evictions": 1, "expirations": 0
+    }
+
+    cache.clear()
+    assert len(cache) == 0 and cache.hits == 3
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = LRUCache(maxsize=4, ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    cache.set("b", 2)
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    clock.now = 20
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["size"], stats["expirations"], stats["hits"], stats["misses"]) == (0, 2, 2, 2)
+
+
+def test_detection_is_cached_by_content():
+    clock = Clock()
+    cache = LRUCache(maxsize=16, ttl=60, clock=clock)
+    gap = GAPProtocol(cache=cache)
+    expected = GAPProtocol().wrap_message(CONTENT, "claude.ai", "uncached").message.context.entities
+
+    first = gap.wrap_message(CONTENT, "claude.ai", "first")
+    # Callers own what they get back; changing it leaves the cache intact
+    first.message.context.entities.clear()
+    second = gap.wrap_message(CONTENT, "claude.ai", "second")
+    assert second.message.context.entities == expected
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    gap.wrap_many([{"content": CONTENT, "platform": "claude.ai", "chat_id": "batch"}])
+    assert cache.hits == 2
+
+    clock.now = 60
+    third = gap.wrap_message(CONTENT, "claude.ai", "third")
+    assert third.message.context.entities == expected
+    assert cache.expirations == 1 and cache.misses == 2
+
+
+def test_suggestions_are_cached_by_content_and_undefined_references():
+    cache = LRUCache(maxsize=16)
+    gap = GAPProtocol(cache=cache)
+    content = CONTENT + " That method is the parser entry point. The database is PostgreSQL."
+    message = gap.wrap_message(content, "claude.ai", "suggest")
+    expected = GAPProtocol().suggest_definitions(message)
+    assert set(expected) == {"that_method", "the_database"}
+
+    assert gap.suggest_definitions(message) == expected
+    hits = cache.hits
+    suggestions = gap.suggest_definitions(message)
+    assert suggestions == expected and cache.hits == hits + 1
+    suggestions.clear()
+    assert gap.suggest_definitions(message) == expected
+
+    defined = gap.update_entity(message, "that_method", "parse()")
+    misses = cache.misses
+    assert gap.suggest_definitions(defined) == {"the_database": expected["the_database"]}
+    assert cache.misses == misses + 1
+
+
+def test_transform_plans_are_cached_by_pronoun_map_and_definitions():
+    plans = LRUCache(maxsize=8)
+    transformer = PlatformTransformer(plan_cache=plans)
+    gap = GAPProtocol()
+    message = gap.wrap_message(CONTENT, "claude.ai", "plans", role="user")
+    uncached = PlatformTransformer(plan_cache=LRUCache(maxsize=8))
+
+    expected = uncached.transform_for_platform(message, "chatgpt")
+    assert transformer.transform_for_platform(message, "chatgpt") == expected
+    misses = plans.misses
+    # Another message with the same map and definitions reuses the plan
+    other = gap.wrap_message(CONTENT + " Again.", "claude.ai", "plans-2", role="user")
+    assert transformer.transform_for_platform(other, "chatgpt") == uncached.transform_for_platform(other, "chatgpt")
+    assert plans.misses == misses and plans.hits >= 1
+
+    # Changing a definition, or the platform layout, compiles a new plan
+    defined = gap.update_entity(message, "that_method", "parse()")
+    transformed = transformer.transform_for_platform(defined, "chatgpt")
+    assert "parse()" in transformed
+    assert transformed == uncached.transform_for_platform(defined, "chatgpt")
+    assert plans.misses > misses
+    misses = plans.misses
+    assert transformer.transform_for_platform(defined, "gemini") == uncached.transform_for_platform(defined, "gemini")
+    assert plans.misses == misses + 1
@@ -0,0 +1,100 @@
+"""Tests for CompactGraph and the traversals over it"""
+
+import pytest
+
+from src.gap import (
+    CompactGraph,
+    ContextRecord,
+    MessageContentRecord,
+    MessageRecord,
+    SourceRecord,
+    TransformHintsRecord,
+    ancestors,
+    chat_path,
+    compact_graph,
+    descendants,
+    neighbourhood,
+)
+
+
+def message(index: int, threads: int = 7) -> MessageRecord:
+    """Message index of a history over threads; some reply to earlier or later messages"""
+    parents = []
+    if index % 5 == 0 and index:
+        parents.append(f"claude.ai_chat{(index - 3) % threads}_2026-01-01T00:00:00.{index - 3:06d}")
+    if index % 11 == 0:
+        parents.append(f"claude.ai_chat{(index + 4) % threads}_2026-01-01T00:00:00.{index + 4:06d}")
+    return MessageRecord(
+        "0.2.0",
+        MessageContentRecord(
+            f"Message {index}",
+            SourceRecord("claude.ai", None, f"chat{index % threads}", f"2026-01-01T00:00:00.{index:06d}"),
+            ContextRecord(f"thread-{index % threads}" if index % 13 else None, parents),
+            TransformHintsRecord()
+        )
+    )
+
+
+def edges(graph: CompactGraph):
+    return sorted((node, target, kind) for node in range(len(graph)) for target, kind in graph.out_edges(node))
+
+
+def in_edges(graph: CompactGraph):
+    return sorted((node, source) for node in range(len(graph)) for source in graph.predecessors(node))
+
+
+@pytest.fixture(params=["numpy", "array"])
+def columns(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(compact_graph, "np", None)
+
+
+@pytest.mark.parametrize("built, total", [(0, 60), (40, 60), (10, 3000)])
+def test_added_messages_match_a_full_build(columns, built, total):
+    messages = [message(index) for index in range(total)]
+    graph = CompactGraph(messages[:built])
+    for msg in messages[built:]:
+        graph.add(msg)
+    full = CompactGraph(messages)
+
+    assert len(graph) == len(full) == total
+    assert graph.edge_count == full.edge_count
+    assert edges(graph) == edges(full)
+    assert in_edges(graph) == in_edges(full)
+    assert [graph.node_id(node) for node in range(total)] == [full.node_id(node) for node in range(total)]
+    assert all(graph.index(full.node_id(node)) == node for node in range(total))
+    assert graph.thread_nodes("thread-3") == full.thread_nodes("thread-3")
+    assert graph.chat_nodes("chat2") == full.chat_nodes("chat2")
+    assert graph.node(total - 1) == full.node(total - 1)
+
+    as_dict, full_dict = graph.as_dict(), full.as_dict()
+    assert as_dict["nodes"] == full_dict["nodes"]
+    assert as_dict["threads"] == full_dict["threads"]
+    assert sorted(map(tuple, map(dict.values, as_dict["edges"]))) == sorted(
+        map(tuple, map(dict.values, full_dict["edges"]))
+    )
+
+    for node in (0, total // 2, total - 1):
+        for query in (ancestors, descendants):
+            assert sorted(query(graph, node).nodes) == sorted(query(full, node).nodes)
+        assert sorted(neighbourhood(graph, node, hops=2).nodes) == sorted(neighbourhood(full, node, hops=2).nodes)
+    path = chat_path(graph, "chat0", "chat3")
+    assert path is not None and len(path) == len(chat_path(full, "chat0", "chat3"))
+
+
+def test_overflow_is_compacted(columns):
+    graph = CompactGraph([message(index) for index in range(10)])
+    for index in range(10, 20):
+        graph.add(message(index))
+    assert graph.compacted == 10
+    assert graph.out_overflow
+    grouped = graph.chat_nodes("chat1")
+
+    graph.compact()
+    full = CompactGraph([message(index) for index in range(20)])
+    assert graph.compacted == 20
+    assert not graph.out_overflow and not graph.in_overflow
+    assert edges(graph) == edges(full)
+    assert graph.chat_nodes("chat1") == grouped == full.chat_nodes("chat1")
@@ -0,0 +1,77 @@
+"""Tests for entity detection"""
+
+import pytest
+
+from src.gap import EntityDetector, GAPProtocol
+
+SAMPLES = [
+    "",
+    "We deployed the release and everyone was happy.",
+    "for item in items:\n    total += item.price\n",
+    "The System runs Python 3.11 behind FastAPI 0.100.",
+    "THE DATABASE is PostgreSQL; the code lives in main.py.",
+    "Upgrade node v18.2 and React, then check this implementation.",
+]
+
+
+class ExtraDetector(EntityDetector):
+    AMBIGUOUS_PATTERNS = {"the_thing": r"\bthe thing\b"}
+
+
+class OptionalKeywordDetector(EntityDetector):
+    TECH_PATTERNS = {"framework_patterns": [(r"\b(?:Flask)?(Ext)\b", "framework")]}
+
+
+def test_prefilter_triggers_are_phrases_and_keywords():
+    triggers = EntityDetector._scanner.triggers
+    assert "the system" in triggers
+    assert "python" in triggers
+    assert "fastapi" in triggers
+
+
+@pytest.mark.parametrize("content", SAMPLES)
+def test_prefilter_keeps_detection_unchanged(content):
+    scanner = EntityDetector._scanner
+    filtered = scanner.scan(content)
+    triggers, scanner.triggers = scanner.triggers, None
+    try:
+        assert scanner.scan(content) == filtered
+    finally:
+        scanner.triggers = triggers
+
+
+def test_prefilter_skips_content_without_triggers():
+    scanner = EntityDetector._scanner
+    assert not scanner.triggered("We deployed the release and everyone was happy.")
+    assert scanner.triggered("We deployed THE SYSTEM.")
+    assert scanner.triggered("Moved to Django.")
+
+
+def test_prefilter_is_off_when_a_keyword_cannot_be_told():
+    assert OptionalKeywordDetector._scanner.triggers is None
+    assert "framework_Ext" in OptionalKeywordDetector().detect_entities("Ext is used")
+
+
+def test_scanner_is_built_once_per_class():
+    assert EntityDetector()._scanner is EntityDetector._scanner
+    assert ExtraDetector._scanner is not EntityDetector._scanner
+    assert ExtraDetector._scanner.triggers[0] == "the thing"
+    assert "the_thing" in ExtraDetector().detect_entities("Fix the thing.")
+
+
+@pytest.mark.parametrize("detector_class", [EntityDetector, ExtraDetector])
+def test_detect_references_matches_full_detection(detector_class):
+    detector = detector_class()
+    for content in SAMPLES + ["Fix the thing in the code, then this approach"]:
+        expected = [key for key, entity in detector.detect_entities(content).items() if key in detector.AMBIGUOUS_PATTERNS]
+        assert detector.detect_references(content) == expected
+
+
+def test_add_references_runs_only_reference_patterns(monkeypatch):
+    gap = GAPProtocol(version="0.2.0")
+    message = gap.from_markdown(gap.to_markdown(gap.wrap_message("See the code in Python 3.11", "claude.ai", "c")))
+    monkeypatch.setattr(EntityDetector, "detect_entities", lambda self, content: pytest.fail("full detection ran"))
+
+    assert gap.add_references(message) == ["the_code"]
+    assert gap.get_undefined_entities(message) == ["the_code"]
+    assert gap.add_references(message) == []
@@ -0,0 +1,49 @@
+"""Tests for EntityIndex"""
+
+import pytest
+
+from src.gap import EntityIndex, EntityRecord
+
+OLD = EntityRecord("database", "PostgreSQL 15")
+NEW = EntityRecord("database", "PostgreSQL 16")
+
+
+def test_offsets_are_compared_as_instants():
+    index = EntityIndex()
+    # 11:00 UTC, then 12:00 UTC written with another offset
+    index.define("the_database", OLD, "2026-01-01T11:00:00Z", "m1", "t")
+    index.define("the_database", NEW, "2026-01-01T14:00:00+02:00", "m2", "t")
+
+    assert index.current("the_database").entity == NEW
+    assert index.as_of("the_database", "2026-01-01T11:30:00+00:00").entity == OLD
+    assert index.as_of("the_database", "2026-01-01T13:30:00+02:00", "t").entity == OLD
+    assert index.as_of("the_database", "2026-01-01T12:00:00Z").entity == NEW
+    assert index.as_of("the_database", "2026-01-01T10:59:59Z") is None
+
+
+def test_out_of_order_definitions_are_sorted_by_instant():
+    index = EntityIndex()
+    index.define("the_database", NEW, "2026-01-01T10:00:00-03:00", "m2")
+    # Earlier as an instant, although later as a string
+    index.define("the_database", OLD, "2026-01-01T12:00:00+01:00", "m1")
+
+    assert [definition.message_id for definition in index.history("the_database")] == ["m1", "m2"]
+    assert index.current("the_database").entity == NEW
+
+
+def test_naive_timestamps_are_utc():
+    index = EntityIndex()
+    index.define("the_database", OLD, "2026-01-01T11:00:00")
+    index.define("the_database", NEW, "2026-01-01T12:00:00")
+
+    assert index.as_of("the_database", "2026-01-01T12:30:00+01:00").entity == OLD
+    assert index.as_of("the_database", "2026-01-01T12:00:00+00:00").entity == NEW
+
+
+def test_invalid_timestamps_are_rejected():
+    index = EntityIndex()
+    with pytest.raises(ValueError):
+        index.define("the_database", OLD, "yesterday")
+    index.define("the_database", OLD, "2026-01-01T11:00:00Z")
+    with pytest.raises(ValueError):
+        index.as_of("the_database", "soon")
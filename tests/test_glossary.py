@@ -0,0 +1,89 @@
+"""Tests for GlossaryMatcher"""
+
+import struct
+from array import array
+
+import pytest
+
+from src.gap import GAPProtocol, GlossaryMatcher, glossary as glossary_module, load_glossary
+
+TERMS = {
+    "gap_protocol": {"type": "project", "value": "GAP Protocol"},
+    "gap": {"type": "acronym", "value": "Generic AI Protocol"},
+    "context_graph": {"type": "concept", "value": "Context graph", "phrase": "context graph"},
+    "ci": {"type": "tool", "value": "CI", "phrase": "C.I."},
+}
+CONTENT = "The GAP   protocol builds a Context\ngraph; GAP runs on C.I. daily"
+
+
+def found(matcher: GlossaryMatcher, content: str = CONTENT):
+    return [(content[start:end], matcher.entry(index)[0]) for start, end, index in matcher.find(content)]
+
+
+def swap_byte_order(data: bytes) -> bytes:
+    """The same glossary as written on a host of the other byte order"""
+    header = glossary_module._HEADER
+    _, tokens, nodes, edges, entries = header.unpack_from(data)
+    swapped = bytearray(data)
+    swapped[:header.size] = header.pack(glossary_module._SWAPPED_MAGIC, tokens, nodes, edges, entries)
+    offset = header.size
+    for count in (tokens + 1, edges, edges, nodes, entries * 3 + 1):
+        values = array("Q", data[offset:offset + count * 8])
+        values.byteswap()
+        swapped[offset:offset + count * 8] = values.tobytes()
+        offset += count * 8
+    return bytes(swapped)
+
+
+@pytest.fixture
+def matcher():
+    return GlossaryMatcher.build(TERMS)
+
+
+def test_find_is_leftmost_longest(matcher):
+    assert len(matcher) == 4
+    assert found(matcher) == [
+        ("GAP   protocol", "gap_protocol"),
+        ("Context\ngraph", "context_graph"),
+        ("GAP", "gap"),
+        ("C.I.", "ci"),
+    ]
+    assert matcher.entry(0) == ("gap_protocol", "project", "GAP Protocol")
+    assert matcher.longest_term == len("context graph")
+    assert found(matcher, "nothing to see") == []
+
+
+def test_save_and_load(matcher, tmp_path):
+    path = tmp_path / "terms.glossary"
+    matcher.save(path)
+    loaded = load_glossary(path)
+    assert loaded.path == str(path)
+    assert loaded.to_bytes() == matcher.to_bytes()
+    assert loaded.digest == matcher.digest
+    assert found(loaded) == found(matcher)
+
+
+def test_load_from_other_byte_order(matcher, tmp_path):
+    path = tmp_path / "foreign.glossary"
+    path.write_bytes(swap_byte_order(matcher.to_bytes()))
+    loaded = load_glossary(path)
+    assert found(loaded) == found(matcher)
+    assert loaded.longest_term == matcher.longest_term
+
+
+def test_source_files(tmp_path):
+    terms = tmp_path / "terms.txt"
+    terms.write_text("Context Graph\tThe message graph\n\nGAP protocol\n", encoding="utf-8")
+    matcher = load_glossary(terms)
+    assert found(matcher) == [("GAP   protocol", "gap_protocol"), ("Context\ngraph", "context_graph")]
+    assert matcher.entry(0) == ("context_graph", "glossary_term", "The message graph")
+
+    with pytest.raises(ValueError, match="bad magic"):
+        GlossaryMatcher(struct.pack("<8s4Q", b"GAPGLOX1", 0, 1, 0, 0))
+
+
+def test_protocol_detects_glossary_terms(matcher):
+    message = GAPProtocol(glossary=matcher).wrap_message(CONTENT, platform="claude.ai", chat_id="glossary")
+    entities = message.message.context.entities
+    assert entities["gap_protocol"].value == "GAP Protocol"
+    assert entities["ci"].type == "tool"
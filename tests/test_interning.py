@@ -0,0 +1,41 @@
+"""Tests for RecordInterner"""
+
+from src.gap import GAPProtocol, RecordInterner, to_model
+
+
+def wrap(gap: GAPProtocol, index: int):
+    return gap.wrap_record(
+        f"Message {index} about the database and React",
+        platform="claude.ai",
+        chat_id=f"chat-{index}",
+        thread_id=f"thread-{index}",
+        entities={f"note_{index}": {"type": "note", "value": f"value {index}"}},
+        parent_messages=[f"claude.ai_chat-{index - 1}"]
+    )
+
+
+def test_records_share_repeated_fields():
+    interner = RecordInterner()
+    gap = GAPProtocol(version="0.2.0", interner=interner)
+    first, second = (interner.intern(wrap(gap, index)) for index in range(2))
+    expected = to_model(wrap(GAPProtocol(version="0.2.0"), 1))
+
+    assert to_model(second).message.context.entities == expected.message.context.entities
+    assert second.message.source.platform is first.message.source.platform
+    assert second.message.source.role is first.message.source.role
+    assert second.message.context.entities["framework_React"] is first.message.context.entities["framework_React"]
+    assert second.message.context.entities["note_1"].type is first.message.context.entities["note_0"].type
+
+
+def test_pools_stay_bounded():
+    interner = RecordInterner(max_strings=32, max_entities=16)
+    gap = GAPProtocol(version="0.2.0", interner=interner)
+    for index in range(500):
+        interner.intern(wrap(gap, index))
+
+    stats = interner.stats()
+    assert stats["records"] == 500
+    assert stats["strings"] <= 32 and stats["entities"] <= 16
+    assert stats["clears"] > 0
+    assert not any(value.startswith(("chat-", "thread-", "claude.ai_chat-", "value ")) for value in interner._strings)
+    assert interner.measure()["sampled"] > 0
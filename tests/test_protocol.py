@@ -0,0 +1,80 @@
+"""Tests for wrapping messages with GAPProtocol"""
+
+import asyncio
+
+from src.gap import CompactGraph, GAPProtocol, ancestors
+
+
+def message_id(message) -> str:
+    source = message.message.source
+    return f"{source.platform}_{source.chat_id}_{source.timestamp}"
+
+
+async def _chunks(parts):
+    for part in parts:
+        yield part
+
+
+def test_every_wrap_path_keeps_parent_messages():
+    gap = GAPProtocol(version="0.2.0")
+    root = gap.wrap_message("Start here", "claude.ai", "root", thread_id="t")
+    parents = [message_id(root)]
+
+    replies = [
+        gap.wrap_stream(iter(["Re", "ply"]), "chatgpt", "stream", parent_messages=parents),
+        asyncio.run(gap.wrap_stream_async(_chunks(["Re", "ply"]), "gemini", "async", parent_messages=parents)),
+        *gap.wrap_many([{"content": "Reply", "platform": "copilot", "chat_id": "batch", "parent_messages": parents}]),
+    ]
+    graph = CompactGraph([root, *replies])
+    for node, reply in enumerate(replies, 1):
+        assert reply.message.context.parent_messages == parents
+        assert ancestors(graph, node).nodes == [(0, 1)]
+
+
+CONTENTS = [
+    "I fixed the code in main.py; that method now calls React 18.2 and the database.",
+    "We moved to Python 3.11 with PostgreSQL, and the approach is in utils/helpers.js.",
+    "Nothing to detect here.",
+    "",
+    "The system uses Node 20 and Vue.js; this implementation replaces the solution in app.tsx. " * 40,
+]
+
+
+def without_timestamp(message) -> dict:
+    data = message.model_dump()
+    del data["message"]["source"]["timestamp"]
+    return data
+
+
+def split(content: str, size: int):
+    return [content[start:start + size] for start in range(0, len(content), size)] or [""]
+
+
+def test_streamed_wraps_match_wrap_message():
+    gap = GAPProtocol()
+    provided = {"the_code": {"type": "file", "value": "main.py"}}
+    for content in CONTENTS:
+        expected = without_timestamp(gap.wrap_message(content, "claude.ai", "stream", entities=provided))
+        for size in (1, 3, 17, len(content) or 1):
+            events = []
+            streamed = gap.wrap_stream(iter(split(content, size)), "claude.ai", "stream",
+                                       entities=provided, on_entity=events.append)
+            assert without_timestamp(streamed) == expected
+            assert {event.key for event in events} <= set(streamed.message.context.entities)
+            assert all(content[event.start:event.end] for event in events)
+
+            streamed = asyncio.run(gap.wrap_stream_async(_chunks(split(content, size)), "claude.ai", "stream",
+                                                         entities=provided))
+            assert without_timestamp(streamed) == expected
+
+
+def test_batch_wraps_match_wrap_message():
+    messages = [
+        {"content": content, "platform": "chatgpt", "chat_id": f"batch-{index}", "role": "user"}
+        for index, content in enumerate(CONTENTS * 3)
+    ]
+    expected = [without_timestamp(GAPProtocol().wrap_message(**message)) for message in messages]
+    assert [without_timestamp(wrapped) for wrapped in GAPProtocol().wrap_many(messages)] == expected
+    # Several chunks go to a process pool
+    wrapped = GAPProtocol().wrap_many(messages, max_workers=2, chunk_size=4)
+    assert [without_timestamp(message) for message in wrapped] == expected
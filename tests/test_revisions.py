@@ -0,0 +1,52 @@
+"""Tests for conversion between the 0.1.0 and 0.2.0 revisions"""
+
+import pytest
+
+from src.gap import GAPProtocol, downgrade_message, upgrade_message
+
+CONTENT = "I think the approach in the code is fine, but that method calls React and the database"
+
+
+@pytest.fixture
+def legacy():
+    return GAPProtocol().wrap_message(
+        CONTENT,
+        platform="claude.ai",
+        chat_id="revisions",
+        entities={"the_code": {"type": "file", "value": "main.py"}, "custom": {"type": "note", "value": "kept"}}
+    )
+
+
+def test_upgrade_then_downgrade_is_an_identity(legacy):
+    upgraded = upgrade_message(legacy)
+    assert upgraded.gap_version == "0.2.0"
+    assert upgraded.message.context.undefined
+    assert upgraded.message.transform_hints.pronoun_profile == "assistant"
+    assert downgrade_message(upgraded) == legacy
+    assert downgrade_message(upgraded).model_dump_json() == legacy.model_dump_json()
+
+
+def test_compact_wrap_downgrades_to_the_legacy_wrap(legacy):
+    compact = GAPProtocol(version="0.2.0").wrap_message(
+        CONTENT,
+        platform="claude.ai",
+        chat_id="revisions",
+        entities={"the_code": {"type": "file", "value": "main.py"}, "custom": {"type": "note", "value": "kept"}}
+    )
+    timestamp = legacy.message.source.timestamp
+    compact.message.source.timestamp = timestamp
+    assert downgrade_message(compact) == legacy
+    assert upgrade_message(legacy) == compact
+
+
+def test_defining_an_earlier_reference_keeps_the_order(legacy):
+    protocol = GAPProtocol()
+    first = next(iter(legacy.message.context.entities))
+    defined = protocol.update_entity(legacy, first, "the chosen design")
+    order = list(defined.message.context.entities)
+
+    upgraded = upgrade_message(defined)
+    assert first not in upgraded.message.context.undefined
+    assert set(protocol.get_undefined_entities(upgraded)) == set(protocol.get_undefined_entities(defined))
+    assert list(downgrade_message(upgraded).message.context.entities) == order
+    assert downgrade_message(upgraded) == defined
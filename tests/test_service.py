@@ -0,0 +1,117 @@
+"""Tests for the FastAPI service"""
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import services.fastapi_service as service
+from src.gap import ContextMerger, create_context_graph
+
+client = TestClient(service.app)
+
+
+def wrap(content: str, chat_id: str, thread_id: str, entities=None) -> str:
+    response = client.post("/gap/wrap", json={
+        "content": content,
+        "platform": "claude.ai",
+        "chat_id": chat_id,
+        "thread_id": thread_id,
+        "entities": entities
+    })
+    assert response.status_code == 200
+    return response.json()["message_id"]
+
+
+def rebuilt(thread_id: str):
+    """Graph and merged entities built from the thread's messages alone"""
+    messages = service.context_store[thread_id]
+    graph = create_context_graph(messages)
+    merged = ContextMerger().merge_contexts(messages)
+    return graph["entity_definitions"], {
+        key: {"type": entity.type, "value": entity.value} for key, entity in merged["entities"].items()
+    }
+
+
+def served(thread_id: str):
+    body = client.get(f"/gap/context/{thread_id}").json()
+    merged = {
+        key: {"type": entity["type"], "value": entity["value"]}
+        for key, entity in body["merged_context"]["entities"].items()
+    }
+    return body["context_graph"]["entity_definitions"], merged
+
+
+def update(message_id: str, key: str, value: str) -> None:
+    markdown = client.post("/gap/wrap", json={"content": "x", "platform": "claude.ai", "chat_id": "scratch"})
+    response = client.post("/gap/update-entity", json={
+        "gap_markdown": markdown.json()["gap_markdown"],
+        "entity_key": key,
+        "entity_value": value,
+        "message_id": message_id
+    })
+    assert response.status_code == 200
+
+
+def test_update_of_earlier_message_matches_rebuild():
+    first = wrap("See the code", "c0", "out-of-order", {"the_code": {"type": "file", "value": "main.py"}})
+    wrap("Nothing to define here", "c1", "out-of-order")
+    last = wrap("See the code", "c2", "out-of-order", {"the_code": {"type": "file", "value": "app.py"}})
+    assert served("out-of-order") == rebuilt("out-of-order")
+
+    update(first, "the_code", "legacy.py")
+    definitions, merged = served("out-of-order")
+    assert (definitions, merged) == rebuilt("out-of-order")
+    assert definitions["the_code"]["defined_in"] == last
+    assert merged["the_code"]["value"] == "app.py"
+
+    update(last, "the_code", "server.py")
+    definitions, merged = served("out-of-order")
+    assert (definitions, merged) == rebuilt("out-of-order")
+    assert merged["the_code"]["value"] == "server.py"
+
+
+def test_graph_queries_see_messages_stored_after_the_first():
+    first = wrap("Start", "g0", "graph")
+    found = client.get(f"/gap/graph/messages/{first}/descendants").json()
+    assert found["nodes"] == []
+
+    second = wrap("Next", "g1", "graph")
+    reply = client.post("/gap/wrap", json={
+        "content": "Reply", "platform": "claude.ai", "chat_id": "g2", "parent_messages": [first]
+    }).json()["message_id"]
+    found = client.get(f"/gap/graph/messages/{first}/descendants").json()
+    assert {node["id"] for node in found["nodes"]} == {second, reply}
+    assert client.get("/gap/graph/chats/path", params={"from_chat": "g1", "to_chat": "g2"}).json()["length"] == 2
+
+
+@pytest.mark.parametrize("path, target", [
+    ("/gap/transform", {"target_platform": "chatgpt"}),
+    ("/gap/transform/multi", {"target_platforms": ["chatgpt"]}),
+])
+def test_fill_undefined_detects_references_in_markdown(path, target):
+    wrap("Defined", "fill-source", "fill", {"the_package": {"type": "package", "value": "gap-protocol"}})
+    markdown = client.post("/gap/wrap", json={
+        "content": "Publish the package, then rethink that method",
+        "platform": "claude.ai",
+        "chat_id": "fill-target"
+    }).json()["gap_markdown"]
+
+    body = client.post(path, json={"gap_markdown": markdown, **target}).json()
+    assert body["filled_entities"]["the_package"]["value"] == "gap-protocol"
+    assert body["undefined_entities"] == ["that_method"]
+
+    body = client.post(path, json={"gap_markdown": markdown, "fill_undefined": False, **target}).json()
+    assert body["filled_entities"] == {}
+    assert body["undefined_entities"] == []
+
+
+def test_entity_as_of_compares_instants():
+    wrap("Defined", "as-of", "as-of", {"the_module": {"type": "module", "value": "gap.core"}})
+    defined = service.entity_index.current("the_module").timestamp
+
+    body = client.get("/gap/entities/the_module", params={"as_of": defined + "+00:00"}).json()
+    assert body["definition"]["value"] == "gap.core"
+    body = client.get("/gap/entities/the_module", params={"as_of": defined + "+01:00"}).json()
+    assert body["definition"] is None
+    assert client.get("/gap/entities/the_module", params={"as_of": "later"}).status_code == 400
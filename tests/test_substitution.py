@@ -0,0 +1,67 @@
+"""Parity of single-scan substitution plans with sequential replacement"""
+
+import random
+
+import pytest
+
+from src.gap import PronounTransformer, SubstitutionPlan
+from src.gap.substitution import legacy_substitute
+
+CONTENT = (
+    "I think my code is fine. The code base uses the code in Main.py; "
+    "we changed our approach, the approach I'm sure of, and the system itself logs it. "
+    "Code base: the CODE BASE, codebase, the coder, I/O and my-code."
+)
+
+PLANS = [
+    # Disjoint pronouns and phrases: one scan
+    (PronounTransformer.PRONOUN_MAPS["user"], {"the_approach": "the cache-first design"}, True),
+    (PronounTransformer.PRONOUN_MAPS["assistant"], {"main_py": "app.py"}, True),
+    ({}, {}, True),
+    # Keys overlapping each other: one contains another
+    ({}, {"the_code": "src/app.py", "code": "the source"}, False),
+    ({}, {"code_base": "repository", "the_code_base": "monorepo", "the_code": "app.py"}, False),
+    # Keys overlapping at a word boundary
+    ({}, {"the_code": "app.py", "code_base": "repository"}, False),
+    # A replacement containing or completing a later pattern
+    ({"I": "the user"}, {"the_user": "Alice"}, False),
+    ({"my": "the user's"}, {"user_s_code": "Alice's code"}, None),
+    ({}, {"the_system": "the system itself"}, False),
+    ({"we": "the code"}, {"code_base": "repository"}, False),
+    # Replacements that are not word-bounded
+    ({"I": "—me—"}, {"the_code": "-app-"}, None),
+    # The same pattern twice, differently cased
+    ({"I": "the user", "i": "someone"}, {"the_approach": "plan A", "The_Approach": "plan B"}, None),
+]
+
+
+@pytest.mark.parametrize("pronoun_map, definitions, single_pass", PLANS)
+def test_plan_matches_sequential_replacement(pronoun_map, definitions, single_pass):
+    plan = SubstitutionPlan(pronoun_map, definitions)
+    if single_pass is not None:
+        assert plan.single_pass is single_pass
+    expected = legacy_substitute(CONTENT, pronoun_map, definitions)
+    assert plan.apply(CONTENT, check_parity=True) == expected
+    for chunk_size in (1, 7, 64, 1 << 16):
+        assert "".join(plan.iter_apply(CONTENT, chunk_size=chunk_size)) == expected
+
+
+WORDS = ["the", "code", "base", "I", "my", "we", "our", "approach", "system", "it", "s", "x"]
+
+
+def phrase(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+
+
+def test_random_plans_match_sequential_replacement():
+    rng = random.Random(8)
+    for _ in range(400):
+        pronoun_map = {rng.choice(WORDS): phrase(rng) for _ in range(rng.randint(0, 3))}
+        definitions = {phrase(rng).replace(" ", "_"): phrase(rng) for _ in range(rng.randint(0, 4))}
+        content = "".join(
+            rng.choice(WORDS) + rng.choice([" ", " ", ", ", "'", ". ", "-"]) for _ in range(30)
+        )
+        plan = SubstitutionPlan(pronoun_map, definitions)
+        expected = legacy_substitute(content, pronoun_map, definitions)
+        assert plan.apply(content) == expected, (pronoun_map, definitions, content)
+        assert "".join(plan.iter_apply(content, chunk_size=5)) == expected
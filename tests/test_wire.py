@@ -0,0 +1,80 @@
+"""Tests for the binary wire format"""
+
+import pytest
+
+from src.gap import GAPProtocol, decode_message, encode_message, to_model
+from src.gap.wire import content_view
+
+CONTENT = "Ünïcode ✓ — the code in main.py uses React 18.2 and that method"
+
+
+@pytest.fixture(params=["0.1.0", "0.2.0"])
+def message(request):
+    gap = GAPProtocol(version=request.param)
+    return to_model(gap.wrap_record(
+        CONTENT,
+        platform="claude.ai",
+        chat_id="wire",
+        role="user",
+        model="a-model",
+        thread_id="thread",
+        entities={"custom": {"type": "note", "value": "a value no table holds"}},
+        parent_messages=["claude.ai_wire_0", "claude.ai_wire_1"]
+    ))
+
+
+def test_round_trip(message):
+    data = encode_message(message)
+    assert decode_message(data) == message
+    assert bytes(content_view(data)) == CONTENT.encode("utf-8")
+    assert GAPProtocol().from_wire(GAPProtocol().to_wire(message)) == message
+
+    # Any buffer works, including a slice of a larger body
+    body = bytearray(b"prefix" + data + b"suffix")
+    view = memoryview(body)[len(b"prefix"):len(b"prefix") + len(data)]
+    assert decode_message(view) == message
+
+
+def test_empty_fields_round_trip():
+    gap = GAPProtocol()
+    message = to_model(gap.wrap_record("", platform="generic", chat_id=""))
+    assert decode_message(encode_message(message)) == message
+
+
+@pytest.mark.parametrize("data, error", [
+    (b"", "bad magic"),
+    (b"GAPX\x01\x00\x00", "bad magic"),
+    (b"GAPW\x02\x00\x00", "Unsupported GAP wire version 2"),
+    (b"GAPW\x01\x80", "Truncated"),
+    (b"GAPW\x01\x05\x00", "Truncated"),
+])
+def test_malformed_preamble(data, error):
+    with pytest.raises(ValueError, match=error):
+        decode_message(data)
+
+
+def test_truncated_and_trailing_data(message):
+    data = encode_message(message)
+    for size in range(len(data)):
+        with pytest.raises(ValueError):
+            decode_message(data[:size])
+    with pytest.raises(ValueError, match="Trailing data"):
+        decode_message(data + b"\0")
+
+
+def test_bad_string_reference():
+    # No string table, then one field referencing the 127th string
+    with pytest.raises(ValueError, match="Bad string reference"):
+        decode_message(b"GAPW\x01\x03\x00\x01\x7f\x00")
+
+
+def test_corrupted_bytes_raise_value_error(message):
+    data = encode_message(message)
+    for position in range(5, len(data)):
+        for byte in (0x00, 0x7F, 0xFF):
+            corrupted = bytearray(data)
+            corrupted[position] = byte
+            try:
+                decode_message(corrupted)
+            except ValueError:
+                pass